@@ -0,0 +1,482 @@
+import os
+import resource
+import threading
+import time
+import warnings
+from typing import Any, Dict, Optional, Set
+
+# Suppress deprecation warnings
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+# Shared model / collection configuration for every AI module
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+COLLECTION_NAME = "pdf_embeddings"
+LLM_MODEL_NAME = "gemini-1.5-flash"
+DEFAULT_PERSIST_DIRECTORY = "vector_store"
+
+# "huggingface" (PyTorch) or "onnx" (int8 ONNX export, see onnx_embeddings.py)
+EMBEDDING_BACKEND = os.getenv("KIA_EMBEDDING_BACKEND", "huggingface")
+ONNX_MODEL_DIR = os.getenv("KIA_ONNX_MODEL_DIR", os.path.join("instance", "onnx", "all-MiniLM-L6-v2"))
+
+# Pinned local copy of the embedding model (see model_bundle.py). When it exists the
+# model is loaded from disk with the Hugging Face hub offline; otherwise from the hub.
+EMBEDDING_MODEL_DIR = os.getenv("KIA_EMBEDDING_MODEL_DIR", os.path.join("instance", "models", "all-MiniLM-L6-v2"))
+
+# "chroma" (HNSW) or "numpy" (exact search over a memory-mapped matrix, see numpy_store.py)
+VECTOR_BACKEND = os.getenv("KIA_VECTOR_BACKEND", "chroma")
+
+# Persistent embedding cache shared by all workers (set KIA_EMBEDDING_CACHE=0 to disable)
+EMBEDDING_CACHE_ENABLED = os.getenv("KIA_EMBEDDING_CACHE", "1") != "0"
+EMBEDDING_CACHE_PATH = os.getenv("KIA_EMBEDDING_CACHE_PATH", os.path.join("instance", "embedding_cache.db"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("KIA_EMBEDDING_CACHE_SIZE", "50000"))
+
+# In-process cache of retrieval results, invalidated by the corpus_index collection version
+RETRIEVAL_CACHE_SIZE = int(os.getenv("KIA_RETRIEVAL_CACHE_SIZE", "1024"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("KIA_RETRIEVAL_CACHE_TTL", "3600"))
+
+# Concurrent generations of the same artifact wait on one another (see single_flight.py);
+# the lock files coordinate workers
+SINGLE_FLIGHT_LOCK_DIR = os.getenv("KIA_SINGLE_FLIGHT_DIR", os.path.join("instance", "locks"))
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("KIA_SINGLE_FLIGHT_TIMEOUT", "120"))
+
+# Gemini quota shared by every AI module (see llm_limiter.py); 0 disables a limit
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("KIA_LLM_RPM", "60"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("KIA_LLM_TPM", "1000000"))
+# Calls of one priority class that may wait for the quota, and how long they may wait
+LLM_MAX_QUEUE = int(os.getenv("KIA_LLM_MAX_QUEUE", "50"))
+LLM_MAX_WAIT = {
+    "interactive": float(os.getenv("KIA_LLM_MAX_WAIT", "20")),
+    "batch": float(os.getenv("KIA_LLM_MAX_WAIT_BATCH", "60")),
+}
+# SQLite file holding the quota so all workers share it (e.g. instance/llm_limiter.db); empty = per process
+LLM_LIMITER_DB = os.getenv("KIA_LLM_LIMITER_DB", "")
+# Priority class of each module's Gemini calls (others are "batch"): students waiting on a chat answer go first
+LLM_PRIORITIES = {
+    "kia_chatbot": "interactive",
+    "error_explainer": "interactive",
+    "topic_suggestions": "interactive",
+}
+
+# Time budget of one Gemini call by module, retries included (see llm_guard.py); below the gunicorn timeout
+LLM_DEFAULT_DEADLINE = float(os.getenv("KIA_LLM_DEADLINE", "60"))
+LLM_DEADLINES = {
+    "kia_chatbot": float(os.getenv("KIA_LLM_DEADLINE_CHAT", "30")),
+    "error_explainer": float(os.getenv("KIA_LLM_DEADLINE_CHAT", "30")),
+    "topic_suggestions": float(os.getenv("KIA_LLM_DEADLINE_CHAT", "30")),
+    "week_summarizer": float(os.getenv("KIA_LLM_DEADLINE_LONG", "90")),
+    "quiz_mock": float(os.getenv("KIA_LLM_DEADLINE_LONG", "90")),
+    "topic_specfic_mock": float(os.getenv("KIA_LLM_DEADLINE_LONG", "90")),
+}
+# Attempts per call for transient failures, and the circuit breaker shared by all calls
+LLM_MAX_ATTEMPTS = int(os.getenv("KIA_LLM_MAX_ATTEMPTS", "3"))
+LLM_BREAKER_FAILURES = int(os.getenv("KIA_LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("KIA_LLM_BREAKER_RESET", "30"))
+
+# Synthetic query used to exercise the model and the HNSW index before real traffic
+WARM_UP_QUERY = "What is the difference between linear regression and logistic regression?"
+
+# Process-wide singletons. Heavy LangChain imports happen inside the accessors
+# so importing this module stays cheap.
+_embeddings = None
+_embedding_cache = None
+_retrieval_cache = None
+_single_flight = None
+_llm_limiter = None
+_llm_guard = None
+_vector_stores: Dict[str, Any] = {}
+_lexical_indexes: Dict[str, Any] = {}
+# Collection version each lexical index was built at
+_lexical_index_versions: Dict[str, int] = {}
+_llm = None
+# Whether _llm takes a per-request `timeout` (set when it is created)
+_llm_request_timeout = False
+_llm_bindings: Dict[tuple, Any] = {}
+
+# Resource key -> names of the modules currently holding it
+_owners: Dict[str, Set[str]] = {}
+_lock = threading.RLock()
+
+
+def get_api_key() -> str:
+    """Get API key for Google Generative AI"""
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY environment variable is not set")
+    return api_key
+
+
+def _track(key: str, owner: Optional[str]):
+    """Record that `owner` holds a reference to the resource `key`"""
+    holders = _owners.setdefault(key, set())
+    if owner:
+        holders.add(owner)
+
+
+def _vector_store_key(persist_directory: str) -> str:
+    return f"vector_store:{os.path.abspath(persist_directory)}"
+
+
+def get_embeddings(owner: Optional[str] = None):
+    """Shared embeddings model (loaded once per process), fronted by the embedding cache"""
+    global _embeddings
+    with _lock:
+        if _embeddings is None:
+            if EMBEDDING_BACKEND == "onnx":
+                from onnx_embeddings import OnnxEmbeddings
+
+                _embeddings = OnnxEmbeddings(ONNX_MODEL_DIR)
+                # Quantized vectors differ slightly, so they get their own cache namespace
+                cache_namespace = f"{EMBEDDING_MODEL_NAME}:onnx-{_embeddings.manifest['quantization']}"
+            else:
+                import model_bundle
+
+                if model_bundle.is_bundle(EMBEDDING_MODEL_DIR):
+                    _embeddings = model_bundle.load_embeddings(EMBEDDING_MODEL_DIR)
+                else:
+                    from langchain_huggingface import HuggingFaceEmbeddings
+
+                    _embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+                cache_namespace = EMBEDDING_MODEL_NAME
+            if EMBEDDING_CACHE_ENABLED:
+                from embedding_cache import CachedEmbeddings
+
+                _embeddings = CachedEmbeddings(_embeddings, cache_namespace, get_embedding_cache())
+        _track("embeddings", owner)
+        return _embeddings
+
+
+def get_embedding_cache():
+    """Shared on-disk embedding cache"""
+    global _embedding_cache
+    with _lock:
+        if _embedding_cache is None:
+            from embedding_cache import EmbeddingCache
+
+            _embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_SIZE)
+        return _embedding_cache
+
+
+def get_retrieval_cache():
+    """Shared retrieval result cache (one per process)"""
+    global _retrieval_cache
+    with _lock:
+        if _retrieval_cache is None:
+            from retrieval_cache import RetrievalCache
+
+            _retrieval_cache = RetrievalCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL)
+        return _retrieval_cache
+
+
+def get_single_flight():
+    """Shared single-flight coordinator for artifact generation (one per process)"""
+    global _single_flight
+    with _lock:
+        if _single_flight is None:
+            from single_flight import SingleFlight
+
+            _single_flight = SingleFlight(SINGLE_FLIGHT_LOCK_DIR, SINGLE_FLIGHT_TIMEOUT)
+        return _single_flight
+
+
+def get_llm_limiter():
+    """Shared Gemini rate limiter (one per process; the quota itself is shared with LLM_LIMITER_DB)"""
+    global _llm_limiter
+    with _lock:
+        if _llm_limiter is None:
+            from llm_limiter import LLMLimiter
+
+            _llm_limiter = LLMLimiter(
+                LLM_REQUESTS_PER_MINUTE,
+                LLM_TOKENS_PER_MINUTE,
+                max_queue=LLM_MAX_QUEUE,
+                max_wait=LLM_MAX_WAIT,
+                state_path=LLM_LIMITER_DB or None
+            )
+        return _llm_limiter
+
+
+def get_llm_guard():
+    """Shared deadline/retry/circuit breaker layer for Gemini calls (one per process)"""
+    global _llm_guard
+    with _lock:
+        if _llm_guard is None:
+            from llm_guard import CircuitBreaker, LLMGuard
+
+            _llm_guard = LLMGuard(
+                CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET),
+                max_attempts=LLM_MAX_ATTEMPTS
+            )
+        return _llm_guard
+
+
+def get_vector_store(persist_directory: str = DEFAULT_PERSIST_DIRECTORY, owner: Optional[str] = None):
+    """Shared vector store (backend chosen by KIA_VECTOR_BACKEND), one per persist directory"""
+    key = _vector_store_key(persist_directory)
+    with _lock:
+        if key not in _vector_stores:
+            if VECTOR_BACKEND == "numpy":
+                import numpy_store
+
+                # Export (or refresh) the NumPy copy of the Chroma collection on first use
+                numpy_store.refresh(persist_directory)
+                _vector_stores[key] = numpy_store.NumpyVectorStore(
+                    get_embeddings(owner=key),
+                    numpy_store.get_store_directory(persist_directory)
+                )
+            else:
+                from langchain_chroma import Chroma
+
+                _vector_stores[key] = Chroma(
+                    collection_name=COLLECTION_NAME,
+                    embedding_function=get_embeddings(owner=key),
+                    persist_directory=persist_directory
+                )
+        _track(key, owner)
+        return _vector_stores[key]
+
+
+def get_ingest_vector_store(persist_directory: str = DEFAULT_PERSIST_DIRECTORY, owner: Optional[str] = None):
+    """
+Vector store that ingestion writes to: always the Chroma collection.
+
+With the NumPy backend the store returned by get_vector_store is a read-only
+export of this collection; call refresh_vector_store once the writes are done.
+    """
+    if VECTOR_BACKEND != "numpy":
+        return get_vector_store(persist_directory, owner=owner)
+
+    key = _vector_store_key(persist_directory) + ":chroma"
+    with _lock:
+        if key not in _vector_stores:
+            from langchain_chroma import Chroma
+
+            _vector_stores[key] = Chroma(
+                collection_name=COLLECTION_NAME,
+                embedding_function=get_embeddings(owner=key),
+                persist_directory=persist_directory
+            )
+        _track(key, owner)
+        return _vector_stores[key]
+
+
+def refresh_vector_store(persist_directory: str = DEFAULT_PERSIST_DIRECTORY):
+    """Bring the NumPy export up to date after writes to the Chroma collection (no-op for Chroma)"""
+    if VECTOR_BACKEND != "numpy":
+        return
+    import numpy_store
+
+    numpy_store.build(persist_directory)
+    with _lock:
+        vector_store = _vector_stores.get(_vector_store_key(persist_directory))
+        if vector_store is not None:
+            vector_store.reload()
+
+
+def get_lexical_index(persist_directory: str = DEFAULT_PERSIST_DIRECTORY, owner: Optional[str] = None):
+    """
+Shared BM25 index over the same collection as get_vector_store.
+
+Built on first use and rebuilt when the collection changes (its corpus_index
+collection version, which every ingest bumps, or its number of chunks), so it
+never drifts from what the vector search returns. Callers should look it up
+per query rather than keep it.
+    """
+    key = _vector_store_key(persist_directory)
+    with _lock:
+        vector_store = get_vector_store(persist_directory, owner=owner)
+        index = _lexical_indexes.get(key)
+        import corpus_index
+        from numpy_store import collection_of
+
+        version = corpus_index.get_collection_version(persist_directory)
+        if (index is None or _lexical_index_versions.get(key) != version
+                or len(index) != collection_of(vector_store).count()):
+            from lexical_index import LexicalIndex
+
+            index = _lexical_indexes[key] = LexicalIndex.from_vector_store(vector_store)
+            _lexical_index_versions[key] = version
+        return index
+
+
+def get_llm(owner: Optional[str] = None, **generation_config):
+    """
+Shared Gemini client.
+
+Per-module settings such as temperature or max_output_tokens are applied as a
+bound generation config, so every module talks to the same underlying client.
+Every call goes through the shared rate limiter, queued by the owner's
+priority class (LLM_PRIORITIES), and through the shared guard, with the
+owner's deadline (LLM_DEADLINES), retries and the circuit breaker.
+    """
+    global _llm, _llm_request_timeout
+    with _lock:
+        if _llm is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            from llm_limiter import LimiterCallback
+
+            # The guard retries within each call's deadline; the client must not retry on its own
+            _llm = ChatGoogleGenerativeAI(
+                model=LLM_MODEL_NAME,
+                google_api_key=get_api_key(),
+                max_retries=0,
+                callbacks=[LimiterCallback(get_llm_limiter())]
+            )
+            _llm_request_timeout = isinstance(_llm, ChatGoogleGenerativeAI)
+        _track("llm", owner)
+
+        binding_key = (owner,) + tuple(sorted(generation_config.items()))
+        if binding_key not in _llm_bindings:
+            from llm_guard import GuardedLLM
+
+            llm = _llm.bind(generation_config=dict(generation_config)) if generation_config else _llm
+            llm = GuardedLLM(llm, get_llm_guard(), LLM_DEADLINES.get(owner, LLM_DEFAULT_DEADLINE),
+                             request_timeout=_llm_request_timeout)
+            # The limiter callback reads the priority from the call's metadata
+            _llm_bindings[binding_key] = llm.with_config(metadata={"llm_priority": LLM_PRIORITIES.get(owner, "batch")})
+        return _llm_bindings[binding_key]
+
+
+def release(owner: str) -> Dict[str, int]:
+    """
+Drop every reference held by `owner` and free resources nobody holds anymore.
+
+Args:
+owner: The name the module used when acquiring resources
+
+Returns:
+Remaining reference counts per resource
+    """
+    global _embeddings, _llm
+    with _lock:
+        for holders in _owners.values():
+            holders.discard(owner)
+
+        for key in [k for k in _vector_stores if not _owners.get(k)]:
+            del _vector_stores[key]
+            _lexical_indexes.pop(key, None)
+            _lexical_index_versions.pop(key, None)
+            _owners.pop(key, None)
+            # The store itself held a reference on the embeddings
+            _owners.get("embeddings", set()).discard(key)
+
+        if _embeddings is not None and not _owners.get("embeddings"):
+            _embeddings = None
+            _owners.pop("embeddings", None)
+
+        if _llm is not None and not _owners.get("llm"):
+            _llm = None
+            _llm_bindings.clear()
+            _owners.pop("llm", None)
+
+        return reference_counts()
+
+
+def warm_up(persist_directory: str = DEFAULT_PERSIST_DIRECTORY, query: str = WARM_UP_QUERY) -> Dict[str, float]:
+    """
+Load the embeddings model and vector store and run one synthetic query.
+
+Called in the gunicorn master (see gunicorn.conf.py) so the model weights
+and the HNSW index are already in memory when workers are forked, and the
+first student request in each worker is not a cold one.
+
+Args:
+persist_directory: Directory for the vector store
+query: Query used for the warm-up search
+
+Returns:
+Seconds spent on each warm-up step
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    get_embeddings(owner="warm_up")
+    timings["embeddings"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vector_store = get_vector_store(persist_directory, owner="warm_up")
+    timings["vector_store"] = time.perf_counter() - start
+
+    # Runs the transformer forward pass and loads the HNSW segment from disk
+    start = time.perf_counter()
+    vector_store.similarity_search(query, k=1)
+    timings["first_query"] = time.perf_counter() - start
+
+    return {step: round(seconds, 4) for step, seconds in timings.items()}
+
+
+def after_fork():
+    """
+Reset handles that must not be shared between a forked worker and its parent.
+
+The embeddings model and the loaded HNSW index (or NumPy matrix) are kept
+(their pages stay shared copy-on-write). The Chroma SQLite connections are replaced with a
+fresh per-worker pool (as are the embedding cache connections), and the
+gRPC based Gemini client is dropped so each worker builds its own on first use,
+along with its rate limiter and guard (whose call threads don't survive fork).
+    """
+    global _llm, _llm_limiter, _llm_guard
+    with _lock:
+        _llm = None
+        _llm_limiter = None
+        _llm_guard = None
+        _llm_bindings.clear()
+
+        for vector_store in _vector_stores.values():
+            # The NumPy backend only holds a read-only mmap, which is safe to share
+            if hasattr(vector_store, "_client"):
+                _reset_sqlite_pool(vector_store)
+
+        if _embedding_cache is not None:
+            _embedding_cache.reset_connections()
+
+
+def _reset_sqlite_pool(vector_store):
+    """Give a Chroma client fresh SQLite connections after fork"""
+    from chromadb.db.impl.sqlite import SqliteDB
+
+    sqlite_db = vector_store._client._system.instance(SqliteDB)
+    pool = sqlite_db._conn_pool
+    # The inherited connections are abandoned rather than closed: closing them
+    # in the child would touch file state that belongs to the parent.
+    sqlite_db._conn_pool = type(pool)(pool._db_file, is_uri=pool._is_uri)
+
+
+def reference_counts() -> Dict[str, int]:
+    """Number of modules holding each shared resource"""
+    with _lock:
+        return {key: len(holders) for key, holders in _owners.items()}
+
+
+def current_rss_mb() -> float:
+    """Resident set size of the current process in MiB"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is the peak (KiB on Linux, bytes on macOS), the best we can do elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if peak > 10 ** 7 else peak / 1024
+
+
+def runtime_stats() -> Dict[str, Any]:
+    """Snapshot of what is loaded in this process"""
+    with _lock:
+        return {
+            "pid": os.getpid(),
+            "rss_mb": round(current_rss_mb(), 1),
+            "embeddings_loaded": _embeddings is not None,
+            "embedding_backend": EMBEDDING_BACKEND,
+            "vector_stores": sorted(_vector_stores),
+            "lexical_indexes": {key: len(index) for key, index in _lexical_indexes.items()},
+            "embedding_cache": _embedding_cache.stats() if _embedding_cache is not None else None,
+            "retrieval_cache": _retrieval_cache.stats() if _retrieval_cache is not None else None,
+            "single_flight": _single_flight.stats() if _single_flight is not None else None,
+            "llm_loaded": _llm is not None,
+            "llm_bindings": len(_llm_bindings),
+            "llm_limiter": _llm_limiter.stats() if _llm_limiter is not None else None,
+            "llm_guard": _llm_guard.stats() if _llm_guard is not None else None,
+            "reference_counts": reference_counts()
+        }
@@ -1,8 +1,15 @@
+import time
+
+_boot_started = time.perf_counter()
+
+import logging
+import click
 from flask import Flask
 from config import Config
 from extension import db, jwt, migrate
 from controller import user_routes
 from flask_cors import CORS
+import lazy_ai
 import os
 
 # Initialize Flask app
@@ -10,8 +17,11 @@ app = Flask(__name__)
 
 app.config.from_object(Config)
 
+# Frontends allowed to call the API (also used by the async routes in asgi.py)
+CORS_ORIGINS = ["https://seek-kia.vercel.app", "http://localhost:8080", "http://localhost:8081"]
+
 CORS(app, resources={r"/*": {
-    "origins": ["https://seek-kia.vercel.app", "http://localhost:8080", "http://localhost:8081"],
+    "origins": CORS_ORIGINS,
     "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     "allow_headers": ["Content-Type", "Authorization", "Accept"],
     "supports_credentials": True
@@ -27,5 +37,31 @@ migrate.init_app(app, db)
 app.register_blueprint(user_routes)   # User routes
 
 
+@app.cli.command("warm-up")
+def warm_up_command():
+    """Import the AI modules ahead of the first request."""
+    for name, seconds in lazy_ai.warm_up().items():
+        print(f"{name:<20} {seconds:.3f}s")
+
+
+@app.cli.command("precompute-summaries")
+@click.option("--workers", default=4, show_default=True, help="Summaries generated concurrently.")
+@click.option("--only", type=click.Choice(["lectures", "weeks"]), help="Only do one kind of summary.")
+@click.option("--force", is_flag=True, help="Regenerate summaries that are already current.")
+def precompute_summaries_command(workers, only, force):
+    """Generate every lecture and week summary whose source changed."""
+    import precompute_summaries
+
+    result = precompute_summaries.precompute(app, workers=workers, force=force, only=only)
+    print(f"{result['message']} in {result['seconds']}s")
+    for job in result["failed"]:
+        print(f"  failed: {job}")
+
+
+# Cold-start time for `import app` (the AI stack is not loaded at this point)
+app.config['BOOT_SECONDS'] = round(time.perf_counter() - _boot_started, 4)
+logging.getLogger(__name__).info("App ready in %.3fs", app.config['BOOT_SECONDS'])
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
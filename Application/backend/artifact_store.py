@@ -0,0 +1,570 @@
+"""
+Durable store for generated AI artifacts (lecture/week summaries, notes, mock quizzes).
+
+Artifacts live in the `ai_artifacts` table of the app database, so they
+survive restarts and every gunicorn worker reads the same copy instead of
+paying for its own Gemini call. An artifact is keyed by:
+
+- kind: what was generated ("lecture_summary", "week_summary", "notes", "mcq")
+- params: the request parameters (week, lecture, topic, ...)
+- source hash: SHA-256 of the course content the prompt was built from, so
+  re-ingesting a lecture produces a new artifact instead of a stale one
+- prompt version: bumped by a module when its prompt changes
+
+Concurrent misses for the same key are coalesced into one generation
+(single_flight.py), across threads and workers.
+
+Entries expire after a per-kind TTL and the table is bounded to
+KIA_ARTIFACT_MAX_ENTRIES rows, evicting the least recently read first.
+Expired entries are kept for KIA_ARTIFACT_STALE_DAYS more days: when a new
+generation fails (e.g. Gemini is down and llm_guard.py's circuit is open),
+the last stored version is served instead, marked "stale".
+
+The store needs an app context (every route has one). Without it, or if the
+table is unavailable (e.g. `flask db upgrade` not run yet), results are
+computed but not stored.
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from flask import has_app_context
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+import ai_runtime
+import llm_guard
+from extension import db
+from models import AIArtifact
+
+MAX_ENTRIES = int(os.getenv("KIA_ARTIFACT_MAX_ENTRIES", "5000"))
+
+# Per-kind lifetime; None never expires. Summaries only change with the
+# source (which is part of the key), quizzes are regenerated for variety.
+ARTIFACT_TTLS: Dict[str, Optional[timedelta]] = {
+    "lecture_summary": timedelta(days=30),
+    "week_summary": timedelta(days=30),
+    "notes": timedelta(days=7),
+    "mcq": timedelta(days=1),
+}
+DEFAULT_TTL = timedelta(days=7)
+
+# How long expired artifacts remain available as a fallback for failed generations
+STALE_GRACE = timedelta(days=int(os.getenv("KIA_ARTIFACT_STALE_DAYS", "7")))
+
+# Reads write last_accessed_at (for eviction) at most this often per artifact;
+# the hits in between are counted in memory and added with the next write
+ACCESS_INTERVAL = timedelta(seconds=int(os.getenv("KIA_ARTIFACT_ACCESS_SECONDS", "300")))
+
+logger = logging.getLogger(__name__)
+
+# Hits not written to hit_count yet, by cache key
+_pending_hits: Dict[str, int] = {}
+_pending_lock = threading.Lock()
+
+# Generations in flight on this process's event loop (async serving mode), by key
+_async_calls: Dict[str, "asyncio.Future"] = {}
+
+
+def content_hash(text: str) -> str:
+    """Hash of the source content an artifact was generated from"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_key(kind: str, params: Dict[str, Any], source_hash: str, prompt_version: str) -> str:
+    key = json.dumps([kind, params, source_hash, prompt_version], sort_keys=True)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _to_json(value: Any) -> Any:
+    """json.dumps fallback for pydantic models returned by output parsers"""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if hasattr(value, "dict"):
+        return value.dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+@contextmanager
+def _write_session() -> Iterator[Session]:
+    """
+Session of its own for writes, committed on exit (rolled back on error), so
+storing or removing artifacts never commits or discards the request's work.
+    """
+    with Session(db.engine) as session, session.begin():
+        yield session
+
+
+def get(kind: str, params: Dict[str, Any], source_hash: str, prompt_version: str) -> Optional[Dict[str, Any]]:
+    """Stored artifact, or None if it is missing or expired"""
+    if not has_app_context():
+        return None
+
+    now = datetime.utcnow()
+    # Rows are written through _write_session, so never trust a copy this session loaded earlier
+    artifact = (
+        AIArtifact.query.filter_by(cache_key=make_key(kind, params, source_hash, prompt_version))
+        .populate_existing()
+        .first()
+    )
+    if artifact is None:
+        return None
+    if artifact.expires_at is not None and artifact.expires_at <= now:
+        # Kept as a fallback until evict() drops it (see get_fallback)
+        return None
+
+    _record_access(artifact, now)
+    return json.loads(artifact.payload)
+
+
+def _record_access(artifact: AIArtifact, now: datetime):
+    """
+Count a read of `artifact`. The row is updated at most once per ACCESS_INTERVAL,
+on a connection of its own, so reads don't commit the request's session.
+    """
+    with _pending_lock:
+        hits = _pending_hits.pop(artifact.cache_key, 0) + 1
+        if now - artifact.last_accessed_at < ACCESS_INTERVAL:
+            _pending_hits[artifact.cache_key] = hits
+            return
+
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(
+                db.update(AIArtifact)
+                .where(AIArtifact.id == artifact.id)
+                .values(hit_count=AIArtifact.hit_count + hits, last_accessed_at=now)
+            )
+    except SQLAlchemyError as e:
+        # e.g. the database is locked; the hits are added with the next write
+        logger.warning("Could not record artifact access: %s", e)
+        with _pending_lock:
+            _pending_hits[artifact.cache_key] = _pending_hits.get(artifact.cache_key, 0) + hits
+        return
+
+    # Keep the session's copy current without marking it as changed
+    set_committed_value(artifact, "hit_count", artifact.hit_count + hits)
+    set_committed_value(artifact, "last_accessed_at", now)
+
+
+def get_fallback(kind: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+Most recently stored version of an artifact, whatever its source, prompt
+version or expiry, marked "stale": True. Served when generating a fresh one
+failed.
+    """
+    if not has_app_context():
+        return None
+    artifact = (
+        AIArtifact.query.filter_by(kind=kind, params=json.dumps(params, sort_keys=True))
+        .order_by(AIArtifact.created_at.desc())
+        .first()
+    )
+    if artifact is None:
+        return None
+    return {**json.loads(artifact.payload), "stale": True}
+
+
+def exists(kind: str, params: Dict[str, Any], source_hash: str, prompt_version: str) -> bool:
+    """Whether an unexpired artifact is stored for the key (does not count as a read)"""
+    if not has_app_context():
+        return False
+    artifact = (
+        AIArtifact.query.filter_by(cache_key=make_key(kind, params, source_hash, prompt_version))
+        .populate_existing()
+        .first()
+    )
+    return artifact is not None and (artifact.expires_at is None or artifact.expires_at > datetime.utcnow())
+
+
+def put(kind: str, params: Dict[str, Any], source_hash: str, prompt_version: str, result: Dict[str, Any]):
+    """Store an artifact (replacing an existing one with the same key) and enforce the size bound"""
+    if not has_app_context():
+        return
+
+    now = datetime.utcnow()
+    ttl = ARTIFACT_TTLS.get(kind, DEFAULT_TTL)
+    payload = json.dumps(result, default=_to_json)
+    cache_key = make_key(kind, params, source_hash, prompt_version)
+
+    try:
+        with _write_session() as session:
+            artifact = (session.query(AIArtifact).filter_by(cache_key=cache_key).first()
+                        or AIArtifact(cache_key=cache_key))
+            artifact.kind = kind
+            artifact.params = json.dumps(params, sort_keys=True)
+            artifact.source_hash = source_hash
+            artifact.prompt_version = prompt_version
+            artifact.payload = payload
+            artifact.size_bytes = len(payload)
+            artifact.created_at = now
+            artifact.expires_at = now + ttl if ttl is not None else None
+            artifact.last_accessed_at = now
+            artifact.hit_count = artifact.hit_count or 0
+            session.add(artifact)
+            # Artifacts for the same request built from older content or prompts are superseded
+            session.query(AIArtifact).filter(
+                AIArtifact.kind == kind,
+                AIArtifact.params == artifact.params,
+                AIArtifact.cache_key != cache_key
+            ).delete(synchronize_session=False)
+    except IntegrityError:
+        # Another worker stored the same artifact first
+        return
+
+    evict()
+
+
+def evict(max_entries: int = MAX_ENTRIES) -> int:
+    """
+Drop artifacts expired for longer than STALE_GRACE, then the least recently
+read ones beyond `max_entries`.
+
+Returns:
+Number of artifacts removed
+    """
+    with _write_session() as session:
+        removed = session.query(AIArtifact).filter(
+            AIArtifact.expires_at <= datetime.utcnow() - STALE_GRACE
+        ).delete(synchronize_session=False)
+
+        excess = session.query(AIArtifact).count() - max_entries
+        if excess > 0:
+            oldest = (
+                session.query(AIArtifact.id)
+                .order_by(AIArtifact.last_accessed_at, AIArtifact.id)
+                .limit(excess)
+                .subquery()
+            )
+            removed += session.query(AIArtifact).filter(AIArtifact.id.in_(db.select(oldest.c.id))).delete(
+                synchronize_session=False
+            )
+    return removed
+
+
+def get_or_create(
+        kind: str,
+        params: Dict[str, Any],
+        source_hash: str,
+        prompt_version: str,
+        compute: Callable[[], Dict[str, Any]],
+        should_store: Optional[Callable[[Dict[str, Any]], bool]] = None
+) -> Dict[str, Any]:
+    """
+Stored artifact for the key, generating and storing it on a miss.
+
+Only successful results are stored, so failures are retried on the next
+request. A failed result, or Gemini being unavailable (compute raising an
+open circuit, a deadline or an exhausted retry, see llm_guard.is_unavailable),
+is replaced by the last stored version of the artifact, if any (see get_fallback).
+
+Args:
+kind: Artifact type (see ARTIFACT_TTLS)
+params: Request parameters (JSON-serializable)
+source_hash: content_hash of the source content used in the prompt
+prompt_version: Version of the prompt that generates the artifact
+compute: Generates the result dictionary
+should_store: Decides whether a result is kept (default: its "success" flag)
+
+Returns:
+Result dictionary
+    """
+    try:
+        stored = get(kind, params, source_hash, prompt_version)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.warning("Artifact store unavailable, generating %s without it: %s", kind, e)
+        return compute()
+    if stored is not None:
+        return stored
+
+    def generate():
+        result = compute()
+        if _storable(result, should_store):
+            _store_safely(kind, params, source_hash, prompt_version, result)
+        return result
+
+    try:
+        # Concurrent requests for the same artifact (in this worker or another) share one generation
+        result = ai_runtime.get_single_flight().do(
+            make_key(kind, params, source_hash, prompt_version),
+            generate,
+            lookup=lambda: get(kind, params, source_hash, prompt_version)
+        )
+    except Exception as e:
+        fallback = _fallback_on_error(kind, params, e)
+        if fallback is None:
+            raise
+        return fallback
+    if not _storable(result, should_store):
+        return _fallback_safely(kind, params) or result
+    return result
+
+
+def stream_or_create(
+        kind: str,
+        params: Dict[str, Any],
+        source_hash: str,
+        prompt_version: str,
+        stream: Callable[[], Iterator[str]],
+        make_result: Callable[[str], Dict[str, Any]],
+        text_field: str
+) -> Iterator[Dict[str, Any]]:
+    """
+Streaming counterpart of get_or_create for text artifacts.
+
+A stored artifact is sent as a single token event. Otherwise the text chunks
+of `stream()` are forwarded as they arrive, and the completed result is
+stored once the stream ends. A client that disconnects early stores nothing.
+Streams are not coalesced with other generations of the same key.
+
+Args:
+kind: Artifact type (see ARTIFACT_TTLS)
+params: Request parameters (JSON-serializable)
+source_hash: content_hash of the source content used in the prompt
+prompt_version: Version of the prompt that generates the artifact
+stream: Yields the generated text in chunks
+make_result: Builds the result dictionary from the complete text
+text_field: Key of the generated text in the result dictionary
+
+Yields:
+{"event": "token", "data": {"text": ...}} per chunk, then {"event": "done", "data": result}
+with cached, ttft_ms and total_ms added. If Gemini is unavailable before the
+first chunk, the last stored version is sent the same way (marked "stale").
+Other errors from `stream` propagate.
+    """
+    started = time.perf_counter()
+    try:
+        stored = get(kind, params, source_hash, prompt_version)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.warning("Artifact store unavailable, streaming %s without it: %s", kind, e)
+        stored = None
+
+    if stored is not None:
+        yield from _stored_events(stored, text_field, started)
+        return
+
+    chunks = []
+    ttft_ms = None
+    try:
+        for text in stream():
+            if not text:
+                continue
+            if ttft_ms is None:
+                ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+            chunks.append(text)
+            yield {"event": "token", "data": {"text": text}}
+    except Exception as e:
+        # Text already sent can't be replaced by another version
+        fallback = None if chunks else _fallback_on_error(kind, params, e)
+        if fallback is None:
+            raise
+        yield from _stored_events(fallback, text_field, started)
+        return
+
+    result = make_result("".join(chunks))
+    if result.get("success") and chunks:
+        _store_safely(kind, params, source_hash, prompt_version, result)
+
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info("Streamed %s: ttft %s ms, total %s ms", kind, ttft_ms, total_ms)
+    yield {"event": "done", "data": {**result, "cached": False, "ttft_ms": ttft_ms, "total_ms": total_ms}}
+
+
+def _stored_events(stored: Dict[str, Any], text_field: str, started: float) -> List[Dict[str, Any]]:
+    """Events sending a stored artifact at once"""
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    return [
+        {"event": "token", "data": {"text": stored[text_field]}},
+        {"event": "done", "data": {**stored, "cached": True, "ttft_ms": elapsed_ms, "total_ms": elapsed_ms}},
+    ]
+
+
+def _fallback_on_error(kind: str, params: Dict[str, Any], error: Exception) -> Optional[Dict[str, Any]]:
+    """Last stored version to serve when generating failed with `error` (only if Gemini was unavailable)"""
+    if not llm_guard.is_unavailable(error):
+        return None
+    logger.warning("Gemini unavailable for %s: %s", kind, error)
+    return _fallback_safely(kind, params)
+
+
+def _storable(result: Dict[str, Any], should_store: Optional[Callable[[Dict[str, Any]], bool]]) -> bool:
+    return should_store(result) if should_store else bool(result.get("success"))
+
+
+def _fallback_safely(kind: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    try:
+        fallback = get_fallback(kind, params)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.warning("Artifact store unavailable for %s: %s", kind, e)
+        return None
+    if fallback is not None:
+        logger.warning("Generating %s %s failed, serving the last stored version", kind, params)
+    return fallback
+
+
+def _store_safely(kind: str, params: Dict[str, Any], source_hash: str, prompt_version: str,
+                  result: Dict[str, Any]):
+    try:
+        put(kind, params, source_hash, prompt_version, result)
+    except SQLAlchemyError as e:
+        logger.warning("Could not store %s artifact: %s", kind, e)
+
+
+def _get_safely(kind: str, params: Dict[str, Any], source_hash: str, prompt_version: str) -> Optional[Dict[str, Any]]:
+    try:
+        return get(kind, params, source_hash, prompt_version)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.warning("Artifact store unavailable for %s: %s", kind, e)
+        return None
+
+
+async def aget_or_create(
+        kind: str,
+        params: Dict[str, Any],
+        source_hash: str,
+        prompt_version: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+        should_store: Optional[Callable[[Dict[str, Any]], bool]] = None
+) -> Dict[str, Any]:
+    """
+Async get_or_create for the async serving mode (asgi.py).
+
+Database access runs in a worker thread. Concurrent requests for the same key
+on this event loop await one generation. Failed results and an unavailable
+Gemini fall back to the last stored version, as in get_or_create.
+
+Args:
+kind: Artifact type (see ARTIFACT_TTLS)
+params: Request parameters (JSON-serializable)
+source_hash: content_hash of the source content used in the prompt
+prompt_version: Version of the prompt that generates the artifact
+compute: Coroutine function generating the result dictionary
+should_store: Decides whether a result is kept (default: its "success" flag)
+
+Returns:
+Result dictionary
+    """
+    stored = await asyncio.to_thread(_get_safely, kind, params, source_hash, prompt_version)
+    if stored is not None:
+        return stored
+
+    key = make_key(kind, params, source_hash, prompt_version)
+    in_flight = _async_calls.get(key)
+    try:
+        if in_flight is not None:
+            result = copy.deepcopy(await asyncio.shield(in_flight))
+        else:
+            future = _async_calls[key] = asyncio.get_running_loop().create_future()
+            # Nobody may be waiting; don't let an unobserved failure be logged as "never retrieved"
+            future.add_done_callback(lambda done: done.cancelled() or done.exception())
+            try:
+                result = await compute()
+                if _storable(result, should_store):
+                    await asyncio.to_thread(_store_safely, kind, params, source_hash, prompt_version, result)
+                future.set_result(result)
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                del _async_calls[key]
+    except Exception as e:
+        fallback = await asyncio.to_thread(_fallback_on_error, kind, params, e)
+        if fallback is None:
+            raise
+        return fallback
+
+    if not _storable(result, should_store):
+        return await asyncio.to_thread(_fallback_safely, kind, params) or result
+    return result
+
+
+async def astream_or_create(
+        kind: str,
+        params: Dict[str, Any],
+        source_hash: str,
+        prompt_version: str,
+        stream: Callable[[], AsyncIterator[str]],
+        make_result: Callable[[str], Dict[str, Any]],
+        text_field: str
+) -> AsyncIterator[Dict[str, Any]]:
+    """Async stream_or_create for the async serving mode (same events)"""
+    started = time.perf_counter()
+    stored = await asyncio.to_thread(_get_safely, kind, params, source_hash, prompt_version)
+    if stored is not None:
+        for event in _stored_events(stored, text_field, started):
+            yield event
+        return
+
+    chunks = []
+    ttft_ms = None
+    try:
+        async for text in stream():
+            if not text:
+                continue
+            if ttft_ms is None:
+                ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+            chunks.append(text)
+            yield {"event": "token", "data": {"text": text}}
+    except Exception as e:
+        fallback = None if chunks else await asyncio.to_thread(_fallback_on_error, kind, params, e)
+        if fallback is None:
+            raise
+        for event in _stored_events(fallback, text_field, started):
+            yield event
+        return
+
+    result = make_result("".join(chunks))
+    if result.get("success") and chunks:
+        await asyncio.to_thread(_store_safely, kind, params, source_hash, prompt_version, result)
+
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info("Streamed %s: ttft %s ms, total %s ms", kind, ttft_ms, total_ms)
+    yield {"event": "done", "data": {**result, "cached": False, "ttft_ms": ttft_ms, "total_ms": total_ms}}
+
+
+def discard(kind: str, params: Dict[str, Any]) -> int:
+    """Remove every stored version of one artifact; returns the number removed"""
+    if not has_app_context():
+        return 0
+    with _write_session() as session:
+        removed = session.query(AIArtifact).filter_by(kind=kind, params=json.dumps(params, sort_keys=True)).delete(
+            synchronize_session=False
+        )
+    return removed
+
+
+def clear(kind: Optional[str] = None) -> int:
+    """Remove stored artifacts (all, or of one kind); returns the number removed"""
+    if not has_app_context():
+        return 0
+    with _write_session() as session:
+        query = session.query(AIArtifact) if kind is None else session.query(AIArtifact).filter_by(kind=kind)
+        removed = query.delete(synchronize_session=False)
+    if kind is None:
+        with _pending_lock:
+            _pending_hits.clear()
+    return removed
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """Count, total size and hits of the stored artifacts per kind"""
+    rows = (
+        db.session.query(AIArtifact.kind, db.func.count(AIArtifact.id), db.func.sum(AIArtifact.size_bytes),
+                         db.func.sum(AIArtifact.hit_count))
+        .group_by(AIArtifact.kind)
+        .all()
+    )
+    return {kind: {"count": count, "size_bytes": size or 0, "hits": hits or 0} for kind, count, size, hits in rows}
@@ -0,0 +1,208 @@
+"""
+Async serving mode.
+
+Under gunicorn's sync workers every AI route holds a worker for the whole
+Gemini call (seconds), so a worker serves one generation at a time. This
+ASGI app serves the AI routes with ainvoke/astream on one event loop instead:
+while Gemini writes, the process keeps accepting and serving other requests,
+so one process holds hundreds of generations in flight. Retrieval, the
+artifact store and chat history (blocking Chroma/SQLite calls) run in worker
+threads.
+
+Async routes (same request and response bodies as controller.py):
+    POST /kia_chat, /kia_chat/stream
+    POST /generate_notes, /generate_week_summary   (both with the stream mode)
+    POST /video_summarizer
+
+Every other route is the Flask app, mounted as WSGI (run in a thread pool).
+
+Usage (from Application/backend):
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import app as flask_app, CORS_ORIGINS
+from controller import sse_event
+from lazy_ai import lazy_import
+from models import Week
+
+week_summarizer = lazy_import("week_summarizer")
+lecture_summarizer = lazy_import("lecture_summarizer")
+kia_chatbot = lazy_import("kia_chatbot")
+notes_generator = lazy_import("notes_generator")
+
+# Threads for blocking work: retrieval, database access, and Gemini calls queued by the rate limiter
+ASYNC_THREADS = int(os.getenv("KIA_ASYNC_THREADS", "128"))
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx from buffering the stream
+    "X-Accel-Buffering": "no"
+}
+
+
+def with_app_context(handler):
+    """Run a handler inside a Flask app context (database and artifact store access)"""
+    @functools.wraps(handler)
+    async def wrapper(request):
+        with flask_app.app_context():
+            return await handler(request)
+    return wrapper
+
+
+async def read_json(request) -> dict:
+    """JSON request body ({} when it is missing or not an object)"""
+    try:
+        data = await request.json()
+    except (ValueError, UnicodeDecodeError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def wants_stream(request, data) -> bool:
+    """Whether a request asked for an event stream ({"stream": true} or Accept: text/event-stream)"""
+    accept = request.headers.get("accept", "").split(",")[0].split(";")[0].strip()
+    return bool(data.get("stream")) or accept == "text/event-stream"
+
+
+def sse_response(events) -> StreamingResponse:
+    """Stream (event, data) dicts from an async generator function as text/event-stream"""
+    async def generate():
+        # The handler's app context is gone once the body is sent, so the stream has its own
+        with flask_app.app_context():
+            async for item in events():
+                yield sse_event(item["event"], item["data"])
+
+    return StreamingResponse(generate(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@with_app_context
+async def video_summarizer(request):
+    """Async /video_summarizer"""
+    data = await read_json(request)
+    week_id = data.get("week_id")
+
+    if not week_id:
+        return JSONResponse({"message": "week_id is required", "success": False}, status_code=400)
+
+    result = await lecture_summarizer.asummarize_lecture(week_id, 1)
+
+    return JSONResponse(result, status_code=200 if result["success"] else 404)
+
+
+async def chat_with_kia(request):
+    """Async /kia_chat"""
+    data = await read_json(request)
+    user_id = data.get("user_id")
+    query = data.get("query")
+
+    if not all([user_id, query]):
+        return JSONResponse({"success": False, "message": "Missing required fields"}, status_code=400)
+
+    result = await kia_chatbot.aget_answer(user_id, query)
+
+    return JSONResponse(result, status_code=200 if result["success"] else 500)
+
+
+async def stream_chat_with_kia(request):
+    """Async /kia_chat/stream"""
+    data = await read_json(request)
+    user_id = data.get("user_id")
+    query = data.get("query")
+
+    if not all([user_id, query]):
+        return JSONResponse({"success": False, "message": "Missing required fields"}, status_code=400)
+
+    return sse_response(lambda: kia_chatbot.astream_answer(user_id, query))
+
+
+@with_app_context
+async def generate_week_summary(request):
+    """Async /generate_week_summary"""
+    data = await read_json(request)
+    week_id = data.get("week_id")
+
+    if not week_id:
+        return JSONResponse({"message": "week_id is required", "success": False}, status_code=400)
+
+    week = await asyncio.to_thread(Week.query.get, week_id)
+    if not week:
+        return JSONResponse({"message": "Week not found", "success": False}, status_code=404)
+
+    week_number = week.week_number
+
+    if wants_stream(request, data):
+        return sse_response(lambda: week_summarizer.astream_week_summary(week_number))
+
+    result = await week_summarizer.asummarize_week_slides(week_number)
+
+    return JSONResponse(result, status_code=200 if result["success"] else 404)
+
+
+@with_app_context
+async def generate_notes(request):
+    """Async /generate_notes"""
+    data = await read_json(request)
+    topic = data.get("topic")
+
+    if not topic:
+        return JSONResponse({"message": "topic is required", "success": False}, status_code=400)
+
+    if wants_stream(request, data):
+        return sse_response(lambda: notes_generator.astream_topic_notes(topic))
+
+    result = await notes_generator.agenerate_topic_notes(topic)
+
+    if result["success"]:
+        return JSONResponse({
+            "message": f'Notes generated successfully for topic "{topic}"',
+            "success": True,
+            "topic": topic,
+            "notes": result["notes"]
+        }, status_code=200)
+    return JSONResponse({
+        "message": result["message"],
+        "success": False,
+        "topic": topic
+    }, status_code=404)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # asyncio.to_thread and LangChain's callbacks run on the default executor
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(ASYNC_THREADS))
+    yield
+
+
+app = Starlette(
+    lifespan=lifespan,
+    routes=[
+        Route("/video_summarizer", video_summarizer, methods=["POST"]),
+        Route("/kia_chat", chat_with_kia, methods=["POST"]),
+        Route("/kia_chat/stream", stream_chat_with_kia, methods=["POST"]),
+        Route("/generate_week_summary", generate_week_summary, methods=["POST"]),
+        Route("/generate_notes", generate_notes, methods=["POST"]),
+        # Everything else is served by the Flask app
+        Mount("/", app=WSGIMiddleware(flask_app)),
+    ],
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=CORS_ORIGINS,
+            allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+            allow_headers=["Content-Type", "Authorization", "Accept"],
+            allow_credentials=True
+        )
+    ]
+)
@@ -0,0 +1,259 @@
+"""
+Throughput of the sync workers against the async serving mode.
+
+Starts the backend twice, gunicorn with sync workers (the current deployment)
+and uvicorn serving asgi:app in a single process, and drives both with the
+same concurrent load on one AI route. Gemini is replaced by a stand-in chat
+model that answers after a fixed delay (--llm-latency), so runs are free and
+repeatable and measure the server rather than Gemini; retrieval, chat history
+and the artifact store are the real ones. --real-llm calls Gemini instead.
+
+Every request is distinct (a new Kia user, or a new notes topic, tagged with
+the run's start time), so nothing is served from a cache or chat history.
+
+Reported per mode: requests/s, p50/p95/max latency and failed requests.
+
+Usage (from Application/backend):
+    python -m benchmarks.async_throughput
+    python -m benchmarks.async_throughput --concurrency 200 --requests 1000 --workers 4
+    python -m benchmarks.async_throughput --route notes --llm-latency 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_LLM_LATENCY_SECONDS = 2.0
+STARTUP_TIMEOUT_SECONDS = 120
+STAND_IN_ANSWER = "## Pipelines\n\nSee Lecture 3.8 - Chaining Transformers."
+
+
+def make_slow_chat_model(latency: float):
+    """Chat model that answers STAND_IN_ANSWER after `latency` seconds (blocking and async)"""
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    class SlowChatModel(BaseChatModel):
+        latency: float
+
+        @property
+        def _llm_type(self) -> str:
+            return "slow-stand-in"
+
+        def _result(self):
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=STAND_IN_ANSWER))])
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            time.sleep(self.latency)
+            return self._result()
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            await asyncio.sleep(self.latency)
+            return self._result()
+
+    return SlowChatModel(latency=latency)
+
+
+def serve(mode: str, port: int, workers: int, llm_latency: float, real_llm: bool):
+    """Run the backend in this process (used by the benchmark through a subprocess)"""
+    if not real_llm:
+        import ai_runtime
+
+        # Set before gunicorn forks, so every worker inherits the stand-in
+        ai_runtime._llm = make_slow_chat_model(llm_latency)
+
+    if mode == "async":
+        import uvicorn
+
+        from asgi import app
+
+        uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+        return
+
+    from gunicorn.app.base import BaseApplication
+
+    from app import app
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in {"bind": f"127.0.0.1:{port}", "workers": workers, "worker_class": "sync",
+                               "timeout": 300, "loglevel": "warning"}.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    Server().run()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _request(route: str, run: int, i: int):
+    """Path and body of the i-th request of a run (distinct, so nothing is cached)"""
+    if route == "kia":
+        return "/kia_chat", {"user_id": run * 100_000 + i, "query": "How do I chain transformers in sklearn?"}
+    return "/generate_notes", {"topic": f"pipelines and column transformers ({run}-{i})"}
+
+
+async def _load(base_url: str, route: str, run: int, requests: int, concurrency: int, offset: int) -> Dict:
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failures = 0
+
+    async def one(client, i):
+        nonlocal failures
+        path, body = _request(route, run, offset + i)
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                ok = response.status_code == 200 and response.json().get("success", False)
+            except (httpx.HTTPError, ValueError):
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                failures += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=600, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*[one(client, i) for i in range(requests)])
+        wall = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1) if latencies else None
+
+    return {
+        "requests": requests,
+        "failed": failures,
+        "seconds": round(wall, 2),
+        "requests_per_second": round(len(latencies) / wall, 2),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else None,
+    }
+
+
+def _wait_until_up(base_url: str, process: subprocess.Popen):
+    import httpx
+
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            if httpx.get(base_url + "/", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"server did not start within {STARTUP_TIMEOUT_SECONDS}s")
+
+
+def run_mode(mode: str, args, run: int) -> Dict:
+    """Start one server, warm it up and put it under load"""
+    port = _free_port()
+    command = [sys.executable, "-m", "benchmarks.async_throughput", "serve", "--mode", mode,
+               "--port", str(port), "--workers", str(args.workers), "--llm-latency", str(args.llm_latency)]
+    if args.real_llm:
+        command.append("--real-llm")
+
+    process = subprocess.Popen(command, cwd=BACKEND_DIR)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_until_up(base_url, process)
+        # Untimed round so every worker has loaded the embedding model and vector store
+        warm_up = args.workers * 2
+        asyncio.run(_load(base_url, args.route, run, warm_up, warm_up, offset=0))
+        result = asyncio.run(_load(base_url, args.route, run, args.requests, args.concurrency, offset=warm_up))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    result["processes"] = args.workers if mode == "sync" else 1
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(report: Dict):
+    llm = "Gemini" if report["real_llm"] else f"stand-in LLM, {report['llm_latency']}s per call"
+    print(f"route {report['route']}, {report['requests']} requests, concurrency {report['concurrency']} ({llm})")
+    print(f"\n{'mode':<8}{'procs':>6}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'failed':>8}")
+    for mode, result in report["modes"].items():
+        print(f"{mode:<8}{result['processes']:>6}{result['requests_per_second']:>9.2f}{str(result['p50_ms']):>10}"
+              f"{str(result['p95_ms']):>10}{str(result['max_ms']):>10}{result['failed']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", choices=["run", "serve"], default="run")
+    parser.add_argument("--route", choices=["kia", "notes"], default="kia")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100, help="Requests in flight at once")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn sync workers")
+    parser.add_argument("--modes", nargs="+", choices=["sync", "async"], default=["sync", "async"])
+    parser.add_argument("--llm-latency", type=float, default=DEFAULT_LLM_LATENCY_SECONDS,
+                        help="Seconds the stand-in LLM takes per call")
+    parser.add_argument("--real-llm", action="store_true", help="Call Gemini instead of the stand-in")
+    parser.add_argument("--mode", choices=["sync", "async"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--json", help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.mode, args.port, args.workers, args.llm_latency, args.real_llm)
+        return
+
+    started = int(time.time())
+    report = {
+        "git_commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "route": args.route,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "llm_latency": args.llm_latency,
+        "real_llm": args.real_llm,
+        # Each mode gets its own run tag so the second mode doesn't see the first one's users
+        "modes": {mode: run_mode(mode, args, started + n) for n, mode in enumerate(args.modes)},
+    }
+    print_report(report)
+
+    output = args.json or os.path.join(RESULTS_DIR, f"async_throughput-{report['git_commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nreport written to {output}")
+
+
+if __name__ == "__main__":
+    main()
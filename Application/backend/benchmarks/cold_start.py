@@ -0,0 +1,280 @@
+"""
+Cold-start benchmark for the backend.
+
+Every measurement runs in a fresh interpreter so nothing is already imported
+or loaded. The report covers:
+
+- interpreter: RSS of a bare interpreter (the floor for every other number)
+- import_app: wall time and RSS for `import app`
+- modules: import time and RSS delta of each backend module on its own, and
+  the extra cost of each AI module on top of an already imported app
+- routes: first- and second-request latency of each route in a fresh worker
+
+Results are written as JSON so runs from different commits can be compared.
+
+Usage (from Application/backend):
+    python -m benchmarks.cold_start                      # everything
+    python -m benchmarks.cold_start --routes crud        # skip the Gemini-backed routes
+    python -m benchmarks.cold_start --compare benchmarks/results/cold_start-abc1234.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+CORE_MODULES = ["config", "extension", "models", "token_validation", "lazy_ai", "ai_runtime", "controller"]
+AI_MODULES = [
+    "kia_chatbot",
+    "quiz_mock",
+    "week_summarizer",
+    "topic_specfic_mock",
+    "error_explainer",
+    "lecture_summarizer",
+    "notes_generator",
+    "topic_suggestions",
+]
+
+# (group, method, path, payload)
+ROUTES = [
+    ("crud", "GET", "/", None),
+    ("crud", "GET", "/weeks", None),
+    ("crud", "GET", "/assignments", None),
+    ("crud", "GET", "/lectures", None),
+    ("ai", "POST", "/explain_error", {"code_snippet": "ZeroDivisionError: division by zero"}),
+    ("ai", "POST", "/generate_notes", {"topic": "Linear Regression"}),
+    ("ai", "POST", "/generate_mock", {"quiz_type": "quiz1", "num_questions": 5}),
+    ("ai", "POST", "/generate_topic_specific_questions", {"topic": "Decision Trees", "num_questions": 3}),
+    ("ai", "POST", "/video_summarizer", {"week_id": 4}),
+    ("ai", "POST", "/generate_week_summary", {"week_id": 1}),
+    ("ai", "POST", "/topic_recommendation", {"wrong_questions": ["What does StandardScaler do to each feature?"]}),
+    ("ai", "POST", "/kia_chat", {"user_id": 1, "query": "What is a scikit-learn pipeline?"}),
+]
+
+
+def _rss_mb() -> float:
+    # Read directly instead of via ai_runtime.current_rss_mb so measuring
+    # does not import a module that is itself being measured
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    import resource
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+# ------------------------- Child measurements (one per fresh interpreter) -------------------------
+
+def _child_interpreter():
+    return {"rss_mb": _rss_mb()}
+
+
+def _child_import(module_name: str, after_app: bool):
+    import importlib
+
+    if after_app:
+        import app  # noqa: F401
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    importlib.import_module(module_name)
+    seconds = time.perf_counter() - start
+    return {"seconds": round(seconds, 4), "rss_before_mb": rss_before, "rss_after_mb": _rss_mb()}
+
+
+def _child_route(method: str, path: str, payload):
+    rss_start = _rss_mb()
+    start = time.perf_counter()
+    import app as app_module
+    import_seconds = time.perf_counter() - start
+
+    # The database is a scratch copy (see _route_env), so create the tables
+    with app_module.app.app_context():
+        app_module.db.create_all()
+
+    client = app_module.app.test_client()
+    rss_before = _rss_mb()
+
+    timings = []
+    status = None
+    for _ in range(2):
+        start = time.perf_counter()
+        response = client.open(path, method=method, json=payload)
+        timings.append(round(time.perf_counter() - start, 4))
+        status = response.status_code
+
+    return {
+        "import_app_seconds": round(import_seconds, 4),
+        "first_request_seconds": timings[0],
+        "second_request_seconds": timings[1],
+        "status_code": status,
+        "rss_start_mb": rss_start,
+        "rss_before_request_mb": rss_before,
+        "rss_after_request_mb": _rss_mb(),
+    }
+
+
+def _run_child(*args, env: dict = None) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cold_start", "--child", *args],
+        capture_output=True, text=True, env=env
+    )
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        return {"error": (completed.stderr.strip().splitlines() or ["unknown error"])[-1]}
+    return json.loads(lines[-1])
+
+
+def _route_env(directory: str) -> dict:
+    """Environment for a route child: the app and chat history databases live in `directory`"""
+    return dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(directory, 'app.db')}",
+        KIA_CHAT_DB=os.path.join(directory, "chat.db"),
+    )
+
+
+def _run_route(method: str, path: str, payload) -> dict:
+    """Time one route in a fresh worker that writes to a temporary database, not the real one"""
+    with tempfile.TemporaryDirectory() as directory:
+        return _run_child("route", method, path, json.dumps(payload), env=_route_env(directory))
+
+
+# ------------------------- Report -------------------------
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _median(results):
+    """Median run by `seconds` (or the first error if every run failed)"""
+    ok = [r for r in results if "error" not in r]
+    if not ok:
+        return results[0]
+    key = "seconds" if "seconds" in ok[0] else "first_request_seconds"
+    return sorted(ok, key=lambda r: r[key])[len(ok) // 2]
+
+
+def run_benchmark(route_group: str = "all", repeat: int = 3) -> dict:
+    report = {
+        "git_commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "interpreter": _run_child("interpreter"),
+        "import_app": _median([_run_child("import", "app") for _ in range(repeat)]),
+        "modules": {},
+        "modules_after_app": {},
+        "routes": {},
+    }
+
+    for name in CORE_MODULES + AI_MODULES:
+        report["modules"][name] = _median([_run_child("import", name) for _ in range(repeat)])
+
+    # What a worker that already serves CRUD pays when the first AI route loads a module
+    for name in AI_MODULES:
+        report["modules_after_app"][name] = _median(
+            [_run_child("import", name, "--after-app") for _ in range(repeat)]
+        )
+
+    for group, method, path, payload in ROUTES:
+        if route_group not in ("all", group):
+            continue
+        runs = [_run_route(method, path, payload) for _ in range(repeat)]
+        report["routes"][f"{method} {path}"] = dict(_median(runs), group=group)
+
+    return report
+
+
+def print_report(report: dict, baseline: dict = None):
+    def delta(section, key, field):
+        if not baseline:
+            return ""
+        old = baseline.get(section, {}).get(key, {}) if key else baseline.get(section, {})
+        new = report[section].get(key, {}) if key else report[section]
+        if field in old and field in new:
+            return f"  ({new[field] - old[field]:+.3f}s vs {baseline.get('git_commit')})"
+        return ""
+
+    def seconds(result, field="seconds"):
+        return f"{result[field]:.4f}s" if field in result else "error"
+
+    def error(result):
+        return f"  [{result['error']}]" if "error" in result else ""
+
+    print(f"commit {report['git_commit']}  python {report['python']}  repeat {report['repeat']}")
+    print(f"interpreter rss: {report['interpreter'].get('rss_mb')} MiB")
+    import_app = report["import_app"]
+    print(f"import app: {seconds(import_app)}, rss {import_app.get('rss_after_mb', '-')} MiB"
+          f"{delta('import_app', None, 'seconds')}{error(import_app)}")
+
+    print("\nmodule imports (fresh interpreter)")
+    for name, result in report["modules"].items():
+        rss = round(result.get("rss_after_mb", 0) - result.get("rss_before_mb", 0), 1)
+        print(f"  {name:<22}{seconds(result):>10}  rss +{rss} MiB"
+              f"{delta('modules', name, 'seconds')}{error(result)}")
+
+    print("\nAI module imports after `import app`")
+    for name, result in report["modules_after_app"].items():
+        print(f"  {name:<22}{seconds(result):>10}{delta('modules_after_app', name, 'seconds')}{error(result)}")
+
+    print("\nfirst request per route (fresh worker)")
+    for route, result in report["routes"].items():
+        print(f"  {route:<45}{seconds(result, 'first_request_seconds'):>10}  "
+              f"2nd {seconds(result, 'second_request_seconds')}  status {result.get('status_code', '-')}"
+              f"{delta('routes', route, 'first_request_seconds')}{error(result)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    parser.add_argument("--after-app", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--routes", choices=["all", "crud", "ai"], default="all",
+                        help="Which routes to time (the ai routes call Gemini)")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh-interpreter runs per measurement (median is kept)")
+    parser.add_argument("--output", help="Where to write the JSON report")
+    parser.add_argument("--compare", help="Previous JSON report to diff against")
+    args = parser.parse_args()
+
+    if args.child:
+        kind, *rest = args.child
+        if kind == "interpreter":
+            result = _child_interpreter()
+        elif kind == "import":
+            result = _child_import(rest[0], args.after_app)
+        else:
+            result = _child_route(rest[0], rest[1], json.loads(rest[2]))
+        print(json.dumps(result))
+        return
+
+    report = run_benchmark(args.routes, args.repeat)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"cold_start-{report['git_commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nreport written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Embedding throughput of the PyTorch (HuggingFaceEmbeddings) and ONNX int8 backends.
+
+Each backend runs in a fresh interpreter so load time, RSS and whether torch
+got imported are measured per backend. Texts come from the parity sentences,
+repeated and varied to the requested count. The embedding cache is bypassed.
+
+Usage (from Application/backend):
+    python -m onnx_embeddings export               # once, to create the ONNX model
+    python -m benchmarks.embedding_backends [--texts 512] [--batch-sizes 1 8 32] [--json results.json]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+BACKENDS = ["huggingface", "onnx"]
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+
+def _child(backend: str, count: int, batch_sizes):
+    import ai_runtime
+    from onnx_embeddings import PARITY_SENTENCES
+
+    texts = [f"{PARITY_SENTENCES[i % len(PARITY_SENTENCES)]} ({i})" for i in range(count)]
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    if backend == "onnx":
+        from onnx_embeddings import OnnxEmbeddings
+        model = OnnxEmbeddings(ai_runtime.ONNX_MODEL_DIR)
+    else:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        model = HuggingFaceEmbeddings(model_name=ai_runtime.EMBEDDING_MODEL_NAME)
+    load_seconds = time.perf_counter() - start
+
+    model.embed_documents(texts[:8])  # first-call allocations
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        if backend == "onnx":
+            model.batch_size = batch_size
+        else:
+            model.encode_kwargs = {"batch_size": batch_size}
+        start = time.perf_counter()
+        if batch_size == 1:
+            for text in texts:
+                model.embed_query(text)
+        else:
+            model.embed_documents(texts)
+        throughput[str(batch_size)] = round(count / (time.perf_counter() - start), 1)
+
+    return {
+        "load_seconds": round(load_seconds, 3),
+        "texts_per_second": throughput,
+        "rss_before_mb": rss_before,
+        "rss_after_mb": _rss_mb(),
+        "torch_imported": "torch" in sys.modules,
+    }
+
+
+def _run_child(backend: str, count: int, batch_sizes) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.embedding_backends", "--child", backend,
+         "--texts", str(count), "--batch-sizes", *map(str, batch_sizes)],
+        capture_output=True, text=True
+    )
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        return {"error": (completed.stderr.strip().splitlines() or ["unknown error"])[-1]}
+    return json.loads(lines[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_child(args.child, args.texts, args.batch_sizes)))
+        return
+
+    report = {backend: _run_child(backend, args.texts, args.batch_sizes) for backend in BACKENDS}
+
+    print(f"{args.texts} texts")
+    for backend, result in report.items():
+        if "error" in result:
+            print(f"  {backend:<12} error: {result['error']}")
+            continue
+        rates = "  ".join(f"batch {size}: {rate}/s" for size, rate in result["texts_per_second"].items())
+        print(f"  {backend:<12} load {result['load_seconds']}s  rss {result['rss_after_mb']} MiB  "
+              f"torch {'yes' if result['torch_imported'] else 'no'}  {rates}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Per-worker memory report for the shared AI runtime.
+
+Runs each scenario in a fresh interpreter and prints the RSS before and after
+the AI components are loaded:
+
+- legacy: every AI module builds its own embeddings model and Chroma client
+  (how the modules behaved before ai_runtime existed)
+- shared: every AI module goes through ai_runtime and shares one instance
+
+Usage (from Application/backend):
+    python -m benchmarks.memory_report [--json results.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Modules that used to own their own embeddings / vector store singletons
+AI_MODULES = [
+    "kia_chatbot",
+    "lecture_summarizer",
+    "week_summarizer",
+    "notes_generator",
+    "topic_suggestions",
+    "quiz_mock",
+    "topic_specfic_mock",
+]
+
+
+def _run_legacy():
+    import ai_runtime
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from langchain_chroma import Chroma
+
+    before = ai_runtime.current_rss_mb()
+    stores = []
+    for _ in AI_MODULES:
+        embeddings = HuggingFaceEmbeddings(model_name=ai_runtime.EMBEDDING_MODEL_NAME)
+        stores.append(Chroma(
+            collection_name=ai_runtime.COLLECTION_NAME,
+            embedding_function=embeddings,
+            persist_directory=ai_runtime.DEFAULT_PERSIST_DIRECTORY
+        ))
+    return {"rss_before_mb": before, "rss_after_mb": ai_runtime.current_rss_mb(),
+            "embedding_models": len(stores), "vector_stores": len(stores)}
+
+
+def _run_shared():
+    import importlib
+    import ai_runtime
+
+    modules = [importlib.import_module(name) for name in AI_MODULES]
+    before = ai_runtime.current_rss_mb()
+    for module in modules:
+        module.get_embeddings()
+        if hasattr(module, "get_vector_store"):
+            module.get_vector_store()
+        else:
+            module.get_vectorstore()
+        module.get_llm()
+    stats = ai_runtime.runtime_stats()
+    return {"rss_before_mb": before, "rss_after_mb": ai_runtime.current_rss_mb(),
+            "embedding_models": int(stats["embeddings_loaded"]),
+            "vector_stores": len(stats["vector_stores"]),
+            "reference_counts": stats["reference_counts"]}
+
+
+def _measure(scenario: str) -> dict:
+    """Run one scenario in a child interpreter and return its JSON result"""
+    env = dict(os.environ)
+    # Constructing the Gemini client needs a key but makes no network call
+    env.setdefault("GOOGLE_API_KEY", "memory-report-placeholder")
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.memory_report", "--scenario", scenario],
+        capture_output=True, text=True, env=env, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=["legacy", "shared"], help=argparse.SUPPRESS)
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file")
+    args = parser.parse_args()
+
+    if args.scenario:
+        result = _run_legacy() if args.scenario == "legacy" else _run_shared()
+        print(json.dumps(result))
+        return
+
+    report = {scenario: _measure(scenario) for scenario in ("legacy", "shared")}
+
+    print(f"{'scenario':<10}{'before MiB':>12}{'after MiB':>12}{'delta MiB':>12}{'models':>8}{'stores':>8}")
+    for scenario, result in report.items():
+        delta = result["rss_after_mb"] - result["rss_before_mb"]
+        print(f"{scenario:<10}{result['rss_before_mb']:>12.1f}{result['rss_after_mb']:>12.1f}"
+              f"{delta:>12.1f}{result['embedding_models']:>8}{result['vector_stores']:>8}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Retrieval quality and latency harness.
+
+Runs the labelled queries in benchmarks/retrieval_queries.json (drawn from the
+MLP curriculum in kia_chatbot.get_system_prompt) against the local vector
+store and reports, for every retrieval setup and k:
+
+- recall@k: share of a query's relevant sources (the labelled lectures plus
+  that week's slides, as far as they are in the corpus) found in the top k
+- MRR: reciprocal rank of the first relevant chunk
+- p50/p95 search latency (query embeddings are computed once up front, so
+  this is the search alone; embedding time is reported separately)
+
+Setups: the collection as configured, exact NumPy search, hybrid BM25 +
+vector, BM25 alone, and a sweep of HNSW M / search_ef values on temporary
+copies of the collection (built from its stored embeddings, nothing is
+re-embedded and the real collection is never modified).
+
+Everything runs offline: the embedding model must already be in the local
+Hugging Face cache, and Chroma telemetry is disabled.
+
+Usage (from Application/backend):
+    python -m benchmarks.retrieval_quality
+    python -m benchmarks.retrieval_quality --k 3 20 --m 16 32 --ef 10 100
+    python -m benchmarks.retrieval_quality --no-sweep --json results.json
+"""
+import os
+
+# Never reach the Hugging Face hub or Chroma's telemetry endpoint
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+import argparse
+import json
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Set
+
+import ai_runtime
+import corpus_index
+import retrieval
+from lexical_index import LexicalIndex
+from numpy_store import NumpyVectorStore
+
+QUERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "retrieval_queries.json")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# k=3 is Kia's retriever, k=20 is generate_notes
+DEFAULT_K = [3, 5, 10, 20]
+DEFAULT_M = [8, 16, 32]
+DEFAULT_SEARCH_EF = [10, 50, 100]
+CONSTRUCTION_EF = 100
+
+
+def load_queries(path: str = QUERIES_PATH) -> List[Dict]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def relevant_sources(label: Dict, available: Set[str]) -> Set[str]:
+    """Sources that answer a labelled query and exist in the corpus"""
+    week = label["week"]
+    sources = {f"Week_{week}_Lecture_{lecture}.pdf" for lecture in label["lectures"]}
+    sources.add(f"MLP Week {week} Slides.pdf")
+    return sources & available
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, int(round(fraction * len(ordered))) - 1)]
+
+
+def evaluate(search: Callable[[str, List[float], int], list], queries: List[Dict], query_vectors: List[List[float]],
+             available: Set[str], k_values: List[int]) -> Dict[str, Dict[str, float]]:
+    """recall@k, MRR and search latency of one setup for each k"""
+    report = {}
+    for k in k_values:
+        recalls, reciprocal_ranks, latencies = [], [], []
+        for label, vector in zip(queries, query_vectors):
+            relevant = relevant_sources(label, available)
+            if not relevant:
+                continue
+
+            start = time.perf_counter()
+            docs = search(label["query"], vector, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            sources = [doc.metadata.get("source") for doc in docs[:k]]
+            recalls.append(len(relevant & set(sources)) / len(relevant))
+            first = next((rank for rank, source in enumerate(sources, start=1) if source in relevant), None)
+            reciprocal_ranks.append(1.0 / first if first else 0.0)
+
+        if not latencies:
+            continue
+        report[str(k)] = {
+            "recall": round(statistics.fmean(recalls), 4),
+            "mrr": round(statistics.fmean(reciprocal_ranks), 4),
+            "p50_ms": round(statistics.median(latencies), 3),
+            "p95_ms": round(_percentile(latencies, 0.95), 3),
+            "queries": len(latencies),
+        }
+    return report
+
+
+def _hnsw_copy(client, chunks: Dict, m: int, search_ef: int):
+    """Temporary collection with the same chunks and embeddings under other HNSW settings"""
+    from langchain_chroma import Chroma
+
+    store = Chroma(
+        collection_name=f"sweep_m{m}_ef{search_ef}",
+        embedding_function=ai_runtime.get_embeddings(),
+        client=client,
+        collection_metadata={
+            "hnsw:space": "l2",
+            "hnsw:M": m,
+            "hnsw:construction_ef": CONSTRUCTION_EF,
+            "hnsw:search_ef": search_ef,
+        }
+    )
+    batch_size = client.get_max_batch_size()
+    for start in range(0, len(chunks["ids"]), batch_size):
+        end = start + batch_size
+        store._collection.add(
+            ids=chunks["ids"][start:end], embeddings=chunks["embeddings"][start:end],
+            documents=chunks["documents"][start:end], metadatas=chunks["metadatas"][start:end]
+        )
+    return store
+
+
+def run_benchmark(persist_directory: str, queries: List[Dict], k_values: List[int], m_values: List[int],
+                  ef_values: List[int], sweep: bool = True) -> Dict:
+    import chromadb
+    from langchain_chroma import Chroma
+
+    embeddings = ai_runtime.get_embeddings()
+    collection = Chroma(
+        collection_name=ai_runtime.COLLECTION_NAME,
+        embedding_function=embeddings,
+        persist_directory=persist_directory
+    )
+    chunks = collection.get(include=["embeddings", "documents", "metadatas"])
+    if not len(chunks["ids"]):
+        raise SystemExit(
+            f"The '{ai_runtime.COLLECTION_NAME}' collection in {persist_directory} is empty. This harness needs the "
+            "full vector store (chroma.sqlite3 and the HNSW segment files), e.g. from `python -m ingest`."
+        )
+    available = {entry["source"] for entry in corpus_index.get_catalog(collection, persist_directory)}
+
+    start = time.perf_counter()
+    query_vectors = embeddings.embed_documents([label["query"] for label in queries])
+    embed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    lexical_index = LexicalIndex.from_vector_store(collection)
+    setups: Dict[str, Callable] = {
+        "chroma": lambda query, vector, k: collection.similarity_search_by_vector(vector, k=k),
+        "hybrid": lambda query, vector, k: retrieval.hybrid_search(collection, lexical_index, query, k=k,
+                                                                    embedding=vector),
+        "bm25": lambda query, vector, k: [doc for doc, _ in lexical_index.search(query, k=k)],
+    }
+
+    report = {
+        "git_commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "chunks": len(chunks["ids"]),
+        "queries": len(queries),
+        "embedding_ms_per_query": round(embed_ms, 3),
+        "setups": {},
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        exact = NumpyVectorStore(embeddings, os.path.join(directory, "numpy_store"))
+        exact.add_embeddings(list(chunks["ids"]), list(chunks["documents"]), chunks["embeddings"],
+                             list(chunks["metadatas"]))
+        setups["numpy"] = lambda query, vector, k: exact.similarity_search_by_vector(vector, k=k)
+
+        if sweep:
+            client = chromadb.PersistentClient(path=os.path.join(directory, "sweep"))
+            for m in m_values:
+                for ef in ef_values:
+                    store = _hnsw_copy(client, chunks, m, ef)
+                    setups[f"hnsw M={m} ef={ef}"] = (
+                        lambda query, vector, k, store=store: store.similarity_search_by_vector(vector, k=k)
+                    )
+
+        for name, search in setups.items():
+            # Untimed pass so every index is loaded before timing
+            for label, vector in zip(queries[:3], query_vectors):
+                search(label["query"], vector, 1)
+            report["setups"][name] = evaluate(search, queries, query_vectors, available, k_values)
+
+    return report
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(report: Dict):
+    print(f"{report['chunks']} chunks, {report['queries']} labelled queries, "
+          f"embedding {report['embedding_ms_per_query']} ms/query")
+    print(f"\n{'setup':<22}{'k':>4}{'recall':>9}{'MRR':>8}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, by_k in report["setups"].items():
+        for k, result in by_k.items():
+            print(f"{name:<22}{k:>4}{result['recall']:>9.3f}{result['mrr']:>8.3f}"
+                  f"{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--persist-directory", default=ai_runtime.DEFAULT_PERSIST_DIRECTORY)
+    parser.add_argument("--queries", default=QUERIES_PATH, help="Labelled query set (JSON)")
+    parser.add_argument("--k", type=int, nargs="+", default=DEFAULT_K)
+    parser.add_argument("--m", type=int, nargs="+", default=DEFAULT_M, help="HNSW M values to sweep")
+    parser.add_argument("--ef", type=int, nargs="+", default=DEFAULT_SEARCH_EF, help="HNSW search_ef values to sweep")
+    parser.add_argument("--no-sweep", action="store_true", help="Skip the HNSW parameter sweep")
+    parser.add_argument("--json", help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.persist_directory, load_queries(args.queries), args.k, args.m, args.ef,
+                           sweep=not args.no_sweep)
+    print_report(report)
+
+    output = args.json or os.path.join(RESULTS_DIR, f"retrieval_quality-{report['git_commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nreport written to {output}")
+
+
+if __name__ == "__main__":
+    main()
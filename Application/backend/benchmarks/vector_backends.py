@@ -0,0 +1,150 @@
+"""
+Search latency and recall of the Chroma (HNSW) and NumPy (exact) backends.
+
+Query vectors are computed up front and both stores are searched with
+similarity_search_by_vector, so the numbers cover only the search itself
+(index lookup, metadata fetch) and not the embedding model.
+
+By default the chunks of the real collection in --persist-directory are used.
+With --synthetic N, N random unit vectors are generated instead (no model
+download, nothing touches the real store).
+
+Usage (from Application/backend):
+    python -m benchmarks.vector_backends
+    python -m benchmarks.vector_backends --synthetic 3000 --queries 200 --json results.json
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+import ai_runtime
+from numpy_store import NumpyVectorStore, build, get_store_directory
+
+
+class _NoEmbeddings:
+    """Placeholder embedding function: the benchmark only searches by vector"""
+
+    def embed_documents(self, texts):
+        raise RuntimeError("benchmark searches by vector only")
+
+    def embed_query(self, text):
+        raise RuntimeError("benchmark searches by vector only")
+
+
+def _synthetic_stores(size: int, dimensions: int, directory: str):
+    from langchain_chroma import Chroma
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(size, dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [str(uuid.uuid4()) for _ in range(size)]
+    texts = [f"chunk {i}" for i in range(size)]
+    metadatas = [{"source": f"Week_{i % 12 + 1}_Lecture_{i % 5 + 1}.pdf", "week": str(i % 12 + 1)}
+                 for i in range(size)]
+
+    chroma = Chroma(collection_name=ai_runtime.COLLECTION_NAME, embedding_function=_NoEmbeddings(),
+                    persist_directory=directory)
+    for start in range(0, size, 1000):
+        chroma._collection.add(ids=ids[start:start + 1000], embeddings=vectors[start:start + 1000],
+                               documents=texts[start:start + 1000], metadatas=metadatas[start:start + 1000])
+
+    numpy_store = NumpyVectorStore(_NoEmbeddings(), get_store_directory(directory))
+    numpy_store.add_embeddings(ids, texts, vectors, metadatas)
+    numpy_store.flush()
+    return chroma, numpy_store
+
+
+def _real_stores(persist_directory: str):
+    from langchain_chroma import Chroma
+
+    build(persist_directory)
+    chroma = Chroma(collection_name=ai_runtime.COLLECTION_NAME, embedding_function=_NoEmbeddings(),
+                    persist_directory=persist_directory)
+    return chroma, NumpyVectorStore(_NoEmbeddings(), get_store_directory(persist_directory))
+
+
+def _time_searches(store, query_vectors, k, where):
+    latencies, results = [], []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        docs = store.similarity_search_by_vector(vector, k=k, filter=where)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([doc.id for doc in docs])
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+    }, results
+
+
+def run_benchmark(persist_directory: str, synthetic: int, queries: int, k: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        if synthetic:
+            chroma, numpy_store = _synthetic_stores(synthetic, 384, directory)
+        else:
+            chroma, numpy_store = _real_stores(persist_directory)
+
+        if numpy_store.count() == 0:
+            raise SystemExit(f"no chunks in {persist_directory}; use --synthetic N")
+
+        # Perturbed corpus vectors: realistic queries that land near existing chunks
+        rng = np.random.default_rng(1)
+        matrix = np.asarray(numpy_store.matrix)
+        picks = rng.integers(0, len(matrix), size=queries)
+        query_vectors = (matrix[picks] + rng.normal(scale=0.05, size=(queries, matrix.shape[1]))).tolist()
+
+        report = {"chunks": numpy_store.count(), "queries": queries, "k": k, "scenarios": {}}
+        week = numpy_store.metadatas[0].get("week")
+        scenarios = {"unfiltered": None}
+        if week is not None:
+            scenarios["filtered"] = {"week": week}
+
+        for name, where in scenarios.items():
+            # One untimed pass so both backends have their index and pages loaded
+            _time_searches(chroma, query_vectors[:5], k, where)
+            _time_searches(numpy_store, query_vectors[:5], k, where)
+
+            chroma_timing, chroma_results = _time_searches(chroma, query_vectors, k, where)
+            numpy_timing, exact_results = _time_searches(numpy_store, query_vectors, k, where)
+            recall = statistics.fmean(
+                len(set(found) & set(exact)) / max(len(exact), 1)
+                for found, exact in zip(chroma_results, exact_results)
+            )
+            report["scenarios"][name] = {
+                "chroma": dict(chroma_timing, recall_at_k=round(recall, 4)),
+                "numpy": dict(numpy_timing, recall_at_k=1.0),
+            }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--persist-directory", default=ai_runtime.DEFAULT_PERSIST_DIRECTORY)
+    parser.add_argument("--synthetic", type=int, default=0, help="Benchmark N random chunks instead")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.persist_directory, args.synthetic, args.queries, args.k)
+
+    print(f"{report['chunks']} chunks, {report['queries']} queries, k={report['k']}")
+    for name, backends in report["scenarios"].items():
+        print(f"\n{name}")
+        for backend, result in backends.items():
+            print(f"  {backend:<8} p50 {result['p50_ms']:>8.3f} ms  p95 {result['p95_ms']:>8.3f} ms  "
+                  f"recall@k {result['recall_at_k']:.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
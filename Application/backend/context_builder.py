@@ -0,0 +1,185 @@
+import os
+import re
+from typing import Dict, List, Optional, Set
+
+from langchain_core.documents import Document
+
+# Rough size of a Gemini token in characters for English course text
+CHARS_PER_TOKEN = 4
+DEFAULT_MAX_TOKENS = int(os.getenv("KIA_CONTEXT_TOKENS", "3000"))
+
+# Overlap between neighbouring chunks: the splitters use chunk_overlap=200, allow some slack
+MIN_OVERLAP_CHARS = 40
+MAX_OVERLAP_CHARS = 400
+
+# Chunks sharing this share of word trigrams with a better-ranked chunk are dropped
+NEAR_DUPLICATE_THRESHOLD = 0.8
+# Don't bother appending a truncated chunk smaller than this
+MIN_TRUNCATED_TOKENS = 80
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _overlap_length(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right` (0 if shorter than MIN_OVERLAP_CHARS)"""
+    if len(left) < MIN_OVERLAP_CHARS or len(right) < MIN_OVERLAP_CHARS:
+        return 0
+    probe = right[:MIN_OVERLAP_CHARS]
+    tail_start = max(0, len(left) - MAX_OVERLAP_CHARS)
+    position = left.find(probe, tail_start)
+    while position != -1:
+        length = len(left) - position
+        if right.startswith(left[position:]) and length <= len(right):
+            return length
+        position = left.find(probe, position + 1)
+    return 0
+
+
+def _shingles(text: str) -> Set[tuple]:
+    words = [word.lower() for word in WORD_PATTERN.findall(text)]
+    if len(words) < 3:
+        return {tuple(words)}
+    return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def _is_near_duplicate(candidate: Set[tuple], kept: Set[tuple]) -> bool:
+    """True when most of the candidate's trigrams are already in a kept segment"""
+    if not candidate:
+        return True
+    return len(candidate & kept) / len(candidate) >= NEAR_DUPLICATE_THRESHOLD
+
+
+def _order_key(metadata: Dict, rank: int) -> tuple:
+    if "chunk_index" in metadata:
+        return (int(metadata["chunk_index"]), 0, rank)
+    if "page" in metadata or "start_index" in metadata:
+        return (int(metadata.get("page", 0) or 0), int(metadata.get("start_index", 0) or 0), rank)
+    return (rank, 0, rank)
+
+
+def _absorb(segments: List[list], active: list) -> bool:
+    """Merge `active` with one segment it overlaps (in either order), returns False if there was none"""
+    for i, other in enumerate(segments):
+        if other is active:
+            continue
+        overlap = _overlap_length(other[1], active[1])
+        if overlap:
+            active[1] = other[1] + active[1][overlap:]
+        else:
+            overlap = _overlap_length(active[1], other[1])
+            if not overlap:
+                continue
+            active[1] += other[1][overlap:]
+        if other[0] < active[0]:
+            active[0], active[2] = other[0], other[2]
+        del segments[i]
+        return True
+    return False
+
+
+def merge_overlapping(documents: List[Document]) -> List[Document]:
+    """
+Join chunks of the same source whose texts overlap at the edges.
+
+Neighbouring chunks produced with chunk_overlap repeat up to a few hundred
+characters; merging them keeps the text once. A merged document keeps the
+metadata of its best-ranked chunk and ranks where that chunk ranked.
+
+Args:
+documents: Retrieved documents, best first
+
+Returns:
+Merged documents, best first
+    """
+    by_source: Dict[str, List[tuple]] = {}
+    for rank, doc in enumerate(documents):
+        source = (doc.metadata or {}).get("source", "")
+        by_source.setdefault(source, []).append((_order_key(doc.metadata or {}, rank), rank, doc))
+
+    # [best rank, text, metadata]
+    segments: List[list] = []
+    for chunks in by_source.values():
+        source_segments: List[list] = []
+        for _, rank, doc in sorted(chunks, key=lambda chunk: chunk[0]):
+            active = [rank, doc.page_content, doc.metadata or {}]
+            source_segments.append(active)
+            # A new chunk can bridge two segments, so keep merging until nothing changes
+            while _absorb(source_segments, active):
+                pass
+        segments.extend(source_segments)
+
+    segments.sort(key=lambda segment: segment[0])
+    return [Document(page_content=text, metadata=metadata) for _, text, metadata in segments]
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Cut text to max_chars, preferably at a sentence or line end in the second half"""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    boundary = max(cut.rfind(". "), cut.rfind("\n"))
+    if boundary < max_chars // 2:
+        boundary = cut.rfind(" ")
+    return cut[:boundary + 1].rstrip() if boundary > 0 else cut
+
+
+def pack_documents(documents: List[Document], max_tokens: Optional[int] = DEFAULT_MAX_TOKENS) -> List[Document]:
+    """
+Merge overlapping neighbours, drop near-duplicates and keep the best text within a token budget.
+
+Args:
+documents: Retrieved documents, best first
+max_tokens: Token budget for the packed text (None for no limit)
+
+Returns:
+Packed documents, best first
+    """
+    packed: List[Document] = []
+    seen: Set[tuple] = set()
+    used = 0
+
+    for doc in merge_overlapping(documents):
+        shingles = _shingles(doc.page_content)
+        if _is_near_duplicate(shingles, seen):
+            continue
+
+        tokens = estimate_tokens(doc.page_content)
+        if max_tokens is not None and used + tokens > max_tokens:
+            remaining = max_tokens - used
+            if remaining >= MIN_TRUNCATED_TOKENS:
+                text = _truncate(doc.page_content, remaining * CHARS_PER_TOKEN)
+                packed.append(Document(page_content=text, metadata=doc.metadata))
+            break
+
+        packed.append(doc)
+        seen |= shingles
+        used += tokens
+
+    return packed
+
+
+def question_budget(num_questions: int, per_question: int = 400, minimum: int = 1500,
+                    maximum: int = 8000) -> int:
+    """Context token budget for generating `num_questions` questions"""
+    return max(minimum, min(per_question * num_questions, maximum))
+
+
+def build_context(documents: List[Document], max_tokens: Optional[int] = DEFAULT_MAX_TOKENS,
+                  separator: str = "\n") -> str:
+    """
+Prompt context from retrieved documents (see pack_documents).
+
+Args:
+documents: Retrieved documents, best first
+max_tokens: Token budget for the context (None for no limit)
+separator: Placed between packed documents
+
+Returns:
+Context string
+    """
+    return separator.join(doc.page_content for doc in pack_documents(documents, max_tokens))
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, render_template, send_file
+from flask import Blueprint, request, jsonify, render_template, send_file, current_app, Response, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import User, Week, Lecture, Assignment, AssignmentQuestion, QuestionOption, ProgrammingAssignment
 from extension import db
@@ -15,23 +15,31 @@ import markdown
 from markdown.extensions.codehilite import CodeHiliteExtension
 from markdown.extensions.tables import TableExtension
 import re
+import json
 
-from quiz_mock import generate_mcqs
-from week_summarizer import summarize_week_slides
-from topic_specfic_mock import generate_topic_mcqs
-from error_explainer import explain_error
-from lecture_summarizer import summarize_lecture
-from kia_chatbot import initialize_database, save_chat_turn_to_db, load_chat_history_from_db, get_answer, \
-    clear_user_history
-from notes_generator import generate_topic_notes
-from topic_suggestions import generate_topic_suggestions
+import lazy_ai
+from lazy_ai import lazy_import
+
+# AI modules are imported on first use so CRUD-only workers never load LangChain
+quiz_mock = lazy_import("quiz_mock")
+week_summarizer = lazy_import("week_summarizer")
+topic_specfic_mock = lazy_import("topic_specfic_mock")
+error_explainer = lazy_import("error_explainer")
+lecture_summarizer = lazy_import("lecture_summarizer")
+kia_chatbot = lazy_import("kia_chatbot")
+notes_generator = lazy_import("notes_generator")
+topic_suggestions = lazy_import("topic_suggestions")
 
 user_routes = Blueprint('user_routes', __name__)
 
 
 @user_routes.route('/')
 def index():
-    return {"message": "API is running"}, 200
+    return {
+        "message": "API is running",
+        "boot_seconds": current_app.config.get('BOOT_SECONDS'),
+        "ai_modules_loaded": lazy_ai.loaded_modules()
+    }, 200
 
 # ------------------------- User Authentication Routes -------------------------
 
@@ -1305,7 +1313,7 @@ def generate_topic_specific_questions():
 
         # Generate dynamic MCQs using the imported function
         try:
-            mcq_set = generate_topic_mcqs(topic, num_questions)
+            mcq_set = topic_specfic_mock.generate_topic_mcqs(topic, num_questions)
 
             # Handle dictionary return case
             if isinstance(mcq_set, dict):
@@ -1388,7 +1396,7 @@ def video_summarizer():
         return jsonify({'message': 'week_id is required', 'success': False}), 400
 
     # Generate summary using lecture_summarizer logic
-    result = summarize_lecture(week_id, 1)
+    result = lecture_summarizer.summarize_lecture(week_id, 1)
 
     return jsonify(result), 200 if result['success'] else 404
 
@@ -1411,7 +1419,7 @@ def chat_with_kia():
 
     try:
         # Use the get_answer function from your existing code
-        result = get_answer(user_id, query)
+        result = kia_chatbot.get_answer(user_id, query)
 
         return jsonify(result), 200 if result['success'] else 500
 
@@ -1423,6 +1431,42 @@ def chat_with_kia():
         }), 500
 
 
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events):
+    """Stream (event, data) dicts from a generator as text/event-stream"""
+    def generate():
+        for item in events:
+            yield sse_event(item['event'], item['data'])
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Stop nginx from buffering the stream
+        'X-Accel-Buffering': 'no'
+    })
+
+
+def wants_stream(data) -> bool:
+    """Whether a request asked for an event stream ({"stream": true} or Accept: text/event-stream)"""
+    return bool(data.get('stream')) or request.accept_mimetypes.best == 'text/event-stream'
+
+
+@user_routes.route('/kia_chat/stream', methods=['POST'])
+def stream_chat_with_kia():
+    """Streaming variant of /kia_chat: `token` events as Kia writes, then `done` (or `error`)"""
+    data = request.get_json()
+    user_id = data.get('user_id')
+    query = data.get('query')
+
+    if not all([user_id, query]):
+        return jsonify({'success': False, 'message': 'Missing required fields'}), 400
+
+    return sse_response(kia_chatbot.stream_answer(user_id, query))
+
+
 @user_routes.route('/reset_chat_history', methods=['POST'])
 def reset_chat_history():
     """API to clear chat history for a user"""
@@ -1434,7 +1478,7 @@ def reset_chat_history():
 
     try:
         # Use the clear_user_history function from your existing code
-        result = clear_user_history(user_id)
+        result = kia_chatbot.clear_user_history(user_id)
         return jsonify(result), 200 if result['success'] else 500
 
     except Exception as e:
@@ -1458,10 +1502,10 @@ def save_chat_history():
 
     try:
         # Initialize database if not present
-        initialize_database()
+        kia_chatbot.initialize_database()
 
         # Save chat interaction in the database
-        save_chat_turn_to_db(user_id, query, response)
+        kia_chatbot.save_chat_turn_to_db(user_id, query, response)
 
         return jsonify({
             "success": True,
@@ -1482,7 +1526,7 @@ def get_chat_history(user_id):
     """API to retrieve chat history for a given user"""
     try:
         # Use the load_chat_history_from_db function to get the ChatMessageHistory object
-        chat_history = load_chat_history_from_db(user_id)
+        chat_history = kia_chatbot.load_chat_history_from_db(user_id)
 
         # If no messages found in the ChatMessageHistory
         if not chat_history.messages:
@@ -1542,7 +1586,7 @@ def explain_error_route():
 
     # Attempt to analyze the error using error_explainer logic
     try:
-        explanation = explain_error(code_snippet)
+        explanation = error_explainer.explain_error(code_snippet)
         return jsonify({
             'success': True,
             'message': 'Error explanation generated successfully',
@@ -1572,8 +1616,12 @@ def generate_week_summary():
     if not week:
         return jsonify({'message': 'Week not found', 'success': False}), 404
 
+    # Streaming mode: Markdown chunks as Server-Sent Events
+    if wants_stream(data):
+        return sse_response(week_summarizer.stream_week_summary(week.week_number))
+
     # Generate summary using slides_summarizer logic
-    result = summarize_week_slides(week.week_number)
+    result = week_summarizer.summarize_week_slides(week.week_number)
 
     # Return result
     return jsonify(result), 200 if result['success'] else 404
@@ -1592,7 +1640,7 @@ def generate_mock():
         return jsonify({'message': 'quiz_type is required', 'success': False}), 400
 
     # Generate MCQs using the provided logic
-    result = generate_mcqs(quiz_type, num_questions)
+    result = quiz_mock.generate_mcqs(quiz_type, num_questions)
 
     # Return the generated mock test or error response
     if result['success']:
@@ -1622,8 +1670,12 @@ def generate_notes():
     if not topic:
         return jsonify({'message': 'topic is required', 'success': False}), 400
 
+    # Streaming mode: Markdown chunks as Server-Sent Events
+    if wants_stream(data):
+        return sse_response(notes_generator.stream_topic_notes(topic))
+
     # Generate notes using the provided logic
-    result = generate_topic_notes(topic)
+    result = notes_generator.generate_topic_notes(topic)
 
     # Return the generated notes or error response
     if result['success']:
@@ -1663,7 +1715,7 @@ def topic_recommendation():
 
     try:
         # Generate suggestions
-        suggestions = generate_topic_suggestions(wrong_questions)
+        suggestions = topic_suggestions.generate_topic_suggestions(wrong_questions)
         return jsonify(suggestions), 200
     except Exception as e:
         return jsonify({
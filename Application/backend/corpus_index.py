@@ -0,0 +1,363 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+# Side index stored next to the Chroma files it describes
+INDEX_FILENAME = "corpus_index.db"
+
+LECTURE_PATTERN = re.compile(r"^Week_(\d+)_Lecture_(\d+)\.pdf$")
+SLIDES_PATTERN = re.compile(r"^MLP Week (\d+) Slides\.pdf$")
+
+# Index files whose tables were created by this process
+_initialized_paths = set()
+_initialize_lock = threading.Lock()
+
+
+def get_index_path(persist_directory: str = "vector_store") -> str:
+    """Location of the corpus index for a vector store directory"""
+    return os.path.join(persist_directory, INDEX_FILENAME)
+
+
+def _connect(persist_directory: str) -> sqlite3.Connection:
+    """Connection to the index, creating its tables the first time a path is opened"""
+    path = get_index_path(persist_directory)
+    with _initialize_lock:
+        # Re-create the schema if the file was removed since (e.g. the vector store was wiped)
+        if path not in _initialized_paths or not os.path.exists(path):
+            os.makedirs(persist_directory, exist_ok=True)
+            with closing(sqlite3.connect(path, timeout=10)) as conn:
+                _create_schema(conn)
+            _initialized_paths.add(path)
+    return sqlite3.connect(path, timeout=10)
+
+
+def _create_schema(conn: sqlite3.Connection):
+    conn.execute('''
+CREATE TABLE IF NOT EXISTS source_chunks (
+source TEXT NOT NULL,
+position INTEGER NOT NULL,
+chunk_id TEXT NOT NULL,
+PRIMARY KEY (source, position)
+)
+    ''')
+    conn.execute('''
+CREATE TABLE IF NOT EXISTS catalog (
+source TEXT PRIMARY KEY,
+kind TEXT NOT NULL,
+week INTEGER,
+lecture INTEGER,
+chunk_count INTEGER NOT NULL,
+updated_at REAL NOT NULL
+)
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_catalog_kind ON catalog (kind, week, lecture)")
+    conn.execute('''
+CREATE TABLE IF NOT EXISTS ingested_files (
+source TEXT PRIMARY KEY,
+content_hash TEXT NOT NULL,
+chunk_count INTEGER NOT NULL,
+ingested_at REAL NOT NULL
+)
+    ''')
+    conn.execute('''
+CREATE TABLE IF NOT EXISTS index_meta (
+key TEXT PRIMARY KEY,
+value TEXT
+)
+    ''')
+    conn.commit()
+
+
+def _get_meta(conn: sqlite3.Connection, key: str) -> Optional[str]:
+    row = conn.execute("SELECT value FROM index_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(conn: sqlite3.Connection, key: str, value: str):
+    conn.execute("INSERT OR REPLACE INTO index_meta (key, value) VALUES (?, ?)", (key, value))
+
+
+def _bump_version(conn: sqlite3.Connection):
+    version = int(_get_meta(conn, "collection_version") or 0) + 1
+    _set_meta(conn, "collection_version", str(version))
+
+
+def get_collection_version(persist_directory: str = "vector_store") -> int:
+    """
+Content version of the collection, incremented whenever sources are recorded.
+
+Caches of retrieval results include it in their keys, so anything cached
+before an ingest stops matching once the ingest has recorded its chunks.
+    """
+    with closing(_connect(persist_directory)) as conn:
+        version = _get_meta(conn, "collection_version")
+    return int(version or 0)
+
+
+def bump_collection_version(persist_directory: str = "vector_store") -> int:
+    """Mark the collection as changed (for writes that bypass record_source_chunks)"""
+    with closing(_connect(persist_directory)) as conn, conn:
+        _bump_version(conn)
+        version = int(_get_meta(conn, "collection_version"))
+    return version
+
+
+def parse_source(source: str) -> Dict[str, Any]:
+    """Classify a source (filename or relative path) as a lecture transcript, a slide deck or other"""
+    filename = source.rsplit("/", 1)[-1]
+    match = LECTURE_PATTERN.match(filename)
+    if match:
+        return {"kind": "lecture", "week": int(match.group(1)), "lecture": int(match.group(2))}
+    match = SLIDES_PATTERN.match(filename)
+    if match:
+        return {"kind": "slides", "week": int(match.group(1)), "lecture": None}
+    return {"kind": "other", "week": None, "lecture": None}
+
+
+def _write_catalog_entry(conn: sqlite3.Connection, source: str, chunk_count: int):
+    if chunk_count == 0:
+        conn.execute("DELETE FROM catalog WHERE source = ?", (source,))
+        return
+    info = parse_source(source)
+    conn.execute(
+        "INSERT OR REPLACE INTO catalog (source, kind, week, lecture, chunk_count, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (source, info["kind"], info["week"], info["lecture"], chunk_count, time.time())
+    )
+
+
+def _document_order(metadata: Optional[Dict], position: int) -> tuple:
+    """
+Sort key that puts the chunks of one file back in reading order.
+
+Chunks written by the ingestion pipeline carry an explicit chunk_index; older
+chunks fall back to the PDF page / splitter start offset, then insertion order.
+    """
+    metadata = metadata or {}
+    if "chunk_index" in metadata:
+        return (int(metadata["chunk_index"]), 0, position)
+    return (int(metadata.get("page", 0) or 0), int(metadata.get("start_index", 0) or 0), position)
+
+
+def _group_by_source(ids: List[str], metadatas: List[Optional[Dict]]) -> Dict[str, List[str]]:
+    """Chunk ids per source, in document order"""
+    grouped: Dict[str, List[tuple]] = {}
+    for position, (chunk_id, metadata) in enumerate(zip(ids, metadatas)):
+        source = (metadata or {}).get("source")
+        if source:
+            grouped.setdefault(source, []).append((_document_order(metadata, position), chunk_id))
+    return {source: [chunk_id for _, chunk_id in sorted(chunks)] for source, chunks in grouped.items()}
+
+
+def record_source_chunks(source: str, chunk_ids: List[str], persist_directory: str = "vector_store",
+                         content_changed: bool = True):
+    """
+Replace the indexed chunk list of one source (chunk_ids must be in document order).
+
+Bumps the collection version unless `content_changed` is False, i.e. the
+chunks were already in the collection and are only being indexed.
+    """
+    with closing(_connect(persist_directory)) as conn, conn:
+        conn.execute("DELETE FROM source_chunks WHERE source = ?", (source,))
+        conn.executemany(
+            "INSERT INTO source_chunks (source, position, chunk_id) VALUES (?, ?, ?)",
+            [(source, position, chunk_id) for position, chunk_id in enumerate(chunk_ids)]
+        )
+        _write_catalog_entry(conn, source, len(chunk_ids))
+        if content_changed:
+            _bump_version(conn)
+
+
+def get_ingested_hash(source: str, persist_directory: str = "vector_store") -> Optional[str]:
+    """Content hash of `source` at its last ingestion (None if it was never ingested)"""
+    with closing(_connect(persist_directory)) as conn:
+        row = conn.execute("SELECT content_hash FROM ingested_files WHERE source = ?", (source,)).fetchone()
+    return row[0] if row else None
+
+
+def record_ingested_file(source: str, content_hash: str, chunk_ids: List[str],
+                         persist_directory: str = "vector_store"):
+    """Record a completed ingestion: the source's chunks (bumping the collection version) and its content hash"""
+    record_source_chunks(source, chunk_ids, persist_directory)
+    with closing(_connect(persist_directory)) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO ingested_files (source, content_hash, chunk_count, ingested_at) "
+            "VALUES (?, ?, ?, ?)",
+            (source, content_hash, len(chunk_ids), time.time())
+        )
+
+
+def build_source_index(vector_store, persist_directory: str = "vector_store") -> int:
+    """
+Rebuild the source -> chunk id index and the catalog from the collection.
+
+Reads ids and metadata only (no documents, no embeddings). Needed once for a
+collection that predates the index; the ingestion pipeline keeps it current
+afterwards.
+
+Returns:
+Number of sources indexed
+    """
+    results = vector_store.get(include=["metadatas"])
+    grouped = _group_by_source(results.get("ids", []), results.get("metadatas", []))
+
+    with closing(_connect(persist_directory)) as conn, conn:
+        conn.execute("DELETE FROM source_chunks")
+        conn.execute("DELETE FROM catalog")
+        conn.executemany(
+            "INSERT INTO source_chunks (source, position, chunk_id) VALUES (?, ?, ?)",
+            [(source, position, chunk_id)
+             for source, chunk_ids in grouped.items()
+             for position, chunk_id in enumerate(chunk_ids)]
+        )
+        for source, chunk_ids in grouped.items():
+            _write_catalog_entry(conn, source, len(chunk_ids))
+        _set_meta(conn, "source_index_built", "1")
+        _bump_version(conn)
+    return len(grouped)
+
+
+def ensure_source_index(vector_store, persist_directory: str = "vector_store"):
+    """Build the index the first time it is needed"""
+    with closing(_connect(persist_directory)) as conn:
+        built = _get_meta(conn, "source_index_built")
+    if not built:
+        build_source_index(vector_store, persist_directory)
+
+
+def get_source_chunk_ids(source: str, persist_directory: str = "vector_store") -> List[str]:
+    """Indexed chunk ids of one source, in document order"""
+    with closing(_connect(persist_directory)) as conn:
+        rows = conn.execute(
+            "SELECT chunk_id FROM source_chunks WHERE source = ? ORDER BY position", (source,)
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+def resolve_source(source: str, persist_directory: str = "vector_store") -> Optional[str]:
+    """
+Catalogued source for a filename: the source itself, or else the first one
+ingested from a subfolder under that filename (e.g. "week4/Week_4_Lecture_1.pdf").
+    """
+    with closing(_connect(persist_directory)) as conn:
+        row = conn.execute(
+            "SELECT source FROM catalog WHERE source = ? OR substr(source, -length(?) - 1) = '/' || ? "
+            "ORDER BY source = ? DESC, source LIMIT 1",
+            (source, source, source, source)
+        ).fetchone()
+    return row[0] if row else None
+
+
+def get_source_documents(vector_store, source: str, persist_directory: str = "vector_store",
+                         where: Optional[Dict] = None) -> List[Document]:
+    """
+Every chunk of one source file, in document order.
+
+Looks the chunk ids up in the index and fetches them by id, so there is no
+embedding computation, no ANN search and no k limit.
+
+Args:
+vector_store: The Chroma vector store
+source: Source filename, e.g. "Week_4_Lecture_1.pdf" (also found when ingested from a subfolder)
+persist_directory: Directory for the vector store
+where: Metadata filter to use instead when `source` is not indexed
+
+Returns:
+List of documents (empty if nothing matches)
+    """
+    ensure_source_index(vector_store, persist_directory)
+    chunk_ids = get_source_chunk_ids(resolve_source(source, persist_directory) or source, persist_directory)
+
+    if chunk_ids:
+        results = vector_store.get(ids=chunk_ids, include=["documents", "metadatas"])
+        by_id = {
+            chunk_id: Document(page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        }
+        return [by_id[chunk_id] for chunk_id in chunk_ids if chunk_id in by_id]
+
+    # Not indexed (e.g. added outside the ingestion pipeline): exact metadata match instead
+    results = vector_store.get(where=where or {"source": source}, include=["documents", "metadatas"])
+    if not results.get("ids"):
+        return []
+
+    order = {
+        chunk_id: _document_order(metadata, position)
+        for position, (chunk_id, metadata) in enumerate(zip(results["ids"], results["metadatas"]))
+    }
+    documents = sorted(
+        zip(results["ids"], results["documents"], results["metadatas"]),
+        key=lambda row: order[row[0]]
+    )
+    if where is None:
+        record_source_chunks(source, [chunk_id for chunk_id, _, _ in documents], persist_directory,
+                             content_changed=False)
+    return [Document(page_content=text, metadata=metadata or {}) for _, text, metadata in documents]
+
+
+def get_catalog(vector_store, persist_directory: str = "vector_store",
+                kind: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+Sources in the collection with their chunk counts, ordered by filename.
+
+Reads the catalog table maintained at ingest time, so the cost depends on the
+number of files rather than on the number of chunks.
+
+Args:
+vector_store: The Chroma vector store (only scanned if the index was never built)
+persist_directory: Directory for the vector store
+kind: Only return "lecture", "slides" or "other" sources
+
+Returns:
+List of dicts with source, kind, week, lecture and chunk_count
+    """
+    ensure_source_index(vector_store, persist_directory)
+
+    query = "SELECT source, kind, week, lecture, chunk_count FROM catalog"
+    params: tuple = ()
+    if kind:
+        query += " WHERE kind = ?"
+        params = (kind,)
+    with closing(_connect(persist_directory)) as conn:
+        rows = conn.execute(query + " ORDER BY source", params).fetchall()
+
+    return [
+        {"source": source, "kind": row_kind, "week": week, "lecture": lecture, "chunk_count": chunk_count}
+        for source, row_kind, week, lecture, chunk_count in rows
+    ]
+
+
+def get_week_partitions(vector_store, weeks: List[int], persist_directory: str = "vector_store") -> Dict[int, List[str]]:
+    """
+Chunk ids of every lecture and slide deck of each week (the week shard map).
+
+Args:
+vector_store: The Chroma vector store (only scanned if the index was never built)
+weeks: Week numbers
+persist_directory: Directory for the vector store
+
+Returns:
+Week number -> chunk ids of that week's sources, by source name then document order
+    """
+    ensure_source_index(vector_store, persist_directory)
+
+    placeholders = ",".join("?" * len(weeks))
+    with closing(_connect(persist_directory)) as conn:
+        rows = conn.execute(
+            "SELECT catalog.week, source_chunks.chunk_id FROM catalog "
+            "JOIN source_chunks ON source_chunks.source = catalog.source "
+            f"WHERE catalog.week IN ({placeholders}) "
+            "ORDER BY catalog.week, catalog.source, source_chunks.position",
+            tuple(weeks)
+        ).fetchall()
+
+    partitions: Dict[int, List[str]] = {week: [] for week in weeks}
+    for week, chunk_id in rows:
+        partitions[week].append(chunk_id)
+    return partitions
@@ -0,0 +1,197 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_CACHE_PATH = os.path.join("instance", "embedding_cache.db")
+DEFAULT_MAX_ENTRIES = 50000
+
+# Check the table size after this many inserts instead of after every insert
+EVICTION_CHECK_INTERVAL = 200
+# Evict down to this fraction of max_entries so we don't evict on every insert
+EVICTION_LOW_WATERMARK = 0.9
+# Only refresh an entry's last_used when it is older than this (seconds), so
+# cache hits are reads; eviction order only needs this resolution
+LAST_USED_INTERVAL = 3600
+
+
+def text_key(model_name: str, text: str) -> str:
+    """Content address of an embedding: model name plus the text hash"""
+    return hashlib.sha256(f"{model_name}\n{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+On-disk embedding cache shared by every worker on the host.
+
+Vectors are stored as float32 blobs in SQLite (WAL mode, so readers in
+other workers never block). Entries are evicted least-recently-used once
+the table grows past `max_entries`.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._inserts_since_check = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._initialize()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def reset_connections(self):
+        """Forget connections inherited from a parent process (call after fork)"""
+        self._local = threading.local()
+
+    def _initialize(self):
+        conn = self._connection()
+        conn.execute('''
+CREATE TABLE IF NOT EXISTS embeddings (
+key TEXT PRIMARY KEY,
+model TEXT NOT NULL,
+vector BLOB NOT NULL,
+last_used REAL NOT NULL
+)
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        conn.commit()
+
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Cached vectors for `texts` (None where there is no entry)"""
+        keys = [text_key(model_name, text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        outdated: List[str] = []
+        now = time.time()
+        conn = self._connection()
+
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT key, vector, last_used FROM embeddings WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            for key, blob, last_used in rows:
+                found[key] = array("f", blob).tolist()
+                if last_used < now - LAST_USED_INTERVAL:
+                    outdated.append(key)
+
+        if outdated:
+            conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in outdated])
+            conn.commit()
+
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return [found.get(key) for key in keys]
+
+    def put_many(self, model_name: str, texts: List[str], vectors: List[List[float]]):
+        """Store vectors for `texts`"""
+        now = time.time()
+        rows = [
+            (text_key(model_name, text), model_name, array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        conn = self._connection()
+        conn.executemany("INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+
+        with self._lock:
+            self._inserts_since_check += len(rows)
+            should_check = self._inserts_since_check >= EVICTION_CHECK_INTERVAL
+            if should_check:
+                self._inserts_since_check = 0
+        if should_check:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop least recently used entries beyond max_entries, returns how many were removed"""
+        conn = self._connection()
+        (count,) = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if count <= self.max_entries:
+            return 0
+
+        excess = count - int(self.max_entries * EVICTION_LOW_WATERMARK)
+        conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (excess,)
+        )
+        conn.commit()
+        return excess
+
+    def clear(self, model_name: Optional[str] = None):
+        """Remove every entry (or only those of one model)"""
+        conn = self._connection()
+        if model_name:
+            conn.execute("DELETE FROM embeddings WHERE model = ?", (model_name,))
+        else:
+            conn.execute("DELETE FROM embeddings")
+        conn.commit()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters for this process plus the number of entries on disk"""
+        (entries,) = self._connection().execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": entries,
+                "max_entries": self.max_entries
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only runs the model for texts missing from the cache"""
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(self.model_name, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+        if missing:
+            # De-duplicate so a repeated text is only embedded once per call
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            computed = dict(zip(unique_texts, self.embeddings.embed_documents(unique_texts)))
+            self.cache.put_many(self.model_name, unique_texts, [computed[text] for text in unique_texts])
+            for i in missing:
+                vectors[i] = computed[texts[i]]
+
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        # Some models embed queries differently from documents, so keep them apart
+        query_model = f"{self.model_name}:query"
+        vector = self.cache.get_many(query_model, [text])[0]
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put_many(query_model, [text], [vector])
+        return vector
@@ -1,30 +1,13 @@
-import os
 from typing import Dict
 from functools import lru_cache
 
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
 
-# Global singleton for LLM
-_llm = None
-
-def get_api_key() -> str:
-    """Get API key from environment variable"""
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("GOOGLE_API_KEY environment variable not set")
-    return api_key
+import ai_runtime
 
 def get_llm():
-    """Singleton pattern for LLM to avoid multiple initializations"""
-    global _llm
-    if _llm is None:
-        _llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            google_api_key=get_api_key(),
-            temperature=0.2
-        )
-    return _llm
+    """Shared language model from the AI runtime"""
+    return ai_runtime.get_llm(owner=__name__, temperature=0.2)
 
 # Error categorization with expanded categories
 ERROR_CATEGORIES: Dict[str, str] = {
@@ -0,0 +1,56 @@
+# Gunicorn settings for the backend: `gunicorn app:app` picks this file up
+# automatically when started from Application/backend.
+#
+# Set KIA_PRELOAD_AI=1 to load the embeddings model and the Chroma HNSW index
+# in the master before the workers are forked. The workers then share those
+# pages copy-on-write instead of each loading its own copy, and the first AI
+# request in a worker does not pay the cold-start cost.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+
+preload_ai = os.environ.get("KIA_PRELOAD_AI", "0") == "1"
+
+# The AI components can only be shared if the app itself is loaded in the master
+preload_app = preload_ai
+
+if preload_ai:
+    # HuggingFace tokenizers' thread pool does not survive fork
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded and before any worker is forked"""
+    if not preload_ai:
+        return
+
+    import ai_runtime
+    import lazy_ai
+
+    imports = lazy_ai.warm_up()
+    server.log.info("AI modules imported in %.2fs", sum(imports.values()))
+
+    try:
+        timings = ai_runtime.warm_up()
+    except Exception as e:
+        # Workers still work without the preload, they just start cold
+        server.log.warning("AI warm-up failed, workers will load lazily: %s", e)
+        return
+
+    server.log.info(
+        "AI warm-up done: embeddings %.2fs, vector store %.2fs, first query %.2fs, rss %.0f MiB",
+        timings["embeddings"], timings["vector_store"], timings["first_query"],
+        ai_runtime.current_rss_mb()
+    )
+
+
+def post_fork(server, worker):
+    """Give each worker its own database / network handles"""
+    if not preload_ai:
+        return
+
+    import ai_runtime
+
+    ai_runtime.after_fork()
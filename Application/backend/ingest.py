@@ -0,0 +1,288 @@
+"""
+Ingestion pipeline for lecture transcripts and slide decks.
+
+- PDFs are parsed and split in a process pool
+- chunks of several files are embedded together in large batches
+- every chunk gets source, kind, week, lecture, chunk_index and page metadata
+- files whose content hash is unchanged since the last run are skipped
+- a file's source name is its path relative to the directory it was found
+  in (its filename when given directly), so same-named files in different
+  folders are kept apart
+
+Each file is recorded in corpus_index once its chunks are written, which
+updates the catalog and bumps the collection version (invalidating cached
+retrievals).
+
+Usage (from Application/backend):
+    python -m ingest path/to/pdfs/                   # every *.pdf below the directory
+    python -m ingest Week_4_Lecture_1.pdf --force    # re-ingest even if unchanged
+"""
+import argparse
+import bisect
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import ai_runtime
+import corpus_index
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+DEFAULT_EMBED_BATCH_SIZE = 256
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def split_text(text: str) -> List[Tuple[str, int]]:
+    """Chunks of a text with their start offsets"""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=["\n\n", "\n", " ", ""],
+        add_start_index=True
+    )
+    return [(doc.page_content, doc.metadata["start_index"]) for doc in splitter.create_documents([text])]
+
+
+def chunk_metadata(source: str, chunk_index: int, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+Metadata stored with every chunk.
+
+`week` is a string because week_summarizer filters on {"week": str(week)};
+Chroma metadata cannot hold None, so unknown fields are left out.
+    """
+    info = corpus_index.parse_source(source)
+    metadata = dict(extra or {})
+    metadata.update({"source": source, "kind": info["kind"], "chunk_index": chunk_index})
+    if info["week"] is not None:
+        metadata["week"] = str(info["week"])
+    if info["lecture"] is not None:
+        metadata["lecture"] = info["lecture"]
+    return metadata
+
+
+def parse_pdf(path: str, source: Optional[str] = None) -> Dict[str, Any]:
+    """
+Extract and split one PDF (runs in a worker process).
+
+`source` defaults to the filename.
+
+Pages are joined before splitting so chunks can cross page breaks; each chunk
+is tagged with the page it starts on.
+    """
+    from pypdf import PdfReader
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    page_starts, pages, offset = [], [], 0
+    for page in PdfReader(path).pages:
+        text = page.extract_text() or ""
+        page_starts.append(offset)
+        pages.append(text)
+        offset += len(text) + 1
+
+    source = source or os.path.basename(path)
+    chunks = [
+        (text, chunk_metadata(source, index, {"page": bisect.bisect_right(page_starts, start) - 1}))
+        for index, (text, start) in enumerate(split_text("\n".join(pages)))
+    ]
+    return {"source": source, "content_hash": content_hash(data), "chunks": chunks}
+
+
+def _existing_chunk_ids(vector_store, source: str, persist_directory: str) -> List[str]:
+    """Chunk ids of a source, including chunks that were added before the index existed"""
+    ids = set(corpus_index.get_source_chunk_ids(source, persist_directory))
+    ids.update(vector_store.get(where={"source": source}, include=[])["ids"])
+    return list(ids)
+
+
+def _write_chunks(vector_store, ids: List[str], texts: List[str], vectors: List[List[float]],
+                  metadatas: List[Dict[str, Any]]):
+    """Write precomputed embeddings to either vector backend"""
+    if hasattr(vector_store, "add_embeddings"):
+        vector_store.add_embeddings(ids, texts, vectors, metadatas)
+        return
+    batch_size = vector_store._client.get_max_batch_size()
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        vector_store._collection.upsert(
+            ids=ids[start:end], embeddings=vectors[start:end],
+            documents=texts[start:end], metadatas=metadatas[start:end]
+        )
+
+
+def write_source(vector_store, source: str, digest: str, chunks: List[Tuple[str, Dict[str, Any]]],
+                 vectors: List[List[float]], persist_directory: str = "vector_store") -> List[str]:
+    """
+Replace every chunk of `source` with the given chunks and record the ingestion.
+
+Args:
+vector_store: Vector store to write to
+source: Source filename
+digest: Content hash of the source
+chunks: (text, metadata) pairs in document order
+vectors: Embedding of each chunk
+persist_directory: Directory for the vector store
+
+Returns:
+The new chunk ids, in document order
+    """
+    stale_ids = _existing_chunk_ids(vector_store, source, persist_directory)
+    if stale_ids:
+        vector_store.delete(ids=stale_ids)
+
+    ids = [f"{source}#{index}:{digest[:12]}" for index in range(len(chunks))]
+    if chunks:
+        _write_chunks(vector_store, ids, [text for text, _ in chunks], vectors, [meta for _, meta in chunks])
+    corpus_index.record_ingested_file(source, digest, ids, persist_directory)
+    return ids
+
+
+def embed_and_write(vector_store, embeddings, parsed: List[Dict[str, Any]], persist_directory: str,
+                     batch_size: int) -> int:
+    """
+Embed the chunks of several sources together, then write each source.
+
+Args:
+vector_store: Vector store to write to
+embeddings: Embeddings model
+parsed: Dicts with source, content_hash and chunks ((text, metadata) pairs)
+persist_directory: Directory for the vector store
+batch_size: Chunks per embedding call
+
+Returns:
+Number of chunks written
+    """
+    texts = [text for item in parsed for text, _ in item["chunks"]]
+    vectors: List[List[float]] = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(embeddings.embed_documents(texts[start:start + batch_size]))
+
+    offset = 0
+    for item in parsed:
+        count = len(item["chunks"])
+        write_source(vector_store, item["source"], item["content_hash"], item["chunks"],
+                     vectors[offset:offset + count], persist_directory)
+        offset += count
+    if hasattr(vector_store, "flush"):
+        # A NumPy store saves once per batch, not once per source
+        vector_store.flush()
+    return len(texts)
+
+
+def source_name(path: str, root: Optional[str] = None) -> str:
+    """Source name of a file: its path relative to `root` with "/" separators, or its filename"""
+    if root is None:
+        return os.path.basename(path)
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+def find_pdfs(paths: Iterable[str]) -> List[Tuple[str, str]]:
+    """(path, source name) of the PDF files among `paths`, searching directories recursively"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found.extend(
+                    (os.path.join(root, name), source_name(os.path.join(root, name), path))
+                    for name in files if name.lower().endswith(".pdf")
+                )
+        elif path.lower().endswith(".pdf"):
+            found.append((path, source_name(path)))
+    return sorted(found)
+
+
+def ingest_pdfs(
+        paths: List[str],
+        persist_directory: str = "vector_store",
+        workers: Optional[int] = None,
+        batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+        force: bool = False
+) -> Dict[str, Any]:
+    """
+Ingest PDFs into the shared vector store.
+
+Args:
+paths: PDF files or directories containing them
+persist_directory: Directory for the vector store
+workers: Parser processes (default: number of CPUs)
+batch_size: Chunks per embedding call
+force: Re-ingest files even if their content hash is unchanged
+
+Returns:
+Dictionary with counts of ingested/skipped files and chunks, and the elapsed time
+    """
+    started = time.perf_counter()
+    # Always Chroma: the NumPy backend is an export of it, refreshed below
+    vector_store = ai_runtime.get_ingest_vector_store(persist_directory, owner=__name__)
+    embeddings = ai_runtime.get_embeddings(owner=__name__)
+    corpus_index.ensure_source_index(vector_store, persist_directory)
+
+    # Hashing is cheap next to parsing, so unchanged files never reach the pool
+    changed, skipped = [], []
+    for path, source in find_pdfs(paths):
+        with open(path, "rb") as f:
+            digest = content_hash(f.read())
+        if not force and corpus_index.get_ingested_hash(source, persist_directory) == digest:
+            skipped.append(path)
+        else:
+            changed.append((path, source))
+
+    chunk_count = 0
+    failed: Dict[str, str] = {}
+    if changed:
+        # spawn, not fork: the parent already has the embedding model (and its threads) loaded
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(parse_pdf, path, source): path for path, source in changed}
+            pending: List[Dict[str, Any]] = []
+            for future in as_completed(futures):
+                try:
+                    pending.append(future.result())
+                except Exception as e:
+                    failed[futures[future]] = str(e)
+                    continue
+                # Embed as soon as there is a full batch, while the pool keeps parsing
+                if sum(len(item["chunks"]) for item in pending) >= batch_size:
+                    chunk_count += embed_and_write(vector_store, embeddings, pending, persist_directory, batch_size)
+                    pending = []
+            if pending:
+                chunk_count += embed_and_write(vector_store, embeddings, pending, persist_directory, batch_size)
+        ai_runtime.refresh_vector_store(persist_directory)
+
+    ingested = len(changed) - len(failed)
+    return {
+        "success": not failed,
+        "message": f"Ingested {ingested} file(s) ({chunk_count} chunks), skipped {len(skipped)} unchanged",
+        "ingested": ingested,
+        "skipped": len(skipped),
+        "failed": failed,
+        "chunks": chunk_count,
+        "seconds": round(time.perf_counter() - started, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="PDF files or directories")
+    parser.add_argument("--persist-directory", default=ai_runtime.DEFAULT_PERSIST_DIRECTORY)
+    parser.add_argument("--workers", type=int, help="Parser processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_EMBED_BATCH_SIZE, help="Chunks per embedding call")
+    parser.add_argument("--force", action="store_true", help="Re-ingest unchanged files too")
+    args = parser.parse_args()
+
+    result = ingest_pdfs(args.paths, args.persist_directory, args.workers, args.batch_size, args.force)
+    print(f"{result['message']} in {result['seconds']}s")
+    for path, error in result["failed"].items():
+        print(f"  failed: {path}: {error}")
+
+
+if __name__ == "__main__":
+    main()
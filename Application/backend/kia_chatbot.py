@@ -1,72 +1,56 @@
+import asyncio
+import logging
 import os
 import sqlite3
+import time
 import warnings
 from functools import lru_cache
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, Iterator
 
 warnings.filterwarnings("ignore")
 
 # LangChain imports
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.chains import create_retrieval_chain, create_history_aware_retriever
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_chroma import Chroma
 from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables.history import RunnableWithMessageHistory
 
+import ai_runtime
+import retrieval
+import retrieval_cache
+
 # Global singletons
-_embeddings = None
-_vector_store = None
-_llm = None
 _rag_chain = None
 _conversation_chain = None
 
+FALLBACK_RESPONSE = "I seem to be having a little brain freeze! Let's chat again in a moment? 😅"
+EMPTY_ANSWER = "Hmm, I'm having a little trouble with that right now. Can we try a different question? 😊"
+
+logger = logging.getLogger(__name__)
+
 # Database configuration
 if not os.path.exists("instance"):
     os.makedirs("instance")
 
-DB_PATH = os.path.join("instance", "app.db")
-
-def get_api_key() -> str:
-    """Get API key for Google Generative AI"""
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("Google API key is not set")
-    return api_key
+DB_PATH = os.getenv("KIA_CHAT_DB", os.path.join("instance", "app.db"))
 
 def get_embeddings():
-    """Singleton for embeddings"""
-    global _embeddings
-    if _embeddings is None:
-        _embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
-    return _embeddings
+    """Shared embeddings from the AI runtime"""
+    return ai_runtime.get_embeddings(owner=__name__)
 
 def get_vector_store(persist_directory: str = "vector_store"):
-    """Singleton for vector store"""
-    global _vector_store
-    if _vector_store is None:
-        _vector_store = Chroma(
-            collection_name="pdf_embeddings",
-            embedding_function=get_embeddings(),
-            persist_directory=persist_directory
-        )
-    return _vector_store
+    """Shared vector store from the AI runtime"""
+    return ai_runtime.get_vector_store(persist_directory, owner=__name__)
+
+def get_lexical_index(persist_directory: str = "vector_store"):
+    """Shared BM25 index over the vector store's chunks"""
+    return ai_runtime.get_lexical_index(persist_directory, owner=__name__)
 
 def get_llm():
-    """Singleton for language model"""
-    global _llm
-    if _llm is None:
-        _llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            google_api_key=get_api_key(),
-            convert_system_message_to_human=False
-        )
-    return _llm
+    """Shared language model from the AI runtime"""
+    return ai_runtime.get_llm(owner=__name__)
 
 def initialize_database():
     """Initialize the chat history database"""
@@ -267,9 +251,17 @@ def get_chain():
     global _rag_chain, _conversation_chain
 
     if _rag_chain is None or _conversation_chain is None:
-        # Initialize the vector store retriever
-        vector_store = get_vector_store()
-        retriever = vector_store.as_retriever(search_kwargs={"k": 3})
+        # Initialize the hybrid (BM25 + vector) retriever, read through the retrieval cache
+        retriever = retrieval_cache.CachedRetriever(
+            retriever=retrieval.HybridRetriever(
+                vector_store=get_vector_store(),
+                get_lexical_index=get_lexical_index,
+                k=3
+            ),
+            cache=ai_runtime.get_retrieval_cache(),
+            kind="hybrid",
+            k=3
+        )
 
         # Create the prompts
         system_prompt = get_system_prompt()
@@ -312,6 +304,24 @@ def get_chain():
 
     return _conversation_chain
 
+def make_result(user_id: int, response: str) -> Dict[str, Any]:
+    """get_answer result for a generated answer"""
+    return {
+        "success": True,
+        "message": "Response generated successfully",
+        "response": response,
+        "user_id": user_id
+    }
+
+def make_error(user_id: int, error: Exception) -> Dict[str, Any]:
+    """get_answer result when the answer couldn't be generated"""
+    return {
+        "success": False,
+        "message": f"Failed to generate response: {str(error)}",
+        "response": FALLBACK_RESPONSE,
+        "user_id": user_id
+    }
+
 def get_answer(user_id: int, user_query: str) -> Dict[str, Any]:
     """
 Get an answer from Kia for a user query.
@@ -336,25 +346,140 @@ Dictionary with response data
             config={"configurable": {"session_id": str(user_id)}}
         )
 
-        ai_response = response_data.get("answer", "Hmm, I'm having a little trouble with that right now. Can we try a different question? 😊")
+        ai_response = response_data.get("answer", EMPTY_ANSWER)
 
         # Save the chat turn
         save_chat_turn_to_db(user_id, user_query, ai_response)
 
-        return {
-            "success": True,
-            "message": "Response generated successfully",
-            "response": ai_response,
-            "user_id": user_id
-        }
+        return make_result(user_id, ai_response)
 
     except Exception as e:
-        return {
-            "success": False,
-            "message": f"Failed to generate response: {str(e)}",
-            "response": "I seem to be having a little brain freeze! Let's chat again in a moment? 😅",
-            "user_id": user_id
-        }
+        return make_error(user_id, e)
+
+def stream_answer(user_id: int, user_query: str) -> Iterator[Dict[str, Any]]:
+    """
+Stream Kia's answer to a user query as it is generated.
+
+Yields one {"event": "token", "data": {"text": ...}} per answer chunk from
+the RAG chain, then a final "done" event carrying the same fields as
+get_answer plus ttft_ms (time to the first answer token) and total_ms. On
+failure the final event is "error" with the get_answer failure fields.
+
+The turn is saved to the chat history once the answer is complete. If the
+client disconnects first, the partial answer is not saved.
+
+Args:
+user_id: The user ID
+user_query: The user's query text
+
+Yields:
+Event dictionaries with "event" and "data"
+    """
+    started = time.perf_counter()
+    ttft_ms = None
+    chunks = []
+
+    try:
+        # Initialize the database if it doesn't exist
+        initialize_database()
+
+        # Get the conversation chain
+        conversation_chain = get_chain()
+
+        # Retrieval runs first; its outputs (input, context, ...) arrive as their own chunks
+        for output in conversation_chain.stream(
+            {"input": user_query, "chat_history": load_chat_history_from_db(user_id)},
+            config={"configurable": {"session_id": str(user_id)}}
+        ):
+            text = output.get("answer")
+            if not text:
+                continue
+            if ttft_ms is None:
+                ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+            chunks.append(text)
+            yield {"event": "token", "data": {"text": text}}
+
+        ai_response = "".join(chunks) or EMPTY_ANSWER
+
+        # Save the chat turn
+        save_chat_turn_to_db(user_id, user_query, ai_response)
+
+        total_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info("Kia stream for user %s: ttft %s ms, total %s ms", user_id, ttft_ms, total_ms)
+        yield {"event": "done", "data": {**make_result(user_id, ai_response), "ttft_ms": ttft_ms, "total_ms": total_ms}}
+
+    except Exception as e:
+        yield {"event": "error", "data": make_error(user_id, e)}
+
+async def aget_answer(user_id: int, user_query: str) -> Dict[str, Any]:
+    """
+Async get_answer for the async serving mode (asgi.py).
+
+The chain runs with ainvoke: retrieval goes to a worker thread and Gemini is
+awaited, so one process can hold many answers in flight. Chat history reads
+and writes run in worker threads.
+
+Args:
+user_id: The user ID
+user_query: The user's query text
+
+Returns:
+Dictionary with response data (same fields as get_answer)
+    """
+    try:
+        await asyncio.to_thread(initialize_database)
+
+        # The first call loads the embedding model and vector store
+        conversation_chain = await asyncio.to_thread(get_chain)
+
+        chat_history = await asyncio.to_thread(load_chat_history_from_db, user_id)
+        response_data = await conversation_chain.ainvoke(
+            {"input": user_query, "chat_history": chat_history},
+            config={"configurable": {"session_id": str(user_id)}}
+        )
+
+        ai_response = response_data.get("answer", EMPTY_ANSWER)
+
+        await asyncio.to_thread(save_chat_turn_to_db, user_id, user_query, ai_response)
+
+        return make_result(user_id, ai_response)
+
+    except Exception as e:
+        return make_error(user_id, e)
+
+async def astream_answer(user_id: int, user_query: str) -> AsyncIterator[Dict[str, Any]]:
+    """Async stream_answer for the async serving mode (same events)"""
+    started = time.perf_counter()
+    ttft_ms = None
+    chunks = []
+
+    try:
+        await asyncio.to_thread(initialize_database)
+        conversation_chain = await asyncio.to_thread(get_chain)
+        chat_history = await asyncio.to_thread(load_chat_history_from_db, user_id)
+
+        async for output in conversation_chain.astream(
+            {"input": user_query, "chat_history": chat_history},
+            config={"configurable": {"session_id": str(user_id)}}
+        ):
+            text = output.get("answer")
+            if not text:
+                continue
+            if ttft_ms is None:
+                ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+            chunks.append(text)
+            yield {"event": "token", "data": {"text": text}}
+
+        ai_response = "".join(chunks) or EMPTY_ANSWER
+
+        await asyncio.to_thread(save_chat_turn_to_db, user_id, user_query, ai_response)
+
+        total_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info("Kia stream for user %s: ttft %s ms, total %s ms", user_id, ttft_ms, total_ms)
+        yield {"event": "done", "data": {**make_result(user_id, ai_response), "ttft_ms": ttft_ms, "total_ms": total_ms}}
+
+    except Exception as e:
+        yield {"event": "error", "data": make_error(user_id, e)}
 
 def clear_user_history(user_id: int) -> Dict[str, Any]:
     """
@@ -0,0 +1,86 @@
+import importlib
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+# AI modules that pull in LangChain / Chroma / Gemini when imported
+AI_MODULES = (
+    "quiz_mock",
+    "week_summarizer",
+    "topic_specfic_mock",
+    "error_explainer",
+    "lecture_summarizer",
+    "kia_chatbot",
+    "notes_generator",
+    "topic_suggestions",
+)
+
+_proxies: Dict[str, "LazyModule"] = {}
+_import_seconds: Dict[str, float] = {}
+_lock = threading.RLock()
+
+
+class LazyModule:
+    """
+Stand-in for a module that is only imported on first attribute access.
+
+Workers that never hit an AI route never pay for importing the AI stack.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            with _lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    _import_seconds[self._name] = time.perf_counter() - start
+                    self._module = module
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Get the (shared) lazy proxy for a module"""
+    with _lock:
+        if name not in _proxies:
+            _proxies[name] = LazyModule(name)
+        return _proxies[name]
+
+
+def warm_up(names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """
+Import the AI modules ahead of the first request.
+
+Args:
+names: Modules to import, defaults to all AI modules
+
+Returns:
+Seconds spent importing each module (0.0 if it was already loaded)
+    """
+    timings = {}
+    for name in names or AI_MODULES:
+        proxy = lazy_import(name)
+        was_loaded = proxy.loaded
+        proxy._load()
+        timings[name] = 0.0 if was_loaded else round(_import_seconds.get(name, 0.0), 4)
+    return timings
+
+
+def loaded_modules() -> Dict[str, float]:
+    """AI modules imported so far, with their import time in seconds"""
+    with _lock:
+        return {name: round(seconds, 4) for name, seconds in _import_seconds.items()}
@@ -1,57 +1,33 @@
-import os
+import asyncio
 import warnings
 from typing import Dict, Any, List
-from functools import lru_cache
 
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from langchain_google_genai import ChatGoogleGenerativeAI
+import ai_runtime
+import artifact_store
+import context_builder
+import corpus_index
 
 # Suppress deprecation warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-# Global singletons for components
-_embeddings = None
-_vector_store = None
-_llm = None
-_summary_cache = {}
+# Bump when the summary prompt changes so stored summaries are regenerated
+PROMPT_VERSION = "1"
 
-def get_api_key() -> str:
-    """Get API key from environment variable"""
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("GOOGLE_API_KEY environment variable is not set")
-    return api_key
+# generate_lecture_summary reports Gemini failures in the summary text
+SUMMARY_ERROR_PREFIX = "Error generating summary"
 
 def get_embeddings():
-    """Singleton for embeddings"""
-    global _embeddings
-    if _embeddings is None:
-        _embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
-    return _embeddings
+    """Shared embeddings from the AI runtime"""
+    return ai_runtime.get_embeddings(owner=__name__)
 
 def get_vector_store(persist_directory: str = "vector_store"):
-    """Singleton for vector store"""
-    global _vector_store
-    if _vector_store is None:
-        _vector_store = Chroma(
-            collection_name="pdf_embeddings",
-            embedding_function=get_embeddings(),
-            persist_directory=persist_directory
-        )
-    return _vector_store
+    """Shared vector store from the AI runtime"""
+    return ai_runtime.get_vector_store(persist_directory, owner=__name__)
 
 def get_llm():
-    """Singleton for language model"""
-    global _llm
-    if _llm is None:
-        _llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            google_api_key=get_api_key()
-        )
-    return _llm
+    """Shared language model from the AI runtime"""
+    return ai_runtime.get_llm(owner=__name__)
+
 
 def get_lecture_filename(week: int, lecture: int) -> str:
     """Generate the standardized filename for a lecture transcript"""
@@ -61,42 +37,21 @@ def get_available_lectures(persist_directory: str = "vector_store") -> List[Dict
     """Get list of all available lectures in the vector store"""
     vector_store = get_vector_store(persist_directory)
 
-    # Get all documents to extract metadata
-    results = vector_store.get()
-
-    # Extract unique lecture names from metadata
-    lectures = set()
-    if results and 'metadatas' in results:
-        for metadata in results['metadatas']:
-            if metadata and 'source' in metadata:
-                source = metadata['source']
-                if source.startswith("Week_") and source.endswith(".pdf"):
-                    lectures.add(source)
-
-    # Parse week and lecture numbers
-    lecture_info = []
-    for lecture in sorted(lectures):
-        try:
-            # Extract week and lecture numbers from the filename
-            parts = lecture.replace('.pdf', '').split('_')
-            if len(parts) == 4 and parts[0] == 'Week' and parts[2] == 'Lecture':
-                lecture_info.append({
-                    'week': int(parts[1]),
-                    'lecture': int(parts[3]),
-                    'filename': lecture
-                })
-        except (ValueError, IndexError):
-            continue
-
-    return lecture_info
-
-@lru_cache(maxsize=50)
-def generate_lecture_summary(text: str) -> str:
-    """Generate a summary of the lecture text using Google Gemini"""
-    llm = get_llm()
+    # Read the precomputed catalog instead of scanning the whole collection
+    return [
+        {
+            'week': entry['week'],
+            'lecture': entry['lecture'],
+            'filename': entry['source'],
+            'chunk_count': entry['chunk_count']
+        }
+        for entry in corpus_index.get_catalog(vector_store, persist_directory, kind="lecture")
+    ]
 
+def get_lecture_prompt(text: str) -> str:
+    """Prompt asking Gemini for a Markdown summary of a lecture transcript"""
     # Use regular string with f-string for the text parameter
-    prompt = (
+    return (
         "You are a YouTube Video Lecture Summarizer specializing in academic content. "
         "Create a concise, well-structured summary (250-300 words) of the following lecture. "
 
@@ -137,30 +92,71 @@ def generate_lecture_summary(text: str) -> str:
         f"Please summarize the following lecture:\n\n{text}"
     )
 
+def response_text(response) -> str:
+    """Text of a Gemini response"""
+    return response.content if hasattr(response, "content") else str(response)
+
+def make_result(week: int, lecture: int, summary: str) -> Dict[str, Any]:
+    """summarize_lecture result for a generated summary"""
+    return {
+        "success": True,
+        "message": "Summary generated successfully",
+        "summary": summary,
+        "week": week,
+        "lecture": lecture
+    }
+
+def make_error(week: int, lecture: int, message: str) -> Dict[str, Any]:
+    """summarize_lecture result for a lecture that couldn't be summarized"""
+    return {
+        "success": False,
+        "message": message,
+        "summary": "",
+        "week": week,
+        "lecture": lecture
+    }
+
+def is_storable(result: Dict[str, Any]) -> bool:
+    """Whether a result holds a real summary rather than a reported Gemini failure"""
+    return not result["summary"].startswith(SUMMARY_ERROR_PREFIX)
+
+def generate_lecture_summary(text: str) -> str:
+    """Generate a summary of the lecture text using Google Gemini"""
+    llm = get_llm()
+    prompt = get_lecture_prompt(text)
+
     try:
         response = llm.invoke(prompt)
-        return response.content if hasattr(response, "content") else str(response)
+        return response_text(response)
     except Exception as e:
-        return f"Error generating summary: {str(e)}"
+        return f"{SUMMARY_ERROR_PREFIX}: {str(e)}"
+
+async def agenerate_lecture_summary(text: str) -> str:
+    """Async generate_lecture_summary: awaits Gemini without holding a thread"""
+    try:
+        response = await get_llm().ainvoke(get_lecture_prompt(text))
+        return response_text(response)
+    except Exception as e:
+        return f"{SUMMARY_ERROR_PREFIX}: {str(e)}"
 
 def retrieve_transcript(lecture_filename: str, persist_directory: str = "vector_store") -> str:
     """Retrieve the transcript content for a specific lecture"""
     vector_store = get_vector_store(persist_directory)
 
-    # Since there's only one transcript per lecture, use exact matching
-    retriever = vector_store.as_retriever(
-        search_kwargs={"filter": {"source": lecture_filename}, "k": 10}
-    )
-
-    docs = retriever.get_relevant_documents("")
+    # Fetch every chunk of the transcript by id, in document order
+    docs = corpus_index.get_source_documents(vector_store, lecture_filename, persist_directory)
 
     if not docs:
         return ""
 
-    # Combine all chunks from the transcript
-    transcript_text = "\n".join([doc.page_content for doc in docs])
+    # Combine all chunks from the transcript, without the text repeated by the chunk overlap
+    transcript_text = context_builder.build_context(docs, max_tokens=None)
     return transcript_text
 
+def get_summary_key(week: int, lecture: int, transcript: str) -> tuple:
+    """Artifact store key (kind, params, source hash, prompt version) of a lecture summary"""
+    return "lecture_summary", {"week": week, "lecture": lecture}, artifact_store.content_hash(transcript), PROMPT_VERSION
+
 def summarize_lecture(week: int, lecture: int, persist_directory: str = "vector_store") -> Dict[str, Any]:
     """
 Generate a summary for a specific lecture.
@@ -173,13 +169,6 @@ persist_directory: Directory of the vector store
 Returns:
 Dictionary with summary and metadata
     """
-    global _summary_cache
-
-    # Check if we already have this summary cached
-    cache_key = f"{week}_{lecture}"
-    if cache_key in _summary_cache:
-        return _summary_cache[cache_key]
-
     # Get the lecture filename
     lecture_filename = get_lecture_filename(week, lecture)
 
@@ -187,31 +176,48 @@ Dictionary with summary and metadata
     transcript = retrieve_transcript(lecture_filename, persist_directory)
 
     if not transcript:
-        result = {
-            "success": False,
-            "message": f"No transcript found for Week {week}, Lecture {lecture}",
-            "summary": "",
-            "week": week,
-            "lecture": lecture
-        }
-    else:
+        return make_error(week, lecture, f"No transcript found for Week {week}, Lecture {lecture}")
+
+    def summarize():
         # Generate summary from the transcript
-        summary = generate_lecture_summary(transcript)
-
-        result = {
-            "success": True,
-            "message": "Summary generated successfully",
-            "summary": summary,
-            "week": week,
-            "lecture": lecture
-        }
+        return make_result(week, lecture, generate_lecture_summary(transcript))
+
+    # Shared by all workers; a changed transcript hashes to a new entry
+    return artifact_store.get_or_create(
+        *get_summary_key(week, lecture, transcript),
+        summarize,
+        should_store=is_storable
+    )
+
+async def asummarize_lecture(week: int, lecture: int, persist_directory: str = "vector_store") -> Dict[str, Any]:
+    """
+Async summarize_lecture for the async serving mode (asgi.py).
 
-    # Cache the result
-    _summary_cache[cache_key] = result
-    return result
+The transcript is read in a worker thread and Gemini is awaited, so the event
+loop keeps serving other requests meanwhile. Needs an app context.
+
+Args:
+week: Week number (integer)
+lecture: Lecture number (integer)
+persist_directory: Directory of the vector store
+
+Returns:
+Dictionary with summary and metadata
+    """
+    transcript = await asyncio.to_thread(retrieve_transcript, get_lecture_filename(week, lecture), persist_directory)
+
+    if not transcript:
+        return make_error(week, lecture, f"No transcript found for Week {week}, Lecture {lecture}")
+
+    async def summarize():
+        return make_result(week, lecture, await agenerate_lecture_summary(transcript))
+
+    return await artifact_store.aget_or_create(
+        *get_summary_key(week, lecture, transcript),
+        summarize,
+        should_store=is_storable
+    )
 
 def clear_cache():
     """Clear all summary caches"""
-    global _summary_cache
-    _summary_cache = {}
-    generate_lecture_summary.cache_clear()
+    artifact_store.clear("lecture_summary")
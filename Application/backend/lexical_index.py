@@ -0,0 +1,120 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# BM25 parameters (the usual Okapi defaults)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+WORD_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+# Splits identifiers such as SGDRegressor -> SGD, Regressor and train_test_split -> train, test, split
+CAMEL_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it me of on or should the this to
+use used using what when where which who why with you your explain tell about vs difference between
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+Lowercased terms of a text.
+
+Identifiers are kept whole and also split into their parts, so a query for
+"SGDRegressor" matches the exact class name strongly and "regressor" loosely.
+    """
+    terms = []
+    for word in WORD_PATTERN.findall(text):
+        lowered = word.lower()
+        if lowered in STOPWORDS:
+            continue
+        terms.append(lowered)
+        parts = [part.lower() for part in CAMEL_PATTERN.findall(word)]
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part not in STOPWORDS)
+    return terms
+
+
+def _matches(metadata: Dict, filter: Optional[Dict]) -> bool:
+    """Equality-only subset of Chroma's where syntax"""
+    if not filter:
+        return True
+    return all(metadata.get(key) == value for key, value in filter.items())
+
+
+class LexicalIndex:
+    """
+In-memory BM25 index over the chunks of a Chroma collection.
+
+Built from the documents already stored in the collection, so it always
+covers exactly the chunks the vector search sees. Lookups need no
+embedding pass.
+    """
+
+    def __init__(self, ids: List[str], texts: List[str], metadatas: List[Optional[Dict]]):
+        self.ids = list(ids)
+        self.texts = list(texts)
+        self.metadatas = [metadata or {} for metadata in metadatas]
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.lengths: List[int] = []
+
+        for position, text in enumerate(self.texts):
+            counts = Counter(tokenize(text or ""))
+            self.lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                self.postings.setdefault(term, []).append((position, frequency))
+
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    @classmethod
+    def from_vector_store(cls, vector_store) -> "LexicalIndex":
+        """Index every chunk of a vector store (documents and metadata only, no embeddings)"""
+        results = vector_store.get(include=["documents", "metadatas"])
+        return cls(results.get("ids", []), results.get("documents", []), results.get("metadatas", []))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def document_frequency(self, term: str) -> int:
+        return len(self.postings.get(term, ()))
+
+    def _idf(self, term: str) -> float:
+        df = self.document_frequency(term)
+        return math.log(1 + (len(self.ids) - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 4, filter: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        """
+Top chunks for a query by BM25 score.
+
+Args:
+query: Query text
+k: Number of results
+filter: Metadata equality filter, e.g. {"source": "Week_4_Lecture_1.pdf"}
+
+Returns:
+List of (document, score) pairs, best first
+        """
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            for position, frequency in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[position] / self.average_length)
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        results = []
+        for position, score in ranked:
+            if not _matches(self.metadatas[position], filter):
+                continue
+            document = Document(id=self.ids[position], page_content=self.texts[position],
+                                metadata=self.metadatas[position])
+            results.append((document, score))
+            if len(results) == k:
+                break
+        return results
@@ -0,0 +1,371 @@
+"""
+Deadlines, retries and a circuit breaker for Gemini calls.
+
+A Gemini call that hung or failed held its gunicorn worker until the worker
+timeout, and while Gemini was down every request still paid for a full
+failed call before getting its fallback answer. LLMGuard wraps each call:
+
+- deadline: each module's calls have a time budget (ai_runtime.LLM_DEADLINES).
+  A call still running at its deadline is abandoned and raises
+  LLMDeadlineExceeded; time spent waiting for the rate limiter counts too
+- retries: transient failures (quota, 5xx, timeouts, dropped connections) are
+  retried with full-jitter exponential backoff, while the deadline allows
+- circuit breaker: after `failure_threshold` consecutive transient failures
+  the circuit opens and calls fail at once with CircuitOpenError, so modules
+  go straight to their fallback (a stored artifact, a canned answer). After
+  `reset_seconds` one trial call is let through; its success closes the
+  circuit again
+
+Streams are checked against the breaker and feed it their outcome, but are
+not retried (text may already have reached the client) and are not abandoned.
+
+GuardedLLM is the chat model runnable handed out by ai_runtime.get_llm. It
+also passes the time left as the Gemini request's own `timeout`, so a call
+abandoned at its deadline doesn't keep its thread waiting on a hung request.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import logging
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+import llm_limiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BASE_BACKOFF_SECONDS = 0.5
+DEFAULT_MAX_BACKOFF_SECONDS = 8.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_SECONDS = 30.0
+# Blocking calls run on this many threads, so the caller can stop waiting at the deadline
+DEFAULT_CALL_THREADS = 64
+
+# google.api_core exceptions worth retrying (quota, overload, server errors, timeouts)
+TRANSIENT_ERROR_NAMES = {
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "InternalServerError",
+    "BadGateway",
+    "GatewayTimeout",
+    "DeadlineExceeded",
+    "Aborted",
+    "RetryError",
+}
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """A Gemini call did not finish within its deadline"""
+
+
+class CircuitOpenError(Exception):
+    """Gemini calls are refused because recent calls kept failing"""
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a failed call may succeed if tried again"""
+    if isinstance(error, (llm_limiter.RateLimitExceeded, CircuitOpenError)):
+        # Already a decision not to call Gemini now; retrying would only add load
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def is_unavailable(error: BaseException) -> bool:
+    """
+Whether a failed call means Gemini can't be used right now: the circuit is
+open, the rate limiter refused the call, or it failed transiently (deadline
+included) on its last attempt. Callers serve a fallback instead.
+    """
+    return isinstance(error, (llm_limiter.RateLimitExceeded, CircuitOpenError)) or is_transient(error)
+
+
+class CircuitBreaker:
+    """Closed, open or half-open circuit over consecutive transient failures"""
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_seconds: float = DEFAULT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.times_opened = 0
+        self.rejected = 0
+
+    def before_call(self):
+        """
+Admit a call, or refuse it while the circuit is open.
+
+Raises:
+CircuitOpenError: The circuit is open, or half-open with its trial call already running
+        """
+        with self._lock:
+            if self.state == "closed":
+                return
+            elapsed = time.monotonic() - self._opened_at
+            if self.state == "open" and elapsed >= self.reset_seconds:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return
+            self.rejected += 1
+            raise CircuitOpenError(
+                f"Gemini is unavailable after {self.failures} failed calls; "
+                f"retrying in {max(0.0, self.reset_seconds - elapsed):.0f}s"
+            )
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Gemini circuit closed")
+            self.state = "closed"
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self.times_opened += 1
+                logger.warning("Gemini circuit opened after %d failed calls", self.failures)
+
+    def release(self):
+        """End an admitted call whose outcome says nothing about Gemini's health"""
+        with self._lock:
+            self._trial_running = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+
+class LLMGuard:
+    """Runs LLM calls with a deadline, retries and a shared circuit breaker"""
+
+    def __init__(self, breaker: Optional[CircuitBreaker] = None, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 base_backoff: float = DEFAULT_BASE_BACKOFF_SECONDS, max_backoff: float = DEFAULT_MAX_BACKOFF_SECONDS,
+                 call_threads: int = DEFAULT_CALL_THREADS):
+        self.breaker = breaker or CircuitBreaker()
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.call_threads = call_threads
+        self._executor = None
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.timeouts = 0
+
+    def _pool(self) -> concurrent.futures.ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    self.call_threads, thread_name_prefix="llm-call"
+                )
+            return self._executor
+
+    def _backoff(self, attempt: int) -> float:
+        """Full jitter: anywhere between 0 and the exponential backoff for this attempt"""
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** (attempt - 1)))
+
+    def _record(self, outcome: Optional[str]):
+        if outcome == "success":
+            self.breaker.record_success()
+        elif outcome == "failure":
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+
+    def _next_pause(self, error: Exception, attempt: int, deadline: float) -> Optional[float]:
+        """Seconds to wait before retrying after `error`, or None to give up"""
+        if not is_transient(error) or attempt >= self.max_attempts:
+            return None
+        pause = self._backoff(attempt)
+        if time.monotonic() + pause >= deadline:
+            return None
+        self.retries += 1
+        logger.warning("Gemini call failed (%s), retry %d in %.2fs", error, attempt, pause)
+        return pause
+
+    def _timed_out(self, deadline_seconds: float) -> LLMDeadlineExceeded:
+        with self._lock:
+            self.timeouts += 1
+        return LLMDeadlineExceeded(f"Gemini call exceeded its {deadline_seconds:g}s deadline")
+
+    def _call(self, runnable: Runnable, input: Any, config: Optional[RunnableConfig], deadline: float,
+              deadline_seconds: float, request_timeout: bool, **kwargs) -> Any:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise self._timed_out(deadline_seconds)
+        if request_timeout:
+            kwargs["timeout"] = remaining
+        # Run in a copy of the caller's context (tracing, limiter deadline) on a pool thread
+        context = contextvars.copy_context()
+        context.run(llm_limiter.CALL_DEADLINE.set, deadline)
+        future = self._pool().submit(context.run, runnable.invoke, input, config, **kwargs)
+        try:
+            return future.result(timeout=remaining)
+        except concurrent.futures.TimeoutError:
+            # The thread finishes (or fails) on its own; nobody waits for the answer anymore
+            future.cancel()
+            raise self._timed_out(deadline_seconds) from None
+
+    def invoke(self, runnable: Runnable, input: Any, config: Optional[RunnableConfig] = None,
+               deadline_seconds: float = 60.0, request_timeout: bool = False, **kwargs) -> Any:
+        """
+Call `runnable.invoke` within the deadline, retrying transient failures.
+
+Args:
+runnable: The chat model (or chain) to call
+input: Its input
+config: Its RunnableConfig
+deadline_seconds: Time budget of the call, retries and backoff included
+request_timeout: Pass the time left to the runnable as `timeout` (a chat model's request timeout)
+
+Returns:
+The runnable's output
+
+Raises:
+CircuitOpenError: The circuit is open
+LLMDeadlineExceeded: The deadline passed
+        """
+        deadline = time.monotonic() + deadline_seconds
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            outcome = None
+            try:
+                result = self._call(runnable, input, config, deadline, deadline_seconds, request_timeout, **kwargs)
+                outcome = "success"
+                return result
+            except Exception as e:
+                outcome = "failure" if is_transient(e) else None
+                pause = self._next_pause(e, attempt, deadline)
+                if pause is None:
+                    raise
+            finally:
+                self._record(outcome)
+            time.sleep(pause)
+
+    async def ainvoke(self, runnable: Runnable, input: Any, config: Optional[RunnableConfig] = None,
+                      deadline_seconds: float = 60.0, request_timeout: bool = False, **kwargs) -> Any:
+        """Async invoke (awaits `runnable.ainvoke`)"""
+        deadline = time.monotonic() + deadline_seconds
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            outcome = None
+            token = llm_limiter.CALL_DEADLINE.set(deadline)
+            try:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._timed_out(deadline_seconds)
+                if request_timeout:
+                    kwargs["timeout"] = remaining
+                try:
+                    result = await asyncio.wait_for(runnable.ainvoke(input, config, **kwargs), remaining)
+                except asyncio.TimeoutError:
+                    raise self._timed_out(deadline_seconds) from None
+                outcome = "success"
+                return result
+            except Exception as e:
+                outcome = "failure" if is_transient(e) else None
+                pause = self._next_pause(e, attempt, deadline)
+                if pause is None:
+                    raise
+            finally:
+                llm_limiter.CALL_DEADLINE.reset(token)
+                self._record(outcome)
+            await asyncio.sleep(pause)
+
+    def stream(self, runnable: Runnable, input: Any, config: Optional[RunnableConfig] = None,
+               **kwargs) -> Iterator[Any]:
+        """Forward `runnable.stream`, once the breaker admits it"""
+        self.breaker.before_call()
+        outcome = None
+        try:
+            yield from runnable.stream(input, config, **kwargs)
+            outcome = "success"
+        except Exception as e:
+            outcome = "failure" if is_transient(e) else None
+            raise
+        finally:
+            self._record(outcome)
+
+    async def astream(self, runnable: Runnable, input: Any, config: Optional[RunnableConfig] = None,
+                      **kwargs) -> AsyncIterator[Any]:
+        """Forward `runnable.astream`, once the breaker admits it"""
+        self.breaker.before_call()
+        outcome = None
+        try:
+            async for chunk in runnable.astream(input, config, **kwargs):
+                yield chunk
+            outcome = "success"
+        except Exception as e:
+            outcome = "failure" if is_transient(e) else None
+            raise
+        finally:
+            self._record(outcome)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"retries": self.retries, "timeouts": self.timeouts, "breaker": self.breaker.stats()}
+
+
+class GuardedLLM(Runnable):
+    """
+A chat model whose calls go through an LLMGuard with a fixed deadline.
+
+With `request_timeout` every request also gets the time left as its client
+timeout (the deadline itself for streams).
+    """
+
+    def __init__(self, llm: Runnable, guard: LLMGuard, deadline_seconds: float, request_timeout: bool = False):
+        self.llm = llm
+        self.guard = guard
+        self.deadline_seconds = deadline_seconds
+        self.request_timeout = request_timeout
+
+    @property
+    def InputType(self) -> Any:
+        return self.llm.InputType
+
+    @property
+    def OutputType(self) -> Any:
+        return self.llm.OutputType
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> Any:
+        return self.guard.invoke(self.llm, input, config, self.deadline_seconds, self.request_timeout, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> Any:
+        return await self.guard.ainvoke(self.llm, input, config, self.deadline_seconds, self.request_timeout,
+                                        **kwargs)
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> Iterator[Any]:
+        if self.request_timeout:
+            kwargs["timeout"] = self.deadline_seconds
+        yield from self.guard.stream(self.llm, input, config, **kwargs)
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> AsyncIterator[Any]:
+        if self.request_timeout:
+            kwargs["timeout"] = self.deadline_seconds
+        async for chunk in self.guard.astream(self.llm, input, config, **kwargs):
+            yield chunk
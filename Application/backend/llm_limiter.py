@@ -0,0 +1,317 @@
+"""
+Shared rate limit for Gemini calls.
+
+Every AI module talks to the one client from ai_runtime.get_llm, but nothing
+stopped a burst of requests from exceeding the provider's requests-per-minute
+and tokens-per-minute quotas. The resulting quota errors reached students as
+"brain freeze" answers and "Error generating summary" texts. LLMLimiter keeps
+calls within both limits:
+
+- two token buckets, refilled continuously: requests per minute and tokens per
+  minute. A call takes one request and its estimated tokens (prompt plus
+  expected output); the estimate is corrected with the real usage afterwards
+- calls that have to wait queue by priority class: "interactive" (Kia,
+  error explanations) is admitted ahead of "batch" (summaries, notes, quizzes)
+- each class has a bounded queue. A call is rejected at once with
+  RateLimitExceeded when its queue is full or when it could not be admitted
+  within the class's maximum wait, instead of holding a worker
+- with `state_path` the bucket levels live in a SQLite file, so every worker
+  draws from the same budget (the queue order applies within a worker)
+
+LimiterCallback attaches the limiter to a LangChain chat model; the priority
+comes from the call's "llm_priority" metadata (see ai_runtime.get_llm), and a
+call never waits past its deadline (CALL_DEADLINE, set by llm_guard.py).
+"""
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+# Queued calls are admitted in this order
+PRIORITY_CLASSES = ("interactive", "batch")
+DEFAULT_PRIORITY = "batch"
+
+DEFAULT_MAX_QUEUE = 50
+DEFAULT_MAX_WAIT_SECONDS = {"interactive": 20.0, "batch": 60.0}
+
+# Output tokens charged up front; corrected once the response reports its usage
+EXPECTED_OUTPUT_TOKENS = 1000
+CHARS_PER_TOKEN = 4
+
+# time.monotonic() by which the current call must be sent or given up (set by llm_guard.py)
+CALL_DEADLINE: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("llm_call_deadline", default=None)
+
+# Longest sleep between checks of a shared (SQLite) bucket, which other workers refill and drain
+POLL_INTERVAL_SECONDS = 0.25
+
+
+class RateLimitExceeded(Exception):
+    """A Gemini call was rejected because the limiter's queue is full or the wait is too long"""
+
+
+class _Buckets:
+    """Requests and tokens buckets, each holding up to one minute of its limit (0 = no limit)"""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.capacity = {"requests": requests_per_minute, "tokens": tokens_per_minute}
+        self.levels = {name: float(capacity) for name, capacity in self.capacity.items()}
+        self.updated = {name: time.time() for name in self.capacity}
+
+    def _refill(self, now: float):
+        for name, capacity in self.capacity.items():
+            if capacity:
+                elapsed = max(0.0, now - self.updated[name])
+                self.levels[name] = min(capacity, self.levels[name] + capacity * elapsed / 60)
+            self.updated[name] = now
+
+    def try_take(self, requests: int, tokens: int) -> float:
+        """Take the amounts if both buckets hold them; otherwise seconds until they will (0 when taken)"""
+        self._refill(time.time())
+        # A call larger than a whole minute's budget waits for a full bucket rather than forever
+        needed = {
+            name: min(amount, self.capacity[name])
+            for name, amount in (("requests", requests), ("tokens", tokens))
+            if self.capacity[name]
+        }
+        waits = [
+            (amount - self.levels[name]) * 60 / self.capacity[name]
+            for name, amount in needed.items() if self.levels[name] < amount
+        ]
+        if waits:
+            return max(waits)
+        for name, amount in needed.items():
+            self.levels[name] -= amount
+        return 0.0
+
+    def adjust(self, tokens: int):
+        """Charge (or refund, if negative) tokens after the fact; the bucket may go into debt"""
+        if self.capacity["tokens"]:
+            self._refill(time.time())
+            self.levels["tokens"] = min(self.capacity["tokens"], self.levels["tokens"] - tokens)
+
+
+class _SharedBuckets(_Buckets):
+    """_Buckets whose levels are kept in a SQLite file that every worker updates"""
+
+    def __init__(self, path: str, requests_per_minute: int, tokens_per_minute: int):
+        super().__init__(requests_per_minute, tokens_per_minute)
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_buckets (name TEXT PRIMARY KEY, level REAL, updated_at REAL)"
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    @contextmanager
+    def _state(self) -> Iterator[None]:
+        """Load the shared levels, and write them back, in one write transaction"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for name, level, updated_at in conn.execute("SELECT name, level, updated_at FROM llm_buckets"):
+                if name in self.capacity:
+                    self.levels[name], self.updated[name] = level, updated_at
+            yield
+            conn.executemany(
+                "INSERT OR REPLACE INTO llm_buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                [(name, self.levels[name], self.updated[name]) for name in self.capacity]
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def try_take(self, requests: int, tokens: int) -> float:
+        try:
+            with self._state():
+                return super().try_take(requests, tokens)
+        except sqlite3.Error as e:
+            # Don't fail Gemini calls because the shared state is unavailable
+            logger.warning("Shared LLM rate limit unavailable, admitting call: %s", e)
+            return 0.0
+
+    def adjust(self, tokens: int):
+        try:
+            with self._state():
+                super().adjust(tokens)
+        except sqlite3.Error as e:
+            logger.warning("Could not record LLM token usage: %s", e)
+
+
+class LLMLimiter:
+    """Admit LLM calls within requests/tokens-per-minute limits, by priority, with bounded queues"""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, max_queue: int = DEFAULT_MAX_QUEUE,
+                 max_wait: Optional[Dict[str, float]] = None, state_path: Optional[str] = None):
+        if state_path:
+            self._buckets = _SharedBuckets(state_path, requests_per_minute, tokens_per_minute)
+        else:
+            self._buckets = _Buckets(requests_per_minute, tokens_per_minute)
+        self.shared = bool(state_path)
+        self.max_queue = max_queue
+        self.max_wait = {**DEFAULT_MAX_WAIT_SECONDS, **(max_wait or {})}
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._queued = {name: 0 for name in PRIORITY_CLASSES}
+        self._metrics = {
+            name: {"admitted": 0, "rejected": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+            for name in PRIORITY_CLASSES
+        }
+        self.tokens_used = 0
+
+    def acquire(self, tokens: int, priority: str = DEFAULT_PRIORITY, deadline: Optional[float] = None) -> float:
+        """
+Wait until a call may be sent.
+
+Args:
+tokens: Estimated tokens of the call (prompt and output)
+priority: Priority class ("interactive" or "batch")
+deadline: time.monotonic() after which the caller has given up, if sooner than the class's maximum wait
+
+Returns:
+Seconds the call waited
+
+Raises:
+RateLimitExceeded: The class's queue is full, or the call can't be admitted within its maximum wait
+        """
+        if priority not in self._queued:
+            priority = DEFAULT_PRIORITY
+        started = time.monotonic()
+        max_wait = self.max_wait[priority]
+        if deadline is not None:
+            max_wait = max(0.0, min(max_wait, deadline - started))
+        deadline = started + max_wait
+
+        with self._condition:
+            if self._queued[priority] >= self.max_queue:
+                self._metrics[priority]["rejected"] += 1
+                raise RateLimitExceeded(f"Gemini is busy: {self.max_queue} {priority} calls already waiting")
+
+            ticket = (PRIORITY_CLASSES.index(priority), next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+            self._queued[priority] += 1
+            # A more urgent call may now be first in line
+            self._condition.notify_all()
+            try:
+                while True:
+                    first = self._waiting[0] == ticket
+                    wait = self._buckets.try_take(1, tokens) if first else None
+                    if wait == 0:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or (wait is not None and wait > remaining):
+                        self._metrics[priority]["rejected"] += 1
+                        raise RateLimitExceeded(
+                            f"Gemini is busy: {priority} call not admitted within {max_wait:.3g}s"
+                        )
+                    timeout = remaining if wait is None else wait
+                    if self.shared:
+                        timeout = min(timeout, POLL_INTERVAL_SECONDS)
+                    self._condition.wait(timeout)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._queued[priority] -= 1
+                self._condition.notify_all()
+
+            waited = time.monotonic() - started
+            metrics = self._metrics[priority]
+            metrics["admitted"] += 1
+            metrics["wait_seconds"] += waited
+            metrics["max_wait_seconds"] = max(metrics["max_wait_seconds"], waited)
+            self.tokens_used += tokens
+            return waited
+
+    def settle(self, estimated_tokens: int, actual_tokens: int):
+        """Correct a call's token charge once its real usage is known"""
+        with self._condition:
+            self._buckets.adjust(actual_tokens - estimated_tokens)
+            self.tokens_used += actual_tokens - estimated_tokens
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "requests_per_minute": self._buckets.capacity["requests"],
+                "tokens_per_minute": self._buckets.capacity["tokens"],
+                "shared": self.shared,
+                "tokens_used": self.tokens_used,
+                "classes": {
+                    name: {
+                        "queued": self._queued[name],
+                        "admitted": metrics["admitted"],
+                        "rejected": metrics["rejected"],
+                        "avg_wait_ms": round(metrics["wait_seconds"] / metrics["admitted"] * 1000, 1)
+                        if metrics["admitted"] else 0.0,
+                        "max_wait_ms": round(metrics["max_wait_seconds"] * 1000, 1),
+                    }
+                    for name, metrics in self._metrics.items()
+                }
+            }
+
+
+def estimate_tokens(messages) -> int:
+    """Rough token count of the chat messages of one call, plus the expected output"""
+    characters = sum(len(str(message.content)) for batch in messages for message in batch)
+    return characters // CHARS_PER_TOKEN + EXPECTED_OUTPUT_TOKENS
+
+
+def _usage_tokens(response) -> Optional[int]:
+    """Total tokens reported by a chat model response, if any"""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("total_tokens")
+    return None
+
+
+class LimiterCallback(BaseCallbackHandler):
+    """Runs every chat model call through an LLMLimiter"""
+
+    # Let RateLimitExceeded reach the caller instead of being logged and ignored
+    raise_error = True
+
+    def __init__(self, limiter: LLMLimiter):
+        self.limiter = limiter
+        self._estimates: Dict[UUID, int] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs):
+        tokens = estimate_tokens(messages)
+        self.limiter.acquire(tokens, (metadata or {}).get("llm_priority", DEFAULT_PRIORITY), CALL_DEADLINE.get())
+        with self._lock:
+            self._estimates[run_id] = tokens
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        with self._lock:
+            estimated = self._estimates.pop(run_id, None)
+        actual = _usage_tokens(response)
+        if estimated is not None and actual is not None:
+            self.limiter.settle(estimated, actual)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        with self._lock:
+            estimated = self._estimates.pop(run_id, None)
+        if estimated is not None:
+            # A failed call produced no output
+            self.limiter.settle(estimated, estimated - EXPECTED_OUTPUT_TOKENS)
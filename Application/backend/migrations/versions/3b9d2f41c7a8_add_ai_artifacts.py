@@ -0,0 +1,46 @@
+"""add ai artifacts
+
+Revision ID: 3b9d2f41c7a8
+Revises: e7f6bd2cb196
+Create Date: 2025-04-02 11:24:36.512904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9d2f41c7a8'
+down_revision = 'e7f6bd2cb196'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ai_artifacts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cache_key', sa.String(length=64), nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('params', sa.Text(), nullable=False),
+    sa.Column('source_hash', sa.String(length=64), nullable=False),
+    sa.Column('prompt_version', sa.String(length=20), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('size_bytes', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.Column('last_accessed_at', sa.DateTime(), nullable=False),
+    sa.Column('hit_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('cache_key')
+    )
+    with op.batch_alter_table('ai_artifacts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ai_artifacts_kind'), ['kind'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ai_artifacts_last_accessed_at'), ['last_accessed_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ai_artifacts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ai_artifacts_last_accessed_at'))
+        batch_op.drop_index(batch_op.f('ix_ai_artifacts_kind'))
+
+    op.drop_table('ai_artifacts')
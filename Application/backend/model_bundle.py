@@ -0,0 +1,200 @@
+"""
+Local, pinned copy of the sentence-transformers embedding model.
+
+HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+resolves the model against the Hugging Face hub, which hangs on nodes without
+network access and re-validates the cache on every cold start elsewhere. A
+bundle is fetched once at build time and then loaded straight from disk with
+the hub in offline mode, so startup makes no network calls.
+
+Bundle layout (KIA_EMBEDDING_MODEL_DIR, default instance/models/all-MiniLM-L6-v2):
+    modules.json, config.json, model.safetensors, tokenizer files, 1_Pooling/, ...
+    bundle_manifest.json   model id, pinned revision, size and SHA-256 of every file
+
+Usage (from Application/backend):
+    python -m model_bundle fetch                       # download and pin the current revision
+    python -m model_bundle fetch --revision <commit>   # pin a specific revision
+    python -m model_bundle verify                      # re-hash every file against the manifest
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional
+
+MANIFEST_FILENAME = "bundle_manifest.json"
+
+# What sentence-transformers needs to load the model; skips the ONNX/OpenVINO/TF/Rust copies on the hub
+ALLOW_PATTERNS = [
+    "*.json",
+    "*.txt",
+    "model.safetensors",
+    "1_Pooling/*",
+    "2_Normalize/*",
+]
+
+OFFLINE_VARIABLES = {
+    "HF_HUB_OFFLINE": "1",
+    "TRANSFORMERS_OFFLINE": "1",
+    "HF_DATASETS_OFFLINE": "1",
+}
+
+
+def read_manifest(bundle_dir: str) -> Dict:
+    with open(os.path.join(bundle_dir, MANIFEST_FILENAME)) as f:
+        return json.load(f)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _bundle_files(bundle_dir: str) -> List[str]:
+    """Relative paths of the model files in a bundle (the manifest and hub bookkeeping excluded)"""
+    files = []
+    for root, dirs, names in os.walk(bundle_dir):
+        # snapshot_download keeps its download metadata in .cache/
+        dirs[:] = [name for name in dirs if not name.startswith(".")]
+        for name in names:
+            path = os.path.relpath(os.path.join(root, name), bundle_dir)
+            if path != MANIFEST_FILENAME:
+                files.append(path.replace(os.sep, "/"))
+    return sorted(files)
+
+
+def fetch(model_name: str, bundle_dir: str, revision: Optional[str] = None) -> Dict:
+    """
+Download a model from the hub into `bundle_dir` and pin it with a manifest.
+
+Args:
+model_name: Hugging Face model id
+bundle_dir: Where to write the bundle
+revision: Branch, tag or commit to fetch (default: the current main)
+
+Returns:
+The manifest that was written
+    """
+    from huggingface_hub import HfApi, snapshot_download
+
+    # Resolve branches and tags to a commit so the manifest names exactly what was fetched
+    commit = HfApi().model_info(model_name, revision=revision).sha
+    snapshot_download(model_name, revision=commit, local_dir=bundle_dir, allow_patterns=ALLOW_PATTERNS)
+    return write_manifest(bundle_dir, model_name, commit)
+
+
+def write_manifest(bundle_dir: str, model_name: str, revision: str) -> Dict:
+    """Record the size and SHA-256 of every file in a bundle"""
+    manifest = {
+        "model_name": model_name,
+        "revision": revision,
+        "fetched_at": datetime.now().isoformat(timespec="seconds"),
+        "files": {
+            path: {
+                "size": os.path.getsize(os.path.join(bundle_dir, path)),
+                "sha256": file_sha256(os.path.join(bundle_dir, path)),
+            }
+            for path in _bundle_files(bundle_dir)
+        },
+    }
+    with open(os.path.join(bundle_dir, MANIFEST_FILENAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def verify(bundle_dir: str, full: bool = True) -> List[str]:
+    """
+Check a bundle against its manifest.
+
+Args:
+bundle_dir: Bundle directory
+full: Re-hash every file; otherwise only check that files exist with the recorded size
+
+Returns:
+List of problems (empty if the bundle is intact)
+    """
+    try:
+        manifest = read_manifest(bundle_dir)
+    except (OSError, ValueError) as e:
+        return [f"unreadable manifest: {e}"]
+
+    problems = []
+    for path, expected in manifest["files"].items():
+        full_path = os.path.join(bundle_dir, path)
+        if not os.path.isfile(full_path):
+            problems.append(f"missing: {path}")
+        elif os.path.getsize(full_path) != expected["size"]:
+            problems.append(f"size mismatch: {path}")
+        elif full and file_sha256(full_path) != expected["sha256"]:
+            problems.append(f"checksum mismatch: {path}")
+    return problems
+
+
+def is_bundle(bundle_dir: str) -> bool:
+    return os.path.isfile(os.path.join(bundle_dir, MANIFEST_FILENAME))
+
+
+def enable_offline_mode():
+    """
+Stop huggingface_hub and transformers from making network calls.
+
+The libraries read these variables at import time, so this has to run before
+they are imported; already imported copies are switched over as well.
+    """
+    os.environ.update(OFFLINE_VARIABLES)
+    hub_constants = sys.modules.get("huggingface_hub.constants")
+    if hub_constants is not None:
+        hub_constants.HF_HUB_OFFLINE = True
+
+
+def load_embeddings(bundle_dir: str, full_check: bool = False):
+    """
+HuggingFaceEmbeddings loaded from a bundle, without touching the network.
+
+Args:
+bundle_dir: Bundle directory
+full_check: Re-hash every file before loading (slower; the default only checks sizes)
+
+Returns:
+HuggingFaceEmbeddings instance
+    """
+    problems = verify(bundle_dir, full=full_check)
+    if problems:
+        raise RuntimeError(f"Embedding model bundle {bundle_dir} is damaged: {'; '.join(problems)}. "
+                           "Run `python -m model_bundle fetch` again.")
+
+    enable_offline_mode()
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(model_name=os.path.abspath(bundle_dir))
+
+
+def main():
+    import ai_runtime
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["fetch", "verify"])
+    parser.add_argument("--model", default=ai_runtime.EMBEDDING_MODEL_NAME)
+    parser.add_argument("--output", default=ai_runtime.EMBEDDING_MODEL_DIR)
+    parser.add_argument("--revision", help="Branch, tag or commit to pin (fetch only)")
+    args = parser.parse_args()
+
+    if args.command == "fetch":
+        manifest = fetch(args.model, args.output, args.revision)
+        print(f"fetched {args.model}@{manifest['revision']} ({len(manifest['files'])} files) to {args.output}")
+        return
+
+    problems = verify(args.output)
+    for problem in problems:
+        print(problem)
+    print("bundle is intact" if not problems else f"{len(problems)} problem(s)")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
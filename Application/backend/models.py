@@ -84,4 +84,19 @@ class ProgrammingAssignment(db.Model):
 
     def get_test_cases(self):
         """Retrieves test cases as a Python list"""
-        return json.loads(self.test_cases) if self.test_cases else []
\ No newline at end of file
+        return json.loads(self.test_cases) if self.test_cases else []
+
+class AIArtifact(db.Model):
+    __tablename__ = 'ai_artifacts'
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(64), unique=True, nullable=False)  # SHA-256 of kind, params, source hash, prompt version
+    kind = db.Column(db.String(50), nullable=False, index=True)
+    params = db.Column(db.Text, nullable=False)  # JSON
+    source_hash = db.Column(db.String(64), nullable=False)
+    prompt_version = db.Column(db.String(20), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON result
+    size_bytes = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=True)
+    last_accessed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    hit_count = db.Column(db.Integer, nullable=False, default=0)
@@ -1,64 +1,44 @@
+import asyncio
 import warnings
-from functools import lru_cache
-from typing import Dict, Any
-import os
+from typing import Dict, Any, AsyncIterator, Iterator
 
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from langchain_google_genai import ChatGoogleGenerativeAI
+import ai_runtime
+import artifact_store
+import context_builder
+import retrieval
 
 # Suppress deprecation warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-# Global singletons for components
-_embeddings = None
-_vector_store = None
-_llm = None
-_notes_cache = {}
+# Bump when the notes prompt changes so stored notes are regenerated
+PROMPT_VERSION = "1"
 
-def get_api_key() -> str:
-    """Get API key for Google Generative AI"""
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("Google API key is not set")
-    return api_key
+# generate_topic_summary reports Gemini failures in the notes text
+SUMMARY_ERROR_PREFIX = "Error generating summary"
+
+# Token budget for the retrieved course context
+CONTEXT_TOKENS = 4000
 
 def get_embeddings():
-    """Singleton for embeddings"""
-    global _embeddings
-    if _embeddings is None:
-        _embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
-    return _embeddings
+    """Shared embeddings from the AI runtime"""
+    return ai_runtime.get_embeddings(owner=__name__)
 
 def get_vector_store(persist_directory: str = "vector_store"):
-    """Singleton for vector store"""
-    global _vector_store
-    if _vector_store is None:
-        _vector_store = Chroma(
-            collection_name="pdf_embeddings",
-            embedding_function=get_embeddings(),
-            persist_directory=persist_directory
-        )
-    return _vector_store
+    """Shared vector store from the AI runtime"""
+    return ai_runtime.get_vector_store(persist_directory, owner=__name__)
+
+def get_lexical_index(persist_directory: str = "vector_store"):
+    """Shared BM25 index over the vector store's chunks"""
+    return ai_runtime.get_lexical_index(persist_directory, owner=__name__)
 
 def get_llm():
-    """Singleton for language model"""
-    global _llm
-    if _llm is None:
-        _llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            google_api_key=get_api_key()
-        )
-    return _llm
+    """Shared language model from the AI runtime"""
+    return ai_runtime.get_llm(owner=__name__)
 
-@lru_cache(maxsize=50)
-def generate_topic_summary(text: str, topic: str) -> str:
-    """Generate a summary of topic-specific text using Google Gemini"""
-    llm = get_llm()
 
-    prompt = (
+def get_notes_prompt(text: str, topic: str) -> str:
+    """Prompt asking Gemini for Markdown study notes on a topic"""
+    return (
         f"You are an expert machine learning educator creating concise study notes. "
         f"Create detailed yet concise notes on '{topic}' based on the following content. "
         f"Your response MUST be in Markdown format with careful attention to spacing:"
@@ -79,11 +59,68 @@ def generate_topic_summary(text: str, topic: str) -> str:
         f"\n\nContent to summarize:\n{text}"
     )
 
+def response_text(response) -> str:
+    """Text of a Gemini response or stream chunk"""
+    return response.content if hasattr(response, "content") else str(response)
+
+def make_result(topic: str, notes: str) -> Dict[str, Any]:
+    """generate_topic_notes result for generated notes"""
+    return {
+        "success": True,
+        "message": f"Successfully generated notes for '{topic}'",
+        "notes": notes,
+        "topic": topic
+    }
+
+def make_error(topic: str, message: str) -> Dict[str, Any]:
+    """generate_topic_notes result for a topic that couldn't be covered"""
+    return {
+        "success": False,
+        "message": message,
+        "notes": "",
+        "topic": topic
+    }
+
+def is_storable(result: Dict[str, Any]) -> bool:
+    """Whether a result holds real notes rather than a reported Gemini failure"""
+    return not result["notes"].startswith(SUMMARY_ERROR_PREFIX)
+
+def generate_topic_summary(text: str, topic: str) -> str:
+    """Generate a summary of topic-specific text using Google Gemini"""
+    llm = get_llm()
+    prompt = get_notes_prompt(text, topic)
+
     try:
         response = llm.invoke(prompt)
-        return response.content if hasattr(response, "content") else str(response)
+        return response_text(response)
+    except Exception as e:
+        return f"{SUMMARY_ERROR_PREFIX}: {str(e)}"
+
+async def agenerate_topic_summary(text: str, topic: str) -> str:
+    """Async generate_topic_summary: awaits Gemini without holding a thread"""
+    try:
+        response = await get_llm().ainvoke(get_notes_prompt(text, topic))
+        return response_text(response)
     except Exception as e:
-        return f"Error generating summary: {str(e)}"
+        return f"{SUMMARY_ERROR_PREFIX}: {str(e)}"
+
+def retrieve_topic_context(topic: str, persist_directory: str = "vector_store") -> str:
+    """Course content for a topic, packed into the notes token budget ("" if nothing matches)"""
+    # Get vector store
+    vector_store = get_vector_store(persist_directory)
+
+    # Retrieve relevant chunks (exact API names match lexically), with a limit to prevent overly large prompts
+    docs = ai_runtime.get_retrieval_cache().get_or_compute(
+        "hybrid", topic, 20, None, persist_directory,
+        lambda: retrieval.hybrid_search(vector_store, get_lexical_index(persist_directory), topic, k=20)
+    )
+
+    # Combine text from documents within the token budget
+    return context_builder.build_context(docs, max_tokens=CONTEXT_TOKENS) if docs else ""
+
+def get_notes_key(topic: str, context: str) -> tuple:
+    """Artifact store key (kind, params, source hash, prompt version) of topic notes"""
+    return "notes", {"topic": topic}, artifact_store.content_hash(context), PROMPT_VERSION
 
 def generate_topic_notes(
         topic: str,
@@ -99,53 +136,117 @@ persist_directory: Directory for the vector store
 Returns:
 Dictionary containing generated notes and metadata
     """
-    # Check cache first
-    if topic in _notes_cache:
-        return _notes_cache[topic]
+    try:
+        combined_text = retrieve_topic_context(topic, persist_directory)
+
+        if not combined_text:
+            return make_error(topic, f"No information found for topic '{topic}'")
+
+        def generate():
+            return make_result(topic, generate_topic_summary(combined_text, topic))
+
+        # Shared by all workers; different retrieved content hashes to a new entry
+        return artifact_store.get_or_create(
+            *get_notes_key(topic, combined_text),
+            generate,
+            should_store=is_storable
+        )
+
+    except Exception as e:
+        return make_error(topic, f"Failed to generate notes: {str(e)}")
+
+def stream_topic_notes(topic: str, persist_directory: str = "vector_store") -> Iterator[Dict[str, Any]]:
+    """
+Stream notes on a topic as Markdown chunks while Gemini writes them.
+
+Stored notes are sent at once; newly generated ones are stored when complete
+(see artifact_store.stream_or_create).
+
+Args:
+topic: The topic to generate notes for
+persist_directory: Directory for the vector store
+
+Yields:
+"token" events with text chunks, then "done" with the generate_topic_notes
+fields (plus cached, ttft_ms and total_ms), or a single "error" event
+    """
+    try:
+        combined_text = retrieve_topic_context(topic, persist_directory)
+
+        if not combined_text:
+            yield {"event": "error", "data": make_error(topic, f"No information found for topic '{topic}'")}
+            return
+
+        def stream():
+            llm = get_llm()
+            for chunk in llm.stream(get_notes_prompt(combined_text, topic)):
+                yield response_text(chunk)
+
+        yield from artifact_store.stream_or_create(
+            *get_notes_key(topic, combined_text),
+            stream=stream,
+            make_result=lambda notes: make_result(topic, notes),
+            text_field="notes"
+        )
+
+    except Exception as e:
+        yield {"event": "error", "data": make_error(topic, f"Failed to generate notes: {str(e)}")}
+
+async def agenerate_topic_notes(topic: str, persist_directory: str = "vector_store") -> Dict[str, Any]:
+    """
+Async generate_topic_notes for the async serving mode (asgi.py).
+
+Retrieval runs in a worker thread and Gemini is awaited. Needs an app context.
+
+Args:
+topic: The topic to generate notes for
+persist_directory: Directory for the vector store
+
+Returns:
+Dictionary containing generated notes and metadata
+    """
+    try:
+        combined_text = await asyncio.to_thread(retrieve_topic_context, topic, persist_directory)
+
+        if not combined_text:
+            return make_error(topic, f"No information found for topic '{topic}'")
+
+        async def generate():
+            return make_result(topic, await agenerate_topic_summary(combined_text, topic))
 
+        return await artifact_store.aget_or_create(
+            *get_notes_key(topic, combined_text),
+            generate,
+            should_store=is_storable
+        )
+
+    except Exception as e:
+        return make_error(topic, f"Failed to generate notes: {str(e)}")
+
+async def astream_topic_notes(topic: str, persist_directory: str = "vector_store") -> AsyncIterator[Dict[str, Any]]:
+    """Async stream_topic_notes for the async serving mode (same events)"""
     try:
-        # Get vector store
-        vector_store = get_vector_store(persist_directory)
-
-        # Retrieve relevant chunks, with a limit to prevent overly large prompts
-        retriever = vector_store.as_retriever(search_kwargs={"k": 20})
-        docs = retriever.get_relevant_documents(topic)
-
-        if not docs:
-            result = {
-                "success": False,
-                "message": f"No information found for topic '{topic}'",
-                "notes": "",
-                "topic": topic
-            }
-        else:
-            # Combine text from documents, with a limit to prevent token overflow
-            combined_text = "\n".join([doc.page_content for doc in docs[:15]])
-
-            # Generate summary
-            notes = generate_topic_summary(combined_text, topic)
-
-            result = {
-                "success": True,
-                "message": f"Successfully generated notes for '{topic}'",
-                "notes": notes,
-                "topic": topic
-            }
-
-        # Cache the result
-        _notes_cache[topic] = result
-        return result
+        combined_text = await asyncio.to_thread(retrieve_topic_context, topic, persist_directory)
+
+        if not combined_text:
+            yield {"event": "error", "data": make_error(topic, f"No information found for topic '{topic}'")}
+            return
+
+        async def stream():
+            async for chunk in get_llm().astream(get_notes_prompt(combined_text, topic)):
+                yield response_text(chunk)
+
+        async for event in artifact_store.astream_or_create(
+            *get_notes_key(topic, combined_text),
+            stream=stream,
+            make_result=lambda notes: make_result(topic, notes),
+            text_field="notes"
+        ):
+            yield event
 
     except Exception as e:
-        return {
-            "success": False,
-            "message": f"Failed to generate notes: {str(e)}",
-            "notes": "",
-            "topic": topic
-        }
+        yield {"event": "error", "data": make_error(topic, f"Failed to generate notes: {str(e)}")}
 
 def clear_cache():
     """Clear all notes caches"""
-    global _notes_cache
-    _notes_cache = {}
-    generate_topic_summary.cache_clear()
+    artifact_store.clear("notes")
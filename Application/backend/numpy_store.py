@@ -0,0 +1,410 @@
+"""
+Exact-search vector store backed by one memory-mapped NumPy matrix.
+
+The course corpus is a few thousand 384-dimensional chunks, small enough that
+scoring every chunk with one matrix multiply is faster than an HNSW lookup
+plus SQLite metadata round-trips, and it gives exact recall.
+
+Layout of `<persist_directory>/numpy_store/`:
+    embeddings.npy   float32 matrix, one row per chunk (opened with mmap)
+    records.json     ids, documents and metadatas as parallel arrays
+
+Distances are squared L2, the same metric as the Chroma collection, so scores
+and `filter` (Chroma `where` syntax) behave the same with either backend.
+
+The Chroma collection stays the source of truth: ingestion always writes to
+Chroma (ai_runtime.get_ingest_vector_store) and then rebuilds this export
+(ai_runtime.refresh_vector_store). Builds take a file lock, so workers that
+start together don't export at the same time. Writes through the store
+itself (add_embeddings, delete) stay in memory until flush().
+
+Usage (from Application/backend):
+    python -m numpy_store build       # export the Chroma collection
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+STORE_DIRNAME = "numpy_store"
+EMBEDDINGS_FILENAME = "embeddings.npy"
+RECORDS_FILENAME = "records.json"
+BUILD_LOCK_FILENAME = "numpy_store.lock"
+
+COMPARISONS: Dict[str, Callable[[Any, Any], bool]] = {
+    "$eq": lambda value, target: value == target,
+    "$ne": lambda value, target: value != target,
+    "$gt": lambda value, target: value is not None and value > target,
+    "$gte": lambda value, target: value is not None and value >= target,
+    "$lt": lambda value, target: value is not None and value < target,
+    "$lte": lambda value, target: value is not None and value <= target,
+    "$in": lambda value, target: value in target,
+    "$nin": lambda value, target: value not in target,
+}
+
+
+def get_store_directory(persist_directory: str = "vector_store") -> str:
+    """Location of the NumPy export for a vector store directory"""
+    return os.path.join(persist_directory, STORE_DIRNAME)
+
+
+def matches_where(metadata: Dict, where: Optional[Dict]) -> bool:
+    """Evaluate a Chroma `where` filter against one metadata dict"""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, target in condition.items():
+                if operator not in COMPARISONS:
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+                if not COMPARISONS[operator](value, target):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class NumpyVectorStore(VectorStore):
+    """LangChain vector store doing exact squared-L2 search over an in-memory matrix"""
+
+    def __init__(self, embedding_function: Embeddings, directory: Optional[str] = None):
+        self._embedding_function = embedding_function
+        self.directory = directory
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict] = []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.squared_norms = np.zeros(0, dtype=np.float32)
+        self._masks: Dict[str, np.ndarray] = {}
+        self._lock = threading.RLock()
+        # Changes not written to `directory` yet (see flush)
+        self._dirty = False
+
+        if directory and os.path.exists(os.path.join(directory, RECORDS_FILENAME)):
+            self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    # ------------------------- Persistence -------------------------
+
+    def _load(self):
+        with open(os.path.join(self.directory, RECORDS_FILENAME)) as f:
+            records = json.load(f)
+        self.ids = records["ids"]
+        self.documents = records["documents"]
+        self.metadatas = [metadata or {} for metadata in records["metadatas"]]
+        # Read-only mmap: pages are shared between gunicorn workers through the page cache
+        self.matrix = np.load(os.path.join(self.directory, EMBEDDINGS_FILENAME), mmap_mode="r")
+        self.squared_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        self._masks = {}
+        self._dirty = False
+
+    def reload(self):
+        """Re-read the store from `directory` (after another process or a build rewrote it)"""
+        with self._lock:
+            if self.directory and os.path.exists(os.path.join(self.directory, RECORDS_FILENAME)):
+                self._load()
+
+    def save(self):
+        """
+Write the matrix and records. Each file goes to a uniquely named temporary
+file first and is then renamed, so readers never see half a store and
+concurrent writers never share a temporary file.
+        """
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self._replace(EMBEDDINGS_FILENAME, "wb",
+                          lambda f: np.save(f, np.ascontiguousarray(self.matrix, dtype=np.float32)))
+            self._replace(RECORDS_FILENAME, "w", lambda f: json.dump(
+                {"ids": self.ids, "documents": self.documents, "metadatas": self.metadatas}, f
+            ))
+            self._dirty = False
+
+    def _replace(self, filename: str, mode: str, write: Callable[[Any], None]):
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, prefix=filename, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, mode) as f:
+                write(f)
+            os.replace(temporary_path, os.path.join(self.directory, filename))
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def flush(self):
+        """Write pending changes, once for however many writes came before"""
+        with self._lock:
+            if self._dirty:
+                self.save()
+
+    # ------------------------- Writes -------------------------
+
+    def add_embeddings(self, ids: List[str], texts: List[str], vectors: List[List[float]],
+                       metadatas: Optional[List[Dict]] = None):
+        """Add (or replace) precomputed vectors (written to disk by flush())"""
+        metadatas = metadatas or [{} for _ in texts]
+        with self._lock:
+            replaced = set(ids) & set(self.ids)
+            if replaced:
+                self.delete(list(replaced))
+
+            new_rows = np.asarray(vectors, dtype=np.float32)
+            self.matrix = new_rows if len(self.ids) == 0 else np.vstack([np.asarray(self.matrix), new_rows])
+            self.squared_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+            self.ids.extend(ids)
+            self.documents.extend(texts)
+            self.metadatas.extend(metadata or {} for metadata in metadatas)
+            self._masks = {}
+            self._dirty = True
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[Dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        import uuid
+
+        texts = list(texts)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        self.add_embeddings(ids, texts, self._embedding_function.embed_documents(texts), metadatas)
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return None
+        with self._lock:
+            doomed = set(ids)
+            keep = [i for i, chunk_id in enumerate(self.ids) if chunk_id not in doomed]
+            self.matrix = np.asarray(self.matrix)[keep]
+            self.squared_norms = self.squared_norms[keep]
+            self.ids = [self.ids[i] for i in keep]
+            self.documents = [self.documents[i] for i in keep]
+            self.metadatas = [self.metadatas[i] for i in keep]
+            self._masks = {}
+            self._dirty = True
+        return True
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[Dict]] = None,
+                   directory: Optional[str] = None, **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(embedding, directory)
+        store.add_texts(texts, metadatas, ids=kwargs.get("ids"))
+        store.flush()
+        return store
+
+    @classmethod
+    def from_chroma(cls, chroma_store, directory: str) -> "NumpyVectorStore":
+        """Export every chunk of a Chroma collection, reusing its stored embeddings"""
+        results = chroma_store.get(include=["embeddings", "documents", "metadatas"])
+        store = cls(chroma_store.embeddings, directory=None)
+        store.directory = directory
+        if len(results["ids"]):
+            store.add_embeddings(list(results["ids"]), list(results["documents"]),
+                                 results["embeddings"], list(results["metadatas"]))
+        store.save()
+        return store
+
+    # ------------------------- Reads -------------------------
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def _mask(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        """Boolean row mask for a filter (cached, filters repeat across requests)"""
+        if not where:
+            return None
+        key = json.dumps(where, sort_keys=True)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.fromiter((matches_where(metadata, where) for metadata in self.metadatas),
+                               dtype=bool, count=len(self.metadatas))
+            self._masks[key] = mask
+        return mask
+
+    def _search(self, vectors: np.ndarray, k: int, where: Optional[Dict]) -> List[List[Tuple[int, float]]]:
+        """Exact top-k (row, squared L2 distance) for each query vector"""
+        if not self.ids:
+            return [[] for _ in range(len(vectors))]
+
+        # ||q - x||^2 = ||q||^2 + ||x||^2 - 2 q.x, one matrix multiply for all queries
+        distances = (np.einsum("ij,ij->i", vectors, vectors)[:, None]
+                     + self.squared_norms[None, :]
+                     - 2.0 * (vectors @ np.asarray(self.matrix).T))
+        np.maximum(distances, 0.0, out=distances)
+
+        mask = self._mask(where)
+        if mask is not None:
+            distances[:, ~mask] = np.inf
+            available = int(mask.sum())
+        else:
+            available = len(self.ids)
+
+        k = min(k, available)
+        if k == 0:
+            return [[] for _ in range(len(vectors))]
+
+        results = []
+        for row in distances:
+            top = np.argpartition(row, k - 1)[:k] if k < len(row) else np.arange(len(row))
+            top = top[np.argsort(row[top], kind="stable")]
+            results.append([(int(i), float(row[i])) for i in top])
+        return results
+
+    def _document(self, row: int) -> Document:
+        return Document(id=self.ids[row], page_content=self.documents[row], metadata=self.metadatas[row])
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        vectors = np.asarray([embedding], dtype=np.float32)
+        return [(self._document(row), distance) for row, distance in self._search(vectors, k, filter)[0]]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    filter: Optional[Dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding_function.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict] = None,
+                          **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return self._euclidean_relevance_score_fn
+
+    def get_by_ids(self, ids, /) -> List[Document]:
+        positions = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        return [self._document(positions[chunk_id]) for chunk_id in ids if chunk_id in positions]
+
+    # ------------------------- Chroma-compatible collection API -------------------------
+    # corpus_index, lexical_index and retrieval read the collection directly;
+    # these mirror the Chroma result shapes they rely on.
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            limit: Optional[int] = None, include: Optional[List[str]] = None) -> Dict[str, Any]:
+        include = include if include is not None else ["documents", "metadatas"]
+        if ids is not None:
+            positions = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+            rows = [positions[chunk_id] for chunk_id in ids if chunk_id in positions]
+        else:
+            mask = self._mask(where)
+            rows = [row for row in range(len(self.ids)) if mask is None or mask[row]]
+        if ids is not None and where:
+            rows = [row for row in rows if matches_where(self.metadatas[row], where)]
+        if limit is not None:
+            rows = rows[:limit]
+
+        result: Dict[str, Any] = {"ids": [self.ids[row] for row in rows]}
+        if "documents" in include:
+            result["documents"] = [self.documents[row] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self.metadatas[row] for row in rows]
+        if "embeddings" in include:
+            result["embeddings"] = np.asarray(self.matrix)[rows]
+        return result
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10, where: Optional[Dict] = None,
+              include: Optional[List[str]] = None) -> Dict[str, Any]:
+        include = include if include is not None else ["documents", "metadatas", "distances"]
+        hits = self._search(np.asarray(query_embeddings, dtype=np.float32), n_results, where)
+        result: Dict[str, Any] = {"ids": [[self.ids[row] for row, _ in rows] for rows in hits]}
+        if "documents" in include:
+            result["documents"] = [[self.documents[row] for row, _ in rows] for rows in hits]
+        if "metadatas" in include:
+            result["metadatas"] = [[self.metadatas[row] for row, _ in rows] for rows in hits]
+        if "distances" in include:
+            result["distances"] = [[distance for _, distance in rows] for rows in hits]
+        return result
+
+
+def collection_of(vector_store):
+    """The object answering count/get/query: the Chroma collection, or the NumPy store itself"""
+    return getattr(vector_store, "_collection", vector_store)
+
+
+def is_stale(persist_directory: str = "vector_store") -> bool:
+    """True when the export is missing or older than the Chroma database it was built from"""
+    records_path = os.path.join(get_store_directory(persist_directory), RECORDS_FILENAME)
+    chroma_path = os.path.join(persist_directory, "chroma.sqlite3")
+    if not os.path.exists(records_path):
+        return True
+    return os.path.exists(chroma_path) and os.path.getmtime(chroma_path) > os.path.getmtime(records_path)
+
+
+@contextmanager
+def _build_lock(persist_directory: str) -> Iterator[None]:
+    """Exclusive lock on the export of `persist_directory`, across processes (the lock file is kept)"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(persist_directory, exist_ok=True)
+    with open(os.path.join(persist_directory, BUILD_LOCK_FILENAME), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def build(persist_directory: str = "vector_store") -> int:
+    """Export the Chroma collection in `persist_directory` to the NumPy layout, returns the chunk count"""
+    with _build_lock(persist_directory):
+        return _export(persist_directory)
+
+
+def refresh(persist_directory: str = "vector_store") -> bool:
+    """Rebuild the export if it is older than Chroma, returns whether this call rebuilt it"""
+    if not is_stale(persist_directory):
+        return False
+    with _build_lock(persist_directory):
+        if not is_stale(persist_directory):
+            return False
+        _export(persist_directory)
+        return True
+
+
+def _export(persist_directory: str) -> int:
+    import ai_runtime
+    from langchain_chroma import Chroma
+
+    chroma_store = Chroma(
+        collection_name=ai_runtime.COLLECTION_NAME,
+        embedding_function=ai_runtime.get_embeddings(),
+        persist_directory=persist_directory
+    )
+    return NumpyVectorStore.from_chroma(chroma_store, get_store_directory(persist_directory)).count()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--persist-directory", default="vector_store")
+    args = parser.parse_args()
+
+    count = build(args.persist_directory)
+    print(f"exported {count} chunks to {get_store_directory(args.persist_directory)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+CPU embedding backend: all-MiniLM-L6-v2 exported to ONNX with int8 dynamic quantization.
+
+Serving only needs onnxruntime and tokenizers, so workers using this backend
+never import torch. Exporting needs torch, transformers and onnx once, on a
+build machine.
+
+Model directory layout (KIA_ONNX_MODEL_DIR, default instance/onnx/all-MiniLM-L6-v2):
+    model.onnx       quantized graph (model_fp32.onnx is kept next to it)
+    tokenizer.json   fast tokenizer of the original model
+    manifest.json    source model, max sequence length, quantization, output name
+
+Usage (from Application/backend):
+    python -m onnx_embeddings export        # export + quantize
+    python -m onnx_embeddings check         # ranking parity against HuggingFaceEmbeddings
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+MODEL_FILENAME = "model.onnx"
+FP32_MODEL_FILENAME = "model_fp32.onnx"
+TOKENIZER_FILENAME = "tokenizer.json"
+MANIFEST_FILENAME = "manifest.json"
+
+# all-MiniLM-L6-v2 was trained with 256 word pieces; longer inputs are truncated like sentence-transformers does
+MAX_SEQUENCE_LENGTH = 256
+DEFAULT_BATCH_SIZE = 32
+
+# Parity check thresholds: mean top-k overlap of the rankings and lowest vector cosine similarity
+PARITY_MIN_OVERLAP = 0.9
+PARITY_MIN_COSINE = 0.98
+
+PARITY_SENTENCES = [
+    "Linear regression fits a straight line by minimising the squared error.",
+    "Logistic regression predicts class probabilities with the sigmoid function.",
+    "StandardScaler removes the mean and scales each feature to unit variance.",
+    "MinMaxScaler maps every feature into the range zero to one.",
+    "A Pipeline chains transformers with a final estimator.",
+    "ColumnTransformer applies different preprocessing to different columns.",
+    "SGDRegressor fits linear models with stochastic gradient descent.",
+    "RidgeClassifier converts the targets to minus one and one and solves a ridge regression.",
+    "Decision trees split the feature space with axis-aligned thresholds.",
+    "Random forests average many decorrelated decision trees.",
+    "K-nearest neighbours predicts from the labels of the closest training points.",
+    "Cross validation estimates generalisation error on held-out folds.",
+    "GridSearchCV tries every combination of hyperparameters in a grid.",
+    "Precision is the fraction of predicted positives that are correct.",
+    "Recall is the fraction of actual positives that are found.",
+    "The confusion matrix counts true and false positives and negatives.",
+    "Polynomial features let linear models fit curved relationships.",
+    "Regularisation penalises large weights to reduce overfitting.",
+    "Gradient descent updates weights in the direction of the negative gradient.",
+    "The perceptron updates its weights only on misclassified samples.",
+    "Support vector machines maximise the margin between classes.",
+    "Naive Bayes assumes features are conditionally independent given the class.",
+    "Learning curves show how training and validation scores change with data size.",
+    "One-hot encoding turns categorical values into binary indicator columns.",
+]
+
+
+def get_default_model_dir(model_name: str) -> str:
+    return os.path.join("instance", "onnx", model_name.split("/")[-1])
+
+
+def read_manifest(model_dir: str) -> Dict:
+    with open(os.path.join(model_dir, MANIFEST_FILENAME)) as f:
+        return json.load(f)
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+Drop-in replacement for HuggingFaceEmbeddings running an exported ONNX model.
+
+Reproduces the sentence-transformers pipeline of all-MiniLM-L6-v2: word piece
+tokenization truncated to 256 tokens, mean pooling over the attention mask and
+L2 normalization.
+    """
+
+    def __init__(self, model_dir: str, batch_size: int = DEFAULT_BATCH_SIZE, threads: Optional[int] = None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.model_dir = model_dir
+        self.batch_size = batch_size
+        self.manifest = read_manifest(model_dir)
+
+        max_length = self.manifest.get("max_sequence_length", MAX_SEQUENCE_LENGTH)
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILENAME))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id("[PAD]") or 0, pad_token="[PAD]")
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, MODEL_FILENAME), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.asarray([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.asarray([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        # Mean pooling over real tokens, then L2 normalization
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = [text.replace("\n", " ") for text in texts]
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[start:start + self.batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def export(model_name: str, output_dir: str, quantize: bool = True) -> str:
+    """
+Export a sentence-transformers model to ONNX and quantize it to int8.
+
+Args:
+model_name: Hugging Face model id
+output_dir: Where to write the model directory
+quantize: Apply int8 dynamic quantization (weights only, activations stay float)
+
+Returns:
+Path of the model directory
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(output_dir, FP32_MODEL_FILENAME)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+
+    model_path = os.path.join(output_dir, MODEL_FILENAME)
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(fp32_path, model_path, weight_type=QuantType.QInt8)
+    else:
+        os.replace(fp32_path, model_path)
+
+    tokenizer.backend_tokenizer.save(os.path.join(output_dir, TOKENIZER_FILENAME))
+    with open(os.path.join(output_dir, MANIFEST_FILENAME), "w") as f:
+        json.dump({
+            "model_name": model_name,
+            "max_sequence_length": MAX_SEQUENCE_LENGTH,
+            "quantization": "int8-dynamic" if quantize else "none",
+            "inputs": input_names,
+        }, f, indent=2)
+    return output_dir
+
+
+def _top_k_overlap(reference: np.ndarray, candidate: np.ndarray, k: int) -> float:
+    """Mean overlap of the top-k neighbour sets (self excluded) under both similarity matrices"""
+    np.fill_diagonal(reference, -np.inf)
+    np.fill_diagonal(candidate, -np.inf)
+    reference_top = np.argsort(-reference, axis=1)[:, :k]
+    candidate_top = np.argsort(-candidate, axis=1)[:, :k]
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(reference_top, candidate_top)]))
+
+
+def parity_check(reference: Embeddings, candidate: Embeddings, texts: List[str] = PARITY_SENTENCES,
+                 k: int = 5) -> Dict[str, float]:
+    """
+Compare cosine-similarity rankings of two embedding backends over the same texts.
+
+Returns:
+Dict with the mean top-k neighbour overlap, the lowest and mean cosine
+similarity between the two backends' vectors for the same text, and `passed`
+    """
+    reference_vectors = np.asarray(reference.embed_documents(texts), dtype=np.float32)
+    candidate_vectors = np.asarray(candidate.embed_documents(texts), dtype=np.float32)
+    reference_vectors /= np.linalg.norm(reference_vectors, axis=1, keepdims=True)
+    candidate_vectors /= np.linalg.norm(candidate_vectors, axis=1, keepdims=True)
+
+    agreement = np.einsum("ij,ij->i", reference_vectors, candidate_vectors)
+    overlap = _top_k_overlap(reference_vectors @ reference_vectors.T, candidate_vectors @ candidate_vectors.T,
+                             min(k, len(texts) - 1))
+    return {
+        "top_k_overlap": round(overlap, 4),
+        "min_cosine": round(float(agreement.min()), 4),
+        "mean_cosine": round(float(agreement.mean()), 4),
+        "passed": overlap >= PARITY_MIN_OVERLAP and float(agreement.min()) >= PARITY_MIN_COSINE,
+    }
+
+
+def main():
+    import ai_runtime
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export", "check"])
+    parser.add_argument("--model", default=ai_runtime.EMBEDDING_MODEL_NAME)
+    parser.add_argument("--output", default=ai_runtime.ONNX_MODEL_DIR)
+    parser.add_argument("--no-quantize", action="store_true", help="Keep float32 weights")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        path = export(args.model, args.output, quantize=not args.no_quantize)
+        print(f"exported {args.model} to {path}")
+        return
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    result = parity_check(HuggingFaceEmbeddings(model_name=args.model), OnnxEmbeddings(args.output))
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
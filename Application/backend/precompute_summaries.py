@@ -0,0 +1,131 @@
+"""
+Generate every lecture and week summary ahead of time.
+
+Walks the corpus catalog (every Week_X_Lecture_Y.pdf and MLP Week N Slides.pdf),
+and generates the summary of each source whose current content has no stored
+artifact yet, a few at a time. Summaries of unchanged sources are left alone,
+so after an ingest only the changed lectures are regenerated, and
+/video_summarizer and /generate_week_summary are served from the artifact
+store without calling Gemini.
+
+Run it after ingesting and periodically (e.g. daily, summaries expire after
+ARTIFACT_TTLS["lecture_summary"]).
+
+Usage (from Application/backend):
+    flask precompute-summaries
+    flask precompute-summaries --workers 2 --only weeks
+    flask precompute-summaries --force          # regenerate everything
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import artifact_store
+import corpus_index
+import lecture_summarizer
+import week_summarizer
+
+DEFAULT_WORKERS = 4
+
+
+def plan(persist_directory: str = "vector_store", only: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+Summaries to produce, from the catalog.
+
+Args:
+persist_directory: Directory for the vector store
+only: "lectures" or "weeks" to restrict the plan
+
+Returns:
+List of jobs with kind ("lecture" or "week"), week and (for lectures) lecture
+    """
+    vector_store = lecture_summarizer.get_vector_store(persist_directory)
+    jobs = []
+    if only in (None, "lectures"):
+        jobs += [
+            {"kind": "lecture", "week": entry["week"], "lecture": entry["lecture"]}
+            for entry in corpus_index.get_catalog(vector_store, persist_directory, kind="lecture")
+            if entry["week"] is not None and entry["lecture"] is not None
+        ]
+    if only in (None, "weeks"):
+        jobs += [
+            {"kind": "week", "week": entry["week"]}
+            for entry in corpus_index.get_catalog(vector_store, persist_directory, kind="slides")
+            if entry["week"] is not None
+        ]
+    return jobs
+
+
+def run_job(job: Dict[str, Any], persist_directory: str = "vector_store", force: bool = False) -> str:
+    """
+Make sure one summary is stored (needs an app context).
+
+Returns:
+"current" (already stored for this content), "generated", "missing" (no source text) or "failed"
+    """
+    week = job["week"]
+    if job["kind"] == "lecture":
+        filename = lecture_summarizer.get_lecture_filename(week, job["lecture"])
+        text = lecture_summarizer.retrieve_transcript(filename, persist_directory)
+        key = lecture_summarizer.get_summary_key(week, job["lecture"], text)
+        summarize = lambda: lecture_summarizer.summarize_lecture(week, job["lecture"], persist_directory)
+        error_prefix = lecture_summarizer.SUMMARY_ERROR_PREFIX
+    else:
+        text = week_summarizer.retrieve_slides_content(week, persist_directory)
+        key = week_summarizer.get_summary_key(week, text)
+        summarize = lambda: week_summarizer.summarize_week_slides(week, persist_directory)
+        error_prefix = week_summarizer.SUMMARY_ERROR_PREFIX
+
+    if not text.strip():
+        return "missing"
+    if force:
+        artifact_store.discard(key[0], key[1])
+    elif artifact_store.exists(*key):
+        return "current"
+
+    result = summarize()
+    # A stale result is the previous version, served because generating this one failed
+    if not result.get("success") or result.get("stale") or result["summary"].startswith(error_prefix):
+        return "failed"
+    return "generated"
+
+
+def precompute(app, persist_directory: str = "vector_store", workers: int = DEFAULT_WORKERS,
+               force: bool = False, only: Optional[str] = None) -> Dict[str, Any]:
+    """
+Generate all missing or outdated lecture and week summaries.
+
+Args:
+app: Flask app (each job runs in its own app context)
+persist_directory: Directory for the vector store
+workers: Summaries generated concurrently
+force: Regenerate summaries that are already current
+only: "lectures" or "weeks" to do one kind only
+
+Returns:
+Dictionary with success, message, per-status counts, the failed jobs and the elapsed time
+    """
+    started = time.perf_counter()
+    jobs = plan(persist_directory, only)
+
+    def run(job):
+        with app.app_context():
+            try:
+                return run_job(job, persist_directory, force)
+            except Exception:
+                return "failed"
+
+    # Gemini calls dominate, so threads are enough; the pool size bounds concurrent calls
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        statuses = list(pool.map(run, jobs))
+
+    counts = {status: statuses.count(status) for status in ("generated", "current", "missing", "failed")}
+    failed = [job for job, status in zip(jobs, statuses) if status == "failed"]
+    return {
+        "success": not failed,
+        "message": f"Generated {counts['generated']} summaries, {counts['current']} already current, "
+                   f"{counts['failed']} failed",
+        "counts": counts,
+        "failed": failed,
+        "seconds": round(time.perf_counter() - started, 2)
+    }
@@ -1,23 +1,25 @@
 import warnings
 from functools import lru_cache
 from typing import Dict, List, Any
-import os
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from langchain_google_genai import ChatGoogleGenerativeAI
+
+import ai_runtime
+import artifact_store
+import context_builder
+import retrieval
+import retrieval_cache
 
 # Suppress deprecation warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-# Global singletons for components
-_embeddings = None
-_vector_store = None
-_llm = None
-_mcq_cache = {}
+# Bump when the MCQ prompt changes so stored quizzes are regenerated
+PROMPT_VERSION = "1"
+
+# Chunks retrieved per quiz before packing the context
+CANDIDATE_CHUNKS = 50
 
 
 # Define the schema for MCQ output
@@ -31,58 +33,36 @@ class MCQSet(BaseModel):
     questions: List[MCQQuestion] = Field(description="List of MCQ questions")
 
 
-def get_api_key() -> str:
-    """Get API key for Google Generative AI"""
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("Google API key is not set")
-    return api_key
-
-
 def get_embeddings():
-    """Singleton for embeddings"""
-    global _embeddings
-    if _embeddings is None:
-        _embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
-    return _embeddings
+    """Shared embeddings from the AI runtime"""
+    return ai_runtime.get_embeddings(owner=__name__)
 
 
 def get_vector_store(persist_directory: str = "vector_store"):
-    """Singleton for vector store"""
-    global _vector_store
-    if _vector_store is None:
-        _vector_store = Chroma(
-            collection_name="pdf_embeddings",
-            embedding_function=get_embeddings(),
-            persist_directory=persist_directory
-        )
-    return _vector_store
+    """Shared vector store from the AI runtime"""
+    return ai_runtime.get_vector_store(persist_directory, owner=__name__)
 
 
 def get_llm():
-    """Singleton for language model"""
-    global _llm
-    if _llm is None:
-        _llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            google_api_key=get_api_key(),
-            temperature=0.7
-        )
-    return _llm
+    """Shared language model from the AI runtime"""
+    return ai_runtime.get_llm(owner=__name__, temperature=0.7)
+
+
 
+# Last week covered by each quiz type
+QUIZ_LAST_WEEK = {"quiz1": 4, "quiz2": 8, "endterm": 10}
+
+def get_weeks(quiz_type: str) -> List[int]:
+    """Weeks covered by a quiz type"""
+    last_week = QUIZ_LAST_WEEK.get(quiz_type.lower())
+    if last_week is None:
+        raise ValueError(f"Invalid quiz type: {quiz_type}. Must be one of: quiz1, quiz2, endterm")
+    return list(range(1, last_week + 1))
 
 def get_weeks_range(quiz_type: str) -> str:
     """Determine weeks range based on quiz type"""
-    if quiz_type.lower() == "quiz1":
-        return "Weeks 1-4"
-    elif quiz_type.lower() == "quiz2":
-        return "Weeks 1-8"
-    elif quiz_type.lower() == "endterm":
-        return "Weeks 1-10"
-    else:
-        raise ValueError(f"Invalid quiz type: {quiz_type}. Must be one of: quiz1, quiz2, endterm")
+    weeks = get_weeks(quiz_type)
+    return f"Weeks {weeks[0]}-{weeks[-1]}"
 
 @lru_cache(maxsize=20)
 def get_mcq_prompt(weeks_range: str) -> ChatPromptTemplate:
@@ -157,66 +137,83 @@ persist_directory: Directory for the vector store
 Returns:
 Dictionary containing generated MCQs and metadata
     """
-    # Check cache first
-    cache_key = f"{quiz_type}_{num_questions}"
-    if cache_key in _mcq_cache:
-        return _mcq_cache[cache_key]
-
     try:
         # Determine weeks range based on quiz type
+        weeks = get_weeks(quiz_type)
         weeks_range = get_weeks_range(quiz_type)
 
         # Get components
         llm = get_llm()
         vectorstore = get_vector_store(persist_directory)
 
-        # Retrieve context from the vector store
-        search_results = vectorstore.similarity_search(
-            weeks_range,
-            k=min(num_questions * 2, 50)  # Get more context than needed for better coverage
+        # Sample context evenly from the quiz's weeks only (same k for every quiz size,
+        # so all sizes share one cached retrieval)
+        search_results = ai_runtime.get_retrieval_cache().get_or_compute(
+            "weeks", weeks_range, CANDIDATE_CHUNKS, None, persist_directory,
+            lambda: retrieval.sample_weeks(vectorstore, weeks, CANDIDATE_CHUNKS, persist_directory)
         )
 
-        # Combine context from the search results
-        context = "\n".join([doc.page_content for doc in search_results])
-
-        # Create the chain for MCQ generation
-        mcq_prompt = get_mcq_prompt(weeks_range)
-        output_parser = JsonOutputParser(pydantic_object=MCQSet)
-        chain = mcq_prompt | llm | output_parser
-
-        # Generate the MCQs
-        response = chain.invoke({
-            "context": context,
-            "num_questions": num_questions
-        })
-        # Safer parsing of the response
-        if hasattr(response, "questions"):
-            # If response is a Pydantic object
-            questions = response.questions
-        elif hasattr(response, "dict"):
-            # If response has dict method but questions isn't directly accessible
-            questions = response.dict().get("questions", [])
-        elif isinstance(response, dict):
-            # If response is already a dictionary
-            questions = response.get("questions", [])
-        elif isinstance(response, list):
-            # If response is directly a list of questions
-            questions = response
-        else:
-            # Fall back to empty list if we can't determine the format
-            questions = []
-        # Format the result
-        result = {
-            "success": True,
-            "message": f"Successfully generated {len(response.questions) if hasattr(response, 'questions') else num_questions} MCQs",
-            "quiz_type": quiz_type,
-            "weeks_range": weeks_range,
-            "questions": questions
-        }
+        if not search_results:
+            # Weeks not in the catalog (e.g. chunks without week-named sources): rank the whole collection
+            search_results = retrieval_cache.cached_similarity_search(
+                ai_runtime.get_retrieval_cache(),
+                vectorstore,
+                weeks_range,
+                k=CANDIDATE_CHUNKS,
+                persist_directory=persist_directory
+            )
+
+        # Pack the best context into a budget that grows with the number of questions
+        context = context_builder.build_context(
+            search_results, max_tokens=context_builder.question_budget(num_questions)
+        )
 
-        # Cache the result
-        _mcq_cache[cache_key] = result
-        return result
+        def generate():
+            # Create the chain for MCQ generation
+            mcq_prompt = get_mcq_prompt(weeks_range)
+            output_parser = JsonOutputParser(pydantic_object=MCQSet)
+            chain = mcq_prompt | llm | output_parser
+
+            # Generate the MCQs
+            response = chain.invoke({
+                "context": context,
+                "num_questions": num_questions
+            })
+            # Safer parsing of the response
+            if hasattr(response, "questions"):
+                # If response is a Pydantic object
+                questions = response.questions
+            elif hasattr(response, "dict"):
+                # If response has dict method but questions isn't directly accessible
+                questions = response.dict().get("questions", [])
+            elif isinstance(response, dict):
+                # If response is already a dictionary
+                questions = response.get("questions", [])
+            elif isinstance(response, list):
+                # If response is directly a list of questions
+                questions = response
+            else:
+                # Fall back to empty list if we can't determine the format
+                questions = []
+            # Format the result
+            result = {
+                "success": True,
+                "message": f"Successfully generated {len(response.questions) if hasattr(response, 'questions') else num_questions} MCQs",
+                "quiz_type": quiz_type,
+                "weeks_range": weeks_range,
+                "questions": questions
+            }
+
+            return result
+
+        # Shared by all workers; different retrieved content hashes to a new entry
+        return artifact_store.get_or_create(
+            "mcq",
+            {"quiz_type": quiz_type, "num_questions": num_questions},
+            artifact_store.content_hash(context),
+            PROMPT_VERSION,
+            generate
+        )
 
     except Exception as e:
         return {
@@ -229,6 +226,5 @@ Dictionary containing generated MCQs and metadata
 
 def clear_cache():
     """Clear all MCQ caches"""
-    global _mcq_cache
-    _mcq_cache = {}
+    artifact_store.clear("mcq")
     get_mcq_prompt.cache_clear()
@@ -0,0 +1,242 @@
+import math
+import re
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+import corpus_index
+from lexical_index import STOPWORDS, WORD_PATTERN, LexicalIndex
+from numpy_store import collection_of
+
+# Constant from the reciprocal rank fusion paper; damps the weight of the top ranks
+RRF_K = 60
+# Candidates taken from each retriever per requested result before fusion
+CANDIDATE_MULTIPLIER = 2
+# Share of the query's words that must be code identifiers to skip the vector search
+IDENTIFIER_QUERY_RATIO = 0.5
+
+# CamelCase (SGDRegressor), snake_case (train_test_split) or dotted (df.groupby) names
+IDENTIFIER_PATTERN = re.compile(r"^(?:[A-Za-z]*[a-z][A-Z]\w*|[A-Z]{2,}[a-z]\w*|\w+_\w+)$")
+DOTTED_PATTERN = re.compile(r"\b\w+\.\w+\b")
+
+
+def batch_similarity_search(
+        vector_store,
+        queries: List[str],
+        k: int = 3,
+        filter: Optional[Dict] = None
+) -> List[List[Document]]:
+    """
+Run several similarity searches with one embedding pass and one query.
+
+All queries are embedded in a single embed_documents call and sent to the
+collection as one multi-vector query. A chunk that is retrieved for more
+than one query is only kept for the query where it ranks best, so callers
+never see the same text twice.
+
+Args:
+vector_store: The Chroma vector store
+queries: Query strings
+k: Results per query
+filter: Optional metadata filter applied to every query
+
+Returns:
+One list of documents per query, in the order of `queries`
+    """
+    if not queries:
+        return []
+
+    query_embeddings = vector_store.embeddings.embed_documents(queries)
+    results = collection_of(vector_store).query(
+        query_embeddings=query_embeddings,
+        n_results=k,
+        where=filter,
+        include=["documents", "metadatas", "distances"]
+    )
+
+    # Best (distance, query position) for every retrieved chunk
+    best: Dict[str, tuple] = {}
+    for query_index, (ids, distances) in enumerate(zip(results["ids"], results["distances"])):
+        for chunk_id, distance in zip(ids, distances):
+            if chunk_id not in best or distance < best[chunk_id][0]:
+                best[chunk_id] = (distance, query_index)
+
+    per_query: List[List[Document]] = [[] for _ in queries]
+    for query_index, rows in enumerate(zip(results["ids"], results["documents"], results["metadatas"])):
+        for chunk_id, text, metadata in zip(*rows):
+            if best[chunk_id][1] == query_index:
+                per_query[query_index].append(Document(id=chunk_id, page_content=text, metadata=metadata or {}))
+                # Guards against the same id appearing twice in one result list
+                best[chunk_id] = (best[chunk_id][0], -1)
+
+    return per_query
+
+
+def merge_results(per_query: List[List[Document]]) -> List[Document]:
+    """Interleave per-query results by rank into one de-duplicated list"""
+    merged: List[Document] = []
+    seen = set()
+    depth = max((len(docs) for docs in per_query), default=0)
+    for rank in range(depth):
+        for docs in per_query:
+            if rank < len(docs):
+                doc = docs[rank]
+                key = doc.id or doc.page_content
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(doc)
+    return merged
+
+
+def _document_key(doc: Document) -> str:
+    return doc.id or doc.page_content
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Document]], k: int = RRF_K) -> List[Document]:
+    """
+Fuse several rankings of the same corpus into one.
+
+Each document scores sum(1 / (k + rank)) over the lists it appears in, so
+only ranks matter and BM25 scores never have to be compared with distances.
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, start=1):
+            key = _document_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(key, doc)
+    return [documents[key] for key in sorted(scores, key=lambda key: scores[key], reverse=True)]
+
+
+def identifier_terms(query: str) -> List[str]:
+    """Code identifiers in a query, e.g. ["ColumnTransformer", "fit_transform"]"""
+    terms = [word for word in WORD_PATTERN.findall(query) if IDENTIFIER_PATTERN.match(word)]
+    return terms + [match.split(".")[-1] for match in DOTTED_PATTERN.findall(query)]
+
+
+def is_identifier_query(query: str) -> bool:
+    """True when at least half of the query's content words are code identifiers"""
+    words = [word for word in WORD_PATTERN.findall(query) if word.lower() not in STOPWORDS]
+    if not words:
+        return False
+    identifiers = set(identifier_terms(query))
+    return sum(word in identifiers for word in words) / len(words) >= IDENTIFIER_QUERY_RATIO
+
+
+def hybrid_search(
+        vector_store,
+        lexical_index: LexicalIndex,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict] = None,
+        embedding: Optional[List[float]] = None
+) -> List[Document]:
+    """
+Retrieve chunks with BM25 and vector search fused by reciprocal rank.
+
+Queries made up mostly of API names (e.g. "SGDRegressor vs RidgeClassifier")
+are answered from the lexical index alone when every identifier occurs in
+the corpus, which skips the embedding pass entirely.
+
+Args:
+vector_store: The Chroma vector store
+lexical_index: BM25 index over the same collection
+query: Query text
+k: Number of results
+filter: Optional metadata equality filter
+embedding: Precomputed query embedding (skips embedding `query` again)
+
+Returns:
+List of documents, best first
+    """
+    candidates = k * CANDIDATE_MULTIPLIER
+    lexical = [doc for doc, _ in lexical_index.search(query, k=candidates, filter=filter)]
+
+    if is_identifier_query(query) and len(lexical) >= k:
+        terms = [term.lower() for term in identifier_terms(query)]
+        if all(lexical_index.document_frequency(term) for term in terms):
+            return lexical[:k]
+
+    if embedding is not None:
+        semantic = vector_store.similarity_search_by_vector(embedding, k=candidates, filter=filter)
+    else:
+        semantic = vector_store.similarity_search(query, k=candidates, filter=filter)
+    return reciprocal_rank_fusion([semantic, lexical])[:k]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+LangChain retriever wrapper around hybrid_search, for use in chains.
+
+The lexical index is looked up on every query (e.g. ai_runtime.get_lexical_index),
+so a long-lived chain searches the index rebuilt after an ingest.
+    """
+
+    vector_store: object
+    get_lexical_index: Callable[[], LexicalIndex]
+    k: int = 4
+    filter: Optional[Dict] = None
+
+    def _get_relevant_documents(
+            self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return hybrid_search(self.vector_store, self.get_lexical_index(), query, k=self.k, filter=self.filter)
+
+
+def _share_slots(available: Dict[int, int], k: int) -> Dict[int, int]:
+    """
+Chunks to take from each week: equal shares of `k` (rounded up), with the
+share a week is too short for handed to the weeks that have chunks left.
+    """
+    counts = {week: 0 for week in available}
+    open_weeks = [week for week, size in available.items() if size > 0]
+    while open_weeks and sum(counts.values()) < k:
+        share = math.ceil((k - sum(counts.values())) / len(open_weeks))
+        for week in open_weeks:
+            counts[week] += min(share, available[week] - counts[week])
+        open_weeks = [week for week in open_weeks if counts[week] < available[week]]
+    return counts
+
+
+def sample_weeks(vector_store, weeks: List[int], k: int, persist_directory: str = "vector_store") -> List[Document]:
+    """
+Evenly spaced chunks from each week's material, for queries scoped to a range of weeks.
+
+Uses the week shard map in corpus_index, so only the requested weeks are
+touched and no embedding or ANN search is needed. Each week contributes the
+same number of chunks, spread evenly over its lectures and slides (slots a
+short week can't fill go to the weeks that still have chunks), and the
+result is interleaved week by week so a token budget that cuts the tail still
+covers every week.
+
+Args:
+vector_store: The vector store
+weeks: Week numbers to cover
+k: Total number of chunks
+persist_directory: Directory for the vector store
+
+Returns:
+List of documents (empty if none of the weeks are indexed)
+    """
+    partitions = corpus_index.get_week_partitions(vector_store, weeks, persist_directory)
+    counts = _share_slots({week: len(chunk_ids) for week, chunk_ids in partitions.items()}, k)
+
+    sampled: Dict[int, List[str]] = {}
+    for week, chunk_ids in partitions.items():
+        count = counts[week]
+        # Midpoints of `count` equal slices of the week's chunks
+        sampled[week] = [chunk_ids[int((i + 0.5) * len(chunk_ids) / count)] for i in range(count)]
+
+    wanted = [chunk_id for chunk_ids in sampled.values() for chunk_id in chunk_ids]
+    if not wanted:
+        return []
+    results = vector_store.get(ids=wanted, include=["documents", "metadatas"])
+    by_id = {
+        chunk_id: Document(id=chunk_id, page_content=text, metadata=metadata or {})
+        for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+    }
+    per_week_docs = [[by_id[chunk_id] for chunk_id in chunk_ids if chunk_id in by_id] for chunk_ids in sampled.values()]
+    return merge_results(per_week_docs)[:k]
@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+import corpus_index
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_SECONDS = 3600
+# How long a collection version read from the corpus index is trusted before re-reading it
+VERSION_CHECK_INTERVAL = 2.0
+
+
+class RetrievalCache:
+    """
+In-process LRU + TTL cache of retrieval results.
+
+Keys include the collection content version from corpus_index, so results
+cached before an ingest are never served after it (in any worker: every
+process re-reads the version at most every VERSION_CHECK_INTERVAL seconds).
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._versions: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def collection_version(self, persist_directory: str) -> int:
+        """Collection version, re-read from disk at most every VERSION_CHECK_INTERVAL seconds"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._versions.get(persist_directory)
+            if cached and now - cached[1] < VERSION_CHECK_INTERVAL:
+                return cached[0]
+        version = corpus_index.get_collection_version(persist_directory)
+        with self._lock:
+            self._versions[persist_directory] = (version, now)
+        return version
+
+    @staticmethod
+    def make_key(kind: str, query: str, k: int, filter: Optional[Dict], version: int) -> tuple:
+        return (kind, query, k, json.dumps(filter, sort_keys=True) if filter else None, version)
+
+    def get_or_compute(self, kind: str, query: str, k: int, filter: Optional[Dict], persist_directory: str,
+                       compute: Callable[[], List[Document]]) -> List[Document]:
+        """
+Cached result for (kind, query, k, filter, collection version), computing it on a miss.
+
+Args:
+kind: Which retrieval produced the result (e.g. "similarity", "hybrid")
+query: Query text
+k: Number of results requested
+filter: Metadata filter, if any
+persist_directory: Directory for the vector store (selects the collection version)
+compute: Runs the retrieval on a miss
+
+Returns:
+List of documents (a new list on every call; the documents are shared)
+        """
+        key = self.make_key(kind, query, k, filter, self.collection_version(persist_directory))
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+
+        documents = compute()
+
+        with self._lock:
+            self._entries[key] = (now + self.ttl_seconds, list(documents))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return list(documents)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds
+            }
+
+
+def cached_similarity_search(cache: RetrievalCache, vector_store, query: str, k: int = 4,
+                             filter: Optional[Dict] = None, persist_directory: str = "vector_store") -> List[Document]:
+    """vector_store.similarity_search through the cache"""
+    return cache.get_or_compute(
+        "similarity", query, k, filter, persist_directory,
+        lambda: vector_store.similarity_search(query, k=k, filter=filter)
+    )
+
+
+class CachedRetriever(BaseRetriever):
+    """Wraps another retriever so chains (e.g. Kia's) read through the cache"""
+
+    retriever: BaseRetriever
+    cache: object
+    kind: str
+    k: int
+    persist_directory: str = "vector_store"
+
+    def _get_relevant_documents(
+            self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.cache.get_or_compute(
+            self.kind, query, self.k, None, self.persist_directory,
+            lambda: self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        )
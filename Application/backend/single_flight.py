@@ -0,0 +1,138 @@
+"""
+Coalesce concurrent generations of the same artifact.
+
+When many students open the same lecture at once, every request misses the
+artifact store (it is only filled once generation finishes) and would call
+Gemini on its own. SingleFlight makes concurrent callers for one key share
+one generation:
+
+- threads of a worker wait on the in-flight call and receive its result
+- workers take an exclusive flock on a per-key lock file; a worker that had
+  to wait for the lock re-checks the store (`lookup`) before generating,
+  so it picks up the artifact the other worker just stored
+
+Locks held by a crashed worker are released by the OS. If a lock is not
+released within `timeout` seconds the caller generates anyway rather than
+failing the request. On platforms without fcntl only the in-process part
+applies.
+"""
+import copy
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DEFAULT_TIMEOUT_SECONDS = 120.0
+POLL_INTERVAL_SECONDS = 0.05
+
+
+class _Call:
+    """One in-flight generation that other threads can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Run at most one generation per key at a time, across threads and (with `lock_dir`) processes"""
+
+    def __init__(self, lock_dir: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                 poll_interval: float = POLL_INTERVAL_SECONDS):
+        self.lock_dir = lock_dir
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.leaders = 0
+        self.coalesced = 0
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, compute: Callable[[], Any], lookup: Optional[Callable[[], Any]] = None) -> Any:
+        """
+Result of `compute()` for `key`, shared with every concurrent caller for the same key.
+
+Args:
+key: Identifies the artifact being generated
+compute: Generates (and stores) the result
+lookup: Reads an already stored result, or returns None; called after waiting for another worker
+
+Returns:
+The result (waiting threads get their own copy)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not call.done.wait(self.timeout):
+                # The generation is stuck; don't fail the request because of it
+                return compute()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = self._run_exclusive(key, compute, lookup)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _run_exclusive(self, key: str, compute: Callable[[], Any], lookup: Optional[Callable[[], Any]]) -> Any:
+        with self._file_lock(key) as waited:
+            if waited and lookup is not None:
+                stored = lookup()
+                if stored is not None:
+                    return stored
+            return compute()
+
+    def _lock_path(self, key: str) -> str:
+        return os.path.join(self.lock_dir, hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + ".lock")
+
+    @contextmanager
+    def _file_lock(self, key: str) -> Iterator[bool]:
+        """Hold the cross-process lock for `key`; yields whether another process held it first"""
+        if fcntl is None or not self.lock_dir:
+            yield False
+            return
+
+        os.makedirs(self.lock_dir, exist_ok=True)
+        # Lock files are a few bytes and reused, so they are never deleted (unlinking races with flock)
+        with open(self._lock_path(key), "a") as f:
+            waited, locked = False, False
+            deadline = time.monotonic() + self.timeout
+            while not locked:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                except BlockingIOError:
+                    waited = True
+                    if time.monotonic() >= deadline:
+                        break
+                    time.sleep(self.poll_interval)
+            try:
+                yield waited
+            finally:
+                if locked:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": len(self._calls)}
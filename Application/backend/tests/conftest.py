@@ -0,0 +1,26 @@
+import pytest
+from flask import Flask
+
+import artifact_store
+from extension import db
+
+
+@pytest.fixture
+def database_uri():
+    """Database of store_app; override it in a test module that needs something else"""
+    return 'sqlite:///:memory:'
+
+
+@pytest.fixture
+def store_app(database_uri):
+    """Bare Flask app with the models' tables, inside an app context"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        artifact_store.clear()
+        db.session.remove()
+        db.drop_all()
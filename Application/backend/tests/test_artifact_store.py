@@ -0,0 +1,215 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import artifact_store
+from extension import db
+from models import AIArtifact
+
+
+def _counting(result):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return dict(result)
+    return compute, calls
+
+
+def test_artifact_is_generated_once(store_app, monkeypatch):
+    monkeypatch.setattr(artifact_store, "ACCESS_INTERVAL", timedelta(0))
+    compute, calls = _counting({"success": True, "summary": "Week 1 covers pandas"})
+
+    first = artifact_store.get_or_create("week_summary", {"week": 1}, "hash-a", "1", compute)
+    second = artifact_store.get_or_create("week_summary", {"week": 1}, "hash-a", "1", compute)
+
+    assert first == second == {"success": True, "summary": "Week 1 covers pandas"}
+    assert len(calls) == 1
+    assert AIArtifact.query.one().hit_count == 1
+
+
+def test_changed_source_or_prompt_regenerates(store_app):
+    compute, calls = _counting({"success": True, "summary": "..."})
+
+    artifact_store.get_or_create("week_summary", {"week": 1}, "hash-a", "1", compute)
+    artifact_store.get_or_create("week_summary", {"week": 1}, "hash-b", "1", compute)
+    artifact_store.get_or_create("week_summary", {"week": 1}, "hash-b", "2", compute)
+
+    assert len(calls) == 3
+
+
+def test_failures_are_not_stored(store_app):
+    compute, calls = _counting({"success": False, "summary": ""})
+
+    artifact_store.get_or_create("notes", {"topic": "pandas"}, "hash", "1", compute)
+    artifact_store.get_or_create("notes", {"topic": "pandas"}, "hash", "1", compute)
+
+    assert len(calls) == 2
+    assert AIArtifact.query.count() == 0
+
+
+def test_should_store_overrides_the_success_flag(store_app):
+    compute, _ = _counting({"success": True, "notes": "Error generating summary: quota"})
+
+    artifact_store.get_or_create("notes", {"topic": "pandas"}, "hash", "1", compute,
+                                 should_store=lambda result: not result["notes"].startswith("Error"))
+
+    assert AIArtifact.query.count() == 0
+
+
+def test_expired_artifacts_are_regenerated(store_app):
+    compute, calls = _counting({"success": True, "questions": []})
+    artifact_store.get_or_create("mcq", {"quiz_type": "quiz1"}, "hash", "1", compute)
+
+    artifact = AIArtifact.query.one()
+    artifact.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    artifact_store.get_or_create("mcq", {"quiz_type": "quiz1"}, "hash", "1", compute)
+
+    assert len(calls) == 2
+    assert AIArtifact.query.count() == 1
+
+
+def test_eviction_keeps_the_most_recently_read(store_app):
+    for week in range(4):
+        artifact_store.put("week_summary", {"week": week}, "hash", "1", {"success": True, "week": week})
+    # Weeks were read in order 0..3, then week 0 again
+    for artifact in AIArtifact.query.all():
+        artifact.last_accessed_at = datetime(2025, 1, 1) + timedelta(days=artifact.id)
+    db.session.commit()
+    artifact_store.get("week_summary", {"week": 0}, "hash", "1")
+
+    removed = artifact_store.evict(max_entries=2)
+
+    assert removed == 2
+    assert sorted(artifact.params for artifact in AIArtifact.query.all()) == ['{"week": 0}', '{"week": 3}']
+
+
+def test_reads_update_the_access_time_at_most_once_per_interval(store_app):
+    artifact_store.put("week_summary", {"week": 1}, "hash", "1", {"success": True})
+    # Unrelated pending work of the request must not be committed by a read
+    db.session.add(AIArtifact(cache_key="pending", kind="notes", params="{}", source_hash="hash",
+                              prompt_version="1", payload="{}"))
+
+    for _ in range(2):
+        assert artifact_store.get("week_summary", {"week": 1}, "hash", "1") == {"success": True}
+    db.session.rollback()
+
+    assert AIArtifact.query.one().hit_count == 0
+    AIArtifact.query.one().last_accessed_at = datetime.utcnow() - artifact_store.ACCESS_INTERVAL
+    db.session.commit()
+    artifact_store.get("week_summary", {"week": 1}, "hash", "1")
+
+    # The throttled hits are added with the next write
+    assert db.session.scalar(db.select(AIArtifact.hit_count)) == 3
+
+
+def test_storing_an_artifact_leaves_the_request_session_alone(store_app):
+    artifact_store.put("week_summary", {"week": 1}, "hash-a", "1", {"success": True, "summary": "old"})
+    assert artifact_store.get("week_summary", {"week": 1}, "hash-a", "1")["summary"] == "old"
+    pending = AIArtifact(cache_key="pending", kind="notes", params="{}", source_hash="hash",
+                         prompt_version="1", payload="{}")
+    db.session.add(pending)
+
+    artifact_store.put("week_summary", {"week": 1}, "hash-a", "1", {"success": True, "summary": "new"})
+    artifact_store.discard("week_summary", {"week": 2})
+
+    # The route's pending row is still pending: not thrown away, and not committed
+    assert pending in db.session.new
+    db.session.rollback()
+    assert AIArtifact.query.filter_by(cache_key="pending").count() == 0
+    # ...and the request session sees the store's own writes
+    assert artifact_store.get("week_summary", {"week": 1}, "hash-a", "1")["summary"] == "new"
+
+
+def test_clear_by_kind(store_app):
+    artifact_store.put("notes", {"topic": "a"}, "hash", "1", {"success": True})
+    artifact_store.put("mcq", {"quiz_type": "quiz1"}, "hash", "1", {"success": True})
+
+    assert artifact_store.clear("notes") == 1
+    assert list(artifact_store.stats()) == ["mcq"]
+
+
+def test_without_app_context_results_are_computed_but_not_stored():
+    compute, calls = _counting({"success": True})
+
+    artifact_store.get_or_create("notes", {"topic": "a"}, "hash", "1", compute)
+    artifact_store.get_or_create("notes", {"topic": "a"}, "hash", "1", compute)
+
+    assert len(calls) == 2
+
+
+def test_new_source_supersedes_older_versions(store_app):
+    artifact_store.put("week_summary", {"week": 1}, "hash-a", "1", {"success": True, "summary": "old"})
+    artifact_store.put("week_summary", {"week": 1}, "hash-b", "1", {"success": True, "summary": "new"})
+    artifact_store.put("week_summary", {"week": 2}, "hash-a", "1", {"success": True, "summary": "week 2"})
+
+    assert not artifact_store.exists("week_summary", {"week": 1}, "hash-a", "1")
+    assert artifact_store.exists("week_summary", {"week": 1}, "hash-b", "1")
+    assert artifact_store.exists("week_summary", {"week": 2}, "hash-a", "1")
+
+    assert artifact_store.discard("week_summary", {"week": 1}) == 1
+    assert AIArtifact.query.count() == 1
+
+
+def _stream_args(chunks, calls):
+    def stream():
+        calls.append(1)
+        yield from chunks
+
+    return dict(
+        stream=stream,
+        make_result=lambda text: {"success": True, "summary": text, "week": 1},
+        text_field="summary"
+    )
+
+
+def test_stream_forwards_chunks_and_stores_the_result(store_app):
+    calls = []
+
+    events = list(artifact_store.stream_or_create("week_summary", {"week": 1}, "hash", "1",
+                                                  **_stream_args(["# Week 1", "\n\nIn Week 1, ", "pandas."], calls)))
+    replay = list(artifact_store.stream_or_create("week_summary", {"week": 1}, "hash", "1",
+                                                  **_stream_args(["unused"], calls)))
+
+    assert [event["data"]["text"] for event in events[:-1]] == ["# Week 1", "\n\nIn Week 1, ", "pandas."]
+    assert events[-1]["event"] == "done"
+    assert events[-1]["data"]["cached"] is False
+    assert events[-1]["data"]["summary"] == "# Week 1\n\nIn Week 1, pandas."
+    # The second request is served from the store in one chunk
+    assert len(calls) == 1
+    assert [event["event"] for event in replay] == ["token", "done"]
+    assert replay[0]["data"]["text"] == "# Week 1\n\nIn Week 1, pandas."
+    assert replay[-1]["data"]["cached"] is True
+
+
+def test_abandoned_stream_stores_nothing(store_app):
+    stream = artifact_store.stream_or_create("week_summary", {"week": 1}, "hash", "1",
+                                             **_stream_args(["# Week 1", " more"], []))
+    next(stream)
+    stream.close()
+
+    assert AIArtifact.query.count() == 0
+
+
+def test_failed_lecture_summaries_are_retried_on_the_next_request(store_app, monkeypatch):
+    import lecture_summarizer
+
+    calls = []
+
+    class FlakyLLM:
+        def invoke(self, prompt):
+            calls.append(prompt)
+            if len(calls) == 1:
+                raise RuntimeError("503 overloaded")
+            return type("Response", (), {"content": "### Pandas"})()
+
+    monkeypatch.setattr(lecture_summarizer, "retrieve_transcript", lambda filename, pd="vector_store": "pandas")
+    monkeypatch.setattr(lecture_summarizer, "get_llm", lambda: FlakyLLM())
+
+    first = lecture_summarizer.summarize_lecture(1, 1)
+    second = lecture_summarizer.summarize_lecture(1, 1)
+
+    assert first["summary"].startswith(lecture_summarizer.SUMMARY_ERROR_PREFIX)
+    assert second["summary"] == "### Pandas"
+    assert len(calls) == 2
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import artifact_store
+import kia_chatbot
+import notes_generator
+import week_summarizer
+
+
+class AsyncLLM:
+    def __init__(self, text, delay=0.0, fail=False):
+        self.text = text
+        self.delay = delay
+        self.fail = fail
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("quota exceeded")
+        return SimpleNamespace(content=self.text)
+
+    async def astream(self, prompt):
+        for word in self.text.split(" "):
+            await asyncio.sleep(self.delay)
+            yield SimpleNamespace(content=word + " ")
+
+
+class AsyncChain:
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def ainvoke(self, inputs, config=None):
+        await asyncio.sleep(self.delay)
+        return {"answer": f"About {inputs['input']}"}
+
+
+def test_concurrent_async_requests_share_one_generation(store_app):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"success": True, "notes": "## Pandas"}
+
+    async def main():
+        return await asyncio.gather(*[
+            artifact_store.aget_or_create("notes", {"topic": "pandas"}, "h", "1", compute) for _ in range(5)
+        ])
+
+    results = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert all(result["notes"] == "## Pandas" for result in results)
+    assert artifact_store.get("notes", {"topic": "pandas"}, "h", "1")["notes"] == "## Pandas"
+
+
+def test_async_notes_are_served_to_the_blocking_call(store_app, monkeypatch):
+    monkeypatch.setattr(notes_generator, "retrieve_topic_context", lambda topic, pd="vector_store": "context")
+    monkeypatch.setattr(notes_generator, "get_llm", lambda: AsyncLLM("## Pandas notes"))
+
+    result = asyncio.run(notes_generator.agenerate_topic_notes("pandas"))
+
+    assert result["success"] is True and result["notes"] == "## Pandas notes"
+    monkeypatch.setattr(notes_generator, "generate_topic_summary", pytest.fail)
+    assert notes_generator.generate_topic_notes("pandas")["notes"] == "## Pandas notes"
+
+
+def test_async_gemini_failures_are_not_stored(store_app, monkeypatch):
+    monkeypatch.setattr(week_summarizer, "retrieve_slides_content", lambda week, pd="vector_store": "slides")
+    monkeypatch.setattr(week_summarizer, "get_llm", lambda: AsyncLLM("", fail=True))
+
+    result = asyncio.run(week_summarizer.asummarize_week_slides(3))
+
+    assert result["summary"].startswith(week_summarizer.SUMMARY_ERROR_PREFIX)
+    assert not artifact_store.exists(*week_summarizer.get_summary_key(3, "slides"))
+
+
+def test_async_week_summary_stream(store_app, monkeypatch):
+    monkeypatch.setattr(week_summarizer, "retrieve_slides_content", lambda week, pd="vector_store": "slides")
+    monkeypatch.setattr(week_summarizer, "get_llm", lambda: AsyncLLM("# Week 4: Regression"))
+
+    async def collect():
+        return [event async for event in week_summarizer.astream_week_summary(4)]
+
+    events = asyncio.run(collect())
+
+    assert [event["event"] for event in events] == ["token"] * 4 + ["done"]
+    assert events[-1]["data"]["summary"] == "# Week 4: Regression "
+    assert asyncio.run(collect())[-1]["data"]["cached"] is True
+
+
+def test_kia_answers_are_awaited_concurrently(monkeypatch, tmp_path):
+    monkeypatch.setattr(kia_chatbot, "DB_PATH", str(tmp_path / "chat.db"))
+    monkeypatch.setattr(kia_chatbot, "get_chain", lambda: AsyncChain(delay=0.3))
+
+    async def main():
+        return await asyncio.gather(*[kia_chatbot.aget_answer(user_id, "pandas") for user_id in range(1, 51)])
+
+    started = time.perf_counter()
+    results = asyncio.run(main())
+
+    # 50 answers of 0.3 s each take well under 50 x 0.3 s when they overlap
+    assert time.perf_counter() - started < 5
+    assert all(result["success"] and result["response"] == "About pandas" for result in results)
+    assert len(kia_chatbot.load_chat_history_from_db(50).messages) == 2
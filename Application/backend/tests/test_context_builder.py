@@ -0,0 +1,60 @@
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+import context_builder
+
+TRANSCRIPT = " ".join(
+    f"Sentence {i} explains how ridge regression shrinks coefficient {i} towards zero." for i in range(60)
+)
+
+
+def split(text, source="Week_4_Lecture_1.pdf"):
+    chunks = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_text(text)
+    return [Document(page_content=chunk, metadata={"source": source}) for chunk in chunks]
+
+
+def test_overlapping_neighbours_are_merged_back_together():
+    docs = split(TRANSCRIPT)
+    shuffled = docs[1::2] + docs[::2]
+
+    merged = context_builder.merge_overlapping(shuffled)
+
+    assert len(docs) > 3
+    assert [doc.page_content for doc in merged] == [TRANSCRIPT]
+
+
+def test_chunks_from_different_sources_are_not_merged():
+    docs = split(TRANSCRIPT)[:2] + split(TRANSCRIPT, "Week_5_Lecture_1.pdf")[1:3]
+
+    assert len(context_builder.merge_overlapping(docs)) == 2
+
+
+def test_near_duplicates_are_dropped():
+    text = "A pipeline chains a StandardScaler with a LogisticRegression estimator and fits them together."
+    docs = [
+        Document(page_content=text, metadata={"source": "a.pdf"}),
+        Document(page_content=text.replace("together", "together."), metadata={"source": "b.pdf"}),
+        Document(page_content="Decision trees split on the feature with the best impurity decrease.",
+                 metadata={"source": "c.pdf"}),
+    ]
+
+    packed = context_builder.pack_documents(docs, max_tokens=None)
+
+    assert [doc.metadata["source"] for doc in packed] == ["a.pdf", "c.pdf"]
+
+
+def test_context_fits_the_token_budget_and_keeps_the_best_chunks_first():
+    docs = [Document(page_content=f"chunk {i} " + "word " * 200, metadata={"source": f"{i}.pdf"})
+            for i in range(10)]
+
+    context = context_builder.build_context(docs, max_tokens=700)
+
+    assert context_builder.estimate_tokens(context) <= 700
+    assert context.startswith("chunk 0 ")
+    assert "chunk 9 " not in context
+
+
+def test_question_budget_is_bounded():
+    assert context_builder.question_budget(1) == 1500
+    assert context_builder.question_budget(10) == 4000
+    assert context_builder.question_budget(100) == 8000
@@ -0,0 +1,116 @@
+import uuid
+
+import chromadb
+import pytest
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+import corpus_index
+
+
+class RefusingEmbeddings(Embeddings):
+    """Embeds documents but fails the test if a query is ever embedded"""
+
+    def embed_documents(self, texts):
+        return [[float(len(text)), 1.0, 0.0] for text in texts]
+
+    def embed_query(self, text):
+        raise AssertionError("exact-source lookups must not embed a query")
+
+
+@pytest.fixture
+def store(tmp_path):
+    vector_store = Chroma(
+        collection_name=f"test_{uuid.uuid4().hex}",
+        embedding_function=RefusingEmbeddings(),
+        client=chromadb.EphemeralClient()
+    )
+    # 15 transcript chunks inserted out of order, plus another lecture
+    chunks = list(range(15))
+    chunks.reverse()
+    vector_store.add_texts(
+        texts=[f"transcript part {i}" for i in chunks],
+        metadatas=[{"source": "Week_4_Lecture_1.pdf", "chunk_index": i} for i in chunks]
+    )
+    vector_store.add_texts(
+        texts=["other lecture"],
+        metadatas=[{"source": "Week_5_Lecture_1.pdf", "chunk_index": 0}]
+    )
+    return vector_store, str(tmp_path)
+
+
+def test_returns_every_chunk_in_document_order(store):
+    vector_store, persist_directory = store
+
+    docs = corpus_index.get_source_documents(vector_store, "Week_4_Lecture_1.pdf", persist_directory)
+
+    assert [doc.page_content for doc in docs] == [f"transcript part {i}" for i in range(15)]
+
+
+def test_unknown_source_returns_nothing(store):
+    vector_store, persist_directory = store
+
+    assert corpus_index.get_source_documents(vector_store, "Week_99_Lecture_1.pdf", persist_directory) == []
+
+
+def test_sources_added_after_the_index_was_built_are_found(store):
+    vector_store, persist_directory = store
+    corpus_index.build_source_index(vector_store, persist_directory)
+
+    vector_store.add_texts(texts=["late slides"], metadatas=[{"source": "MLP Week 6 Slides.pdf"}])
+    docs = corpus_index.get_source_documents(vector_store, "MLP Week 6 Slides.pdf", persist_directory)
+
+    assert [doc.page_content for doc in docs] == ["late slides"]
+    assert len(corpus_index.get_source_chunk_ids("MLP Week 6 Slides.pdf", persist_directory)) == 1
+
+
+def test_catalog_lists_sources_with_chunk_counts(store):
+    vector_store, persist_directory = store
+    vector_store.add_texts(texts=["slide 1", "slide 2"], metadatas=[{"source": "MLP Week 4 Slides.pdf"}] * 2)
+
+    lectures = corpus_index.get_catalog(vector_store, persist_directory, kind="lecture")
+    slides = corpus_index.get_catalog(vector_store, persist_directory, kind="slides")
+
+    assert [(entry["week"], entry["lecture"], entry["chunk_count"]) for entry in lectures] == [(4, 1, 15), (5, 1, 1)]
+    assert slides == [{"source": "MLP Week 4 Slides.pdf", "kind": "slides", "week": 4,
+                       "lecture": None, "chunk_count": 2}]
+
+
+def test_catalog_follows_recorded_sources(store):
+    vector_store, persist_directory = store
+    corpus_index.build_source_index(vector_store, persist_directory)
+
+    corpus_index.record_source_chunks("Week_6_Lecture_2.pdf", ["a", "b", "c"], persist_directory)
+    corpus_index.record_source_chunks("Week_5_Lecture_1.pdf", [], persist_directory)
+
+    catalog = {entry["source"]: entry["chunk_count"] for entry in corpus_index.get_catalog(vector_store, persist_directory)}
+    assert catalog == {"Week_4_Lecture_1.pdf": 15, "Week_6_Lecture_2.pdf": 3}
+
+
+def test_collection_version_changes_on_ingest_only(store):
+    vector_store, persist_directory = store
+    corpus_index.build_source_index(vector_store, persist_directory)
+    built = corpus_index.get_collection_version(persist_directory)
+
+    vector_store.add_texts(texts=["late slides"], metadatas=[{"source": "MLP Week 6 Slides.pdf"}])
+    corpus_index.get_source_documents(vector_store, "MLP Week 6 Slides.pdf", persist_directory)
+    assert corpus_index.get_collection_version(persist_directory) == built
+
+    corpus_index.record_source_chunks("Week_6_Lecture_2.pdf", ["a"], persist_directory)
+    assert corpus_index.get_collection_version(persist_directory) == built + 1
+
+
+def test_tables_are_created_once_per_index_file(tmp_path, monkeypatch):
+    created = []
+    create_schema = corpus_index._create_schema
+    monkeypatch.setattr(corpus_index, "_create_schema", lambda conn: created.append(1) or create_schema(conn))
+    persist_directory = str(tmp_path / "vector_store")
+
+    corpus_index.bump_collection_version(persist_directory)
+    assert corpus_index.get_collection_version(persist_directory) == 1
+    assert len(created) == 1
+
+    # A wiped index is created again
+    (tmp_path / "vector_store" / corpus_index.INDEX_FILENAME).unlink()
+    assert corpus_index.get_collection_version(persist_directory) == 0
+    assert len(created) == 2
@@ -0,0 +1,96 @@
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import LAST_USED_INTERVAL, EmbeddingCache, CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic fake model that counts how many texts it embedded"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return [[float(len(text)), 1.0, 0.5] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def age(cache, seconds):
+    """Move every entry's last use `seconds` into the past"""
+    conn = cache._connection()
+    conn.execute("UPDATE embeddings SET last_used = last_used - ?", (seconds,))
+    conn.commit()
+
+
+def last_used(cache):
+    return cache._connection().execute("SELECT last_used FROM embeddings").fetchone()[0]
+
+
+@pytest.fixture
+def cached(tmp_path):
+    model = CountingEmbeddings()
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"), max_entries=10)
+    return model, cache, CachedEmbeddings(model, "test-model", cache)
+
+
+def test_repeated_query_skips_the_model(cached):
+    model, cache, embeddings = cached
+
+    first = embeddings.embed_query("Weeks 1-4")
+    second = embeddings.embed_query("Weeks 1-4")
+
+    assert first == second
+    assert model.calls == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_documents_only_embed_missing_texts(cached):
+    model, _, embeddings = cached
+
+    embeddings.embed_documents(["linear regression", "ridge"])
+    vectors = embeddings.embed_documents(["ridge", "lasso", "lasso"])
+
+    assert model.calls == 3  # "lasso" is embedded once even though it appears twice
+    assert vectors[1] == vectors[2]
+
+
+def test_cache_is_shared_between_instances(cached, tmp_path):
+    model, cache, embeddings = cached
+    embeddings.embed_documents(["ColumnTransformer"])
+
+    other = CachedEmbeddings(model, "test-model", EmbeddingCache(cache.path))
+    other.embed_documents(["ColumnTransformer"])
+
+    assert model.calls == 1
+
+
+def test_least_recently_used_entries_are_evicted(cached):
+    _, cache, embeddings = cached
+    embeddings.embed_documents([f"text {i}" for i in range(10)])
+    age(cache, LAST_USED_INTERVAL + 1)
+    embeddings.embed_documents(["text 0"])  # touch the oldest entry
+    embeddings.embed_documents([f"new {i}" for i in range(5)])
+
+    cache.evict()
+
+    old_batch = cache.get_many("test-model", [f"text {i}" for i in range(1, 10)])
+    assert cache.stats()["entries"] <= cache.max_entries
+    assert cache.get_many("test-model", ["text 0"])[0] is not None
+    assert sum(vector is None for vector in old_batch) == 6
+
+
+def test_recent_hits_do_not_write(cached):
+    _, cache, embeddings = cached
+    embeddings.embed_documents(["ridge"])
+    age(cache, LAST_USED_INTERVAL - 60)
+    recent = last_used(cache)
+
+    embeddings.embed_documents(["ridge"])
+    assert last_used(cache) == recent
+
+    age(cache, 120)
+    embeddings.embed_documents(["ridge"])
+    assert last_used(cache) > recent
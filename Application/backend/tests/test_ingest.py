@@ -0,0 +1,155 @@
+import os
+import shutil
+import uuid
+
+import chromadb
+import pytest
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+import ai_runtime
+import corpus_index
+import ingest
+import topic_specfic_mock
+
+
+class LengthEmbeddings(Embeddings):
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(len(texts))
+        return [[float(len(text)), 1.0, 0.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0, 0.0]
+
+
+@pytest.fixture
+def store(tmp_path):
+    embeddings = LengthEmbeddings()
+    vector_store = Chroma(
+        collection_name=f"test_{uuid.uuid4().hex}",
+        embedding_function=embeddings,
+        client=chromadb.EphemeralClient()
+    )
+    return vector_store, embeddings, str(tmp_path)
+
+
+def parsed_source(source, text):
+    return {
+        "source": source,
+        "content_hash": ingest.content_hash(text.encode()),
+        "chunks": [(chunk, ingest.chunk_metadata(source, i)) for i, (chunk, _) in enumerate(ingest.split_text(text))]
+    }
+
+
+LECTURE = " ".join(f"Sentence {i} of the lecture on gradient descent." for i in range(200))
+
+
+def test_chunks_get_their_own_metadata_and_are_indexed(store):
+    vector_store, embeddings, persist_directory = store
+
+    written = ingest.embed_and_write(vector_store, embeddings, [parsed_source("Week_3_Lecture_2.pdf", LECTURE)],
+                                     persist_directory, batch_size=4)
+
+    results = vector_store.get(include=["metadatas"])
+    assert written == len(results["ids"]) > 4
+    assert max(embeddings.batches) == 4
+    assert sorted(meta["chunk_index"] for meta in results["metadatas"]) == list(range(written))
+    assert all(meta["week"] == "3" and meta["lecture"] == 2 and meta["kind"] == "lecture"
+               for meta in results["metadatas"])
+    assert len(corpus_index.get_source_chunk_ids("Week_3_Lecture_2.pdf", persist_directory)) == written
+
+
+def test_reingesting_a_source_replaces_its_chunks(store):
+    vector_store, embeddings, persist_directory = store
+    ingest.embed_and_write(vector_store, embeddings, [parsed_source("Week_3_Lecture_2.pdf", LECTURE)],
+                           persist_directory, batch_size=64)
+    version = corpus_index.get_collection_version(persist_directory)
+
+    ingest.embed_and_write(vector_store, embeddings, [parsed_source("Week_3_Lecture_2.pdf", "Short transcript.")],
+                           persist_directory, batch_size=64)
+
+    assert vector_store.get()["documents"] == ["Short transcript."]
+    assert corpus_index.get_collection_version(persist_directory) > version
+    assert corpus_index.get_ingested_hash("Week_3_Lecture_2.pdf", persist_directory) == \
+        ingest.content_hash(b"Short transcript.")
+
+
+def test_add_documents_keeps_each_documents_metadata(store, monkeypatch):
+    vector_store, embeddings, _ = store
+    monkeypatch.setattr(topic_specfic_mock, "get_ingest_vectorstore", lambda: vector_store)
+    monkeypatch.setattr(topic_specfic_mock, "get_embeddings", lambda: embeddings)
+    monkeypatch.chdir(store[2])
+
+    result = topic_specfic_mock.add_documents(
+        [LECTURE, "A short note on pipelines."],
+        [{"source": "MLP Week 2 Slides.pdf"}, {"source": "notes.txt", "author": "ta"}]
+    )
+
+    metadatas = vector_store.get(include=["metadatas"])["metadatas"]
+    assert result["chunks"] == len(metadatas)
+    assert sum(meta["source"] == "notes.txt" for meta in metadatas) == 1
+    assert all(meta["week"] == "2" for meta in metadatas if meta["source"] == "MLP Week 2 Slides.pdf")
+    assert [meta["author"] for meta in metadatas if meta["source"] == "notes.txt"] == ["ta"]
+
+
+def test_unchanged_pdfs_are_skipped(store, monkeypatch):
+    pytest.importorskip("pypdf")
+    vector_store, embeddings, persist_directory = store
+    monkeypatch.setattr(ai_runtime, "get_vector_store", lambda *args, **kwargs: vector_store)
+    monkeypatch.setattr(ai_runtime, "get_embeddings", lambda *args, **kwargs: embeddings)
+    pdf = os.path.join(persist_directory, "Week_1_Lecture_1.pdf")
+    shutil.copy(os.path.join(os.path.dirname(os.path.dirname(__file__)), "test.pdf"), pdf)
+
+    first = ingest.ingest_pdfs([persist_directory], persist_directory, workers=1)
+    second = ingest.ingest_pdfs([persist_directory], persist_directory, workers=1)
+
+    assert first["ingested"] == 1 and first["chunks"] > 0
+    assert second["ingested"] == 0 and second["skipped"] == 1
+
+
+def test_add_documents_keeps_every_document_of_a_source(store, monkeypatch):
+    vector_store, embeddings, _ = store
+    monkeypatch.setattr(topic_specfic_mock, "get_ingest_vectorstore", lambda: vector_store)
+    monkeypatch.setattr(topic_specfic_mock, "get_embeddings", lambda: embeddings)
+    monkeypatch.chdir(store[2])
+
+    result = topic_specfic_mock.add_documents(
+        ["Page one on pipelines.", "Page two on column transformers."],
+        [{"source": "notes.pdf", "page": 1}, {"source": "notes.pdf", "page": 2}]
+    )
+    topic_specfic_mock.add_documents(["An untitled note on pandas."])
+    topic_specfic_mock.add_documents(["Another untitled note on numpy."])
+
+    stored = vector_store.get(include=["documents", "metadatas"])
+    notes = sorted((meta["chunk_index"], meta["page"], text)
+                   for text, meta in zip(stored["documents"], stored["metadatas"]) if meta["source"] == "notes.pdf")
+    assert result["chunks"] == 2
+    assert notes == [(0, 1, "Page one on pipelines."), (1, 2, "Page two on column transformers.")]
+    # Documents without a source don't overwrite one another
+    assert len(stored["ids"]) == 4
+
+
+def test_same_named_pdfs_in_different_folders_are_separate_sources(tmp_path):
+    for folder in ("week1", "week2"):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / "notes.pdf").write_bytes(b"%PDF")
+    (tmp_path / "week2" / "Week_2_Lecture_1.pdf").write_bytes(b"%PDF")
+
+    found = ingest.find_pdfs([str(tmp_path)])
+
+    assert [source for _, source in found] == ["week1/notes.pdf", "week2/Week_2_Lecture_1.pdf", "week2/notes.pdf"]
+    assert corpus_index.parse_source("week2/Week_2_Lecture_1.pdf")["lecture"] == 1
+    assert ingest.find_pdfs([str(tmp_path / "week1" / "notes.pdf")])[0][1] == "notes.pdf"
+
+
+def test_lectures_ingested_from_a_subfolder_are_found_by_filename(store):
+    vector_store, embeddings, persist_directory = store
+    ingest.embed_and_write(vector_store, embeddings, [parsed_source("week3/Week_3_Lecture_2.pdf", LECTURE)],
+                           persist_directory, batch_size=64)
+
+    docs = corpus_index.get_source_documents(vector_store, "Week_3_Lecture_2.pdf", persist_directory)
+
+    assert docs and all(doc.metadata["source"] == "week3/Week_3_Lecture_2.pdf" for doc in docs)
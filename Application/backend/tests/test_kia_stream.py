@@ -0,0 +1,60 @@
+import pytest
+
+import kia_chatbot
+
+
+class FakeChain:
+    """Mimics the retrieval chain's stream: input/context chunks first, then the answer in pieces"""
+
+    def __init__(self, answer_chunks, fail_after=None):
+        self.answer_chunks = answer_chunks
+        self.fail_after = fail_after
+
+    def stream(self, inputs, config=None):
+        yield {"input": inputs["input"]}
+        yield {"context": []}
+        for i, chunk in enumerate(self.answer_chunks):
+            if self.fail_after is not None and i == self.fail_after:
+                raise RuntimeError("stream interrupted")
+            yield {"answer": chunk}
+
+
+@pytest.fixture
+def chat_db(monkeypatch, tmp_path):
+    monkeypatch.setattr(kia_chatbot, "DB_PATH", str(tmp_path / "chat.db"))
+
+
+def test_tokens_are_forwarded_and_the_turn_is_saved(chat_db, monkeypatch):
+    monkeypatch.setattr(kia_chatbot, "get_chain", lambda: FakeChain(["Pandas ", "is covered ", "in Week 1."]))
+
+    events = list(kia_chatbot.stream_answer(7, "Where is pandas covered?"))
+
+    assert [event["event"] for event in events] == ["token", "token", "token", "done"]
+    done = events[-1]["data"]
+    assert done["success"] is True
+    assert done["response"] == "Pandas is covered in Week 1."
+    assert done["ttft_ms"] is not None and done["ttft_ms"] <= done["total_ms"]
+
+    history = kia_chatbot.load_chat_history_from_db(7).messages
+    assert [message.content for message in history] == ["Where is pandas covered?", "Pandas is covered in Week 1."]
+
+
+def test_failure_ends_with_an_error_event_and_saves_nothing(chat_db, monkeypatch):
+    monkeypatch.setattr(kia_chatbot, "get_chain", lambda: FakeChain(["Partial ", "answer"], fail_after=1))
+
+    events = list(kia_chatbot.stream_answer(7, "hello"))
+
+    assert [event["event"] for event in events] == ["token", "error"]
+    assert events[-1]["data"]["success"] is False
+    assert events[-1]["data"]["response"] == kia_chatbot.FALLBACK_RESPONSE
+    assert kia_chatbot.load_chat_history_from_db(7).messages == []
+
+
+def test_disconnected_client_does_not_save_a_partial_turn(chat_db, monkeypatch):
+    monkeypatch.setattr(kia_chatbot, "get_chain", lambda: FakeChain(["one ", "two ", "three"]))
+
+    stream = kia_chatbot.stream_answer(7, "count")
+    next(stream)
+    stream.close()
+
+    assert kia_chatbot.load_chat_history_from_db(7).messages == []
@@ -0,0 +1,38 @@
+from lexical_index import LexicalIndex, tokenize
+
+CHUNKS = [
+    ("c1", "SGDRegressor fits a linear model with stochastic gradient descent", {"source": "Week_5_Lecture_1.pdf"}),
+    ("c2", "RidgeClassifier converts targets to -1 and 1 and uses ridge regression", {"source": "Week_6_Lecture_2.pdf"}),
+    ("c3", "A ColumnTransformer applies different transformers to different columns", {"source": "Week_3_Lecture_4.pdf"}),
+    ("c4", "Linear regression minimises the squared error of a linear model", {"source": "Week_5_Lecture_1.pdf"}),
+]
+
+
+def build_index():
+    ids, texts, metadatas = zip(*CHUNKS)
+    return LexicalIndex(list(ids), list(texts), list(metadatas))
+
+
+def test_tokenize_splits_identifiers_and_drops_stopwords():
+    terms = tokenize("What is the SGDRegressor?")
+
+    assert "sgdregressor" in terms
+    assert "regressor" in terms
+    assert "what" not in terms and "the" not in terms
+
+
+def test_exact_identifier_ranks_first():
+    results = build_index().search("RidgeClassifier", k=2)
+
+    assert results[0][0].id == "c2"
+    assert results[0][1] > 0
+
+
+def test_filter_restricts_results():
+    results = build_index().search("linear model", k=4, filter={"source": "Week_5_Lecture_1.pdf"})
+
+    assert {doc.id for doc, _ in results} == {"c1", "c4"}
+
+
+def test_unknown_terms_return_nothing():
+    assert build_index().search("attention heads") == []
@@ -0,0 +1,257 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+import artifact_store
+import llm_limiter
+from extension import db
+from llm_guard import CircuitBreaker, CircuitOpenError, GuardedLLM, LLMDeadlineExceeded, LLMGuard
+
+
+class ServiceUnavailable(Exception):
+    """Stands in for google.api_core.exceptions.ServiceUnavailable"""
+
+
+def flaky(failures, answer="Lecture 4.2"):
+    calls = []
+
+    def call(prompt):
+        calls.append(time.monotonic())
+        if len(calls) <= failures:
+            raise ServiceUnavailable("503 overloaded")
+        return answer
+
+    return RunnableLambda(call), calls
+
+
+def test_slow_calls_are_abandoned_at_the_deadline():
+    guard = LLMGuard()
+    slow = RunnableLambda(lambda prompt: time.sleep(2) or "late")
+
+    started = time.monotonic()
+    with pytest.raises(LLMDeadlineExceeded):
+        guard.invoke(slow, "What is RMSE?", deadline_seconds=0.2)
+
+    assert time.monotonic() - started < 1
+    assert guard.stats()["timeouts"] == 1
+
+
+def test_transient_failures_are_retried_with_backoff():
+    guard = LLMGuard(max_attempts=3, base_backoff=0.05)
+    llm, calls = flaky(failures=2)
+
+    assert guard.invoke(llm, "What is RMSE?", deadline_seconds=5) == "Lecture 4.2"
+    assert len(calls) == 3
+    assert guard.stats()["retries"] == 2
+    assert guard.breaker.state == "closed" and guard.breaker.failures == 0
+
+
+def test_other_errors_are_not_retried_and_leave_the_circuit_closed():
+    guard = LLMGuard(CircuitBreaker(failure_threshold=1))
+    calls = []
+
+    def invalid(prompt):
+        calls.append(1)
+        raise ValueError("400 invalid argument")
+
+    with pytest.raises(ValueError):
+        guard.invoke(RunnableLambda(invalid), "What is RMSE?")
+
+    assert len(calls) == 1
+    assert guard.breaker.state == "closed"
+
+
+def test_open_circuit_fails_fast_then_lets_one_trial_call_through():
+    guard = LLMGuard(CircuitBreaker(failure_threshold=2, reset_seconds=0.2), max_attempts=1)
+    llm, calls = flaky(failures=2)
+    for _ in range(2):
+        with pytest.raises(ServiceUnavailable):
+            guard.invoke(llm, "What is RMSE?")
+
+    started = time.monotonic()
+    with pytest.raises(CircuitOpenError):
+        guard.invoke(llm, "What is RMSE?")
+    assert time.monotonic() - started < 0.05
+    assert len(calls) == 2
+
+    time.sleep(0.25)
+    # Half-open: the trial call succeeds and closes the circuit
+    assert guard.invoke(llm, "What is RMSE?") == "Lecture 4.2"
+    assert guard.stats()["breaker"] == {"state": "closed", "failures": 0, "times_opened": 1, "rejected": 1}
+
+
+def test_failed_trial_call_reopens_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.1)
+    breaker.before_call()
+    breaker.record_failure()
+    time.sleep(0.15)
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        # Only one trial call at a time
+        breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_rate_limiter_wait_is_capped_by_the_call_deadline():
+    limiter = llm_limiter.LLMLimiter(requests_per_minute=1, tokens_per_minute=0, max_wait={"batch": 60})
+    limiter.acquire(1)
+    guard = LLMGuard()
+
+    started = time.monotonic()
+    with pytest.raises(llm_limiter.RateLimitExceeded):
+        guard.invoke(RunnableLambda(lambda prompt: limiter.acquire(1, "batch", llm_limiter.CALL_DEADLINE.get())),
+                     "What is RMSE?", deadline_seconds=0.5)
+
+    assert time.monotonic() - started < 0.5
+
+
+def test_guarded_chat_model_in_a_chain():
+    guard = LLMGuard()
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content="See Lecture 4.2")] * 3))
+    chain = ChatPromptTemplate.from_template("{question}") | GuardedLLM(llm, guard, deadline_seconds=5)
+
+    assert chain.invoke({"question": "What is RMSE?"}).content == "See Lecture 4.2"
+    assert asyncio.run(chain.ainvoke({"question": "What is RMSE?"})).content == "See Lecture 4.2"
+    assert "".join(chunk.content for chunk in chain.stream({"question": "What is RMSE?"})) == "See Lecture 4.2"
+
+
+def test_async_calls_are_retried_within_the_deadline():
+    guard = LLMGuard(base_backoff=0.01)
+
+    class Flaky:
+        calls = 0
+
+        async def ainvoke(self, prompt, config=None):
+            self.calls += 1
+            if self.calls == 1:
+                raise ServiceUnavailable("503 overloaded")
+            await asyncio.sleep(5 if self.calls == 2 else 0)
+            return "Lecture 4.2"
+
+    with pytest.raises(LLMDeadlineExceeded):
+        asyncio.run(guard.ainvoke(Flaky(), "What is RMSE?", deadline_seconds=0.3))
+
+
+def test_failed_generation_serves_the_last_stored_version(store_app):
+    artifact_store.put("week_summary", {"week": 2}, "hash", "1", {"success": True, "summary": "# Week 2"})
+    artifact = artifact_store.AIArtifact.query.one()
+    artifact.expires_at = artifact.created_at
+    db.session.commit()
+
+    result = artifact_store.get_or_create("week_summary", {"week": 2}, "hash", "1",
+                                          lambda: {"success": False, "summary": "Error generating summary"})
+
+    assert result == {"success": True, "summary": "# Week 2", "stale": True}
+    # A failure with nothing stored is returned as is
+    assert artifact_store.get_or_create("week_summary", {"week": 3}, "hash", "1",
+                                        lambda: {"success": False})["success"] is False
+
+
+def test_requests_get_the_time_left_as_their_client_timeout():
+    class Model:
+        timeouts = []
+
+        def invoke(self, prompt, config=None, timeout=None):
+            self.timeouts.append(timeout)
+            return "Lecture 4.2"
+
+    model = Model()
+    GuardedLLM(model, LLMGuard(), deadline_seconds=5, request_timeout=True).invoke("What is RMSE?")
+    GuardedLLM(model, LLMGuard(), deadline_seconds=5).invoke("What is RMSE?")
+
+    assert 4 < model.timeouts[0] <= 5
+    assert model.timeouts[1] is None
+
+
+def test_gemini_client_leaves_retries_to_the_guard(monkeypatch):
+    chat_models = pytest.importorskip("langchain_google_genai.chat_models")
+    import ai_runtime
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    monkeypatch.setattr(ai_runtime, "_llm", None)
+    monkeypatch.setattr(ai_runtime, "_llm_bindings", {})
+    monkeypatch.setattr(ai_runtime, "_owners", {})
+    retry_decorator = chat_models._create_retry_decorator
+
+    ai_runtime.get_llm(owner="kia_chatbot")
+
+    assert ai_runtime._llm.max_retries == 0
+    # Configured through the client's settings, not by patching the library
+    assert chat_models._create_retry_decorator is retry_decorator
+
+
+def test_modules_and_generation_configs_share_one_gemini_client(monkeypatch):
+    pytest.importorskip("langchain_google_genai")
+    import ai_runtime
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    monkeypatch.setattr(ai_runtime, "_llm", None)
+    monkeypatch.setattr(ai_runtime, "_llm_bindings", {})
+    monkeypatch.setattr(ai_runtime, "_owners", {})
+
+    kia = ai_runtime.get_llm(owner="kia_chatbot")
+    quiz = ai_runtime.get_llm(owner="quiz_mock", temperature=0.2)
+    creative = ai_runtime.get_llm(owner="quiz_mock", temperature=0.9)
+
+    assert ai_runtime.get_llm(owner="kia_chatbot") is kia
+    assert len({id(kia), id(quiz), id(creative)}) == 3
+    guarded = [binding.bound for binding in (kia, quiz, creative)]
+    assert all(isinstance(llm, GuardedLLM) and llm.request_timeout for llm in guarded)
+    assert guarded[1].llm.bound is guarded[2].llm.bound is guarded[0].llm
+
+
+def test_open_circuit_serves_the_last_stored_version(store_app):
+    artifact_store.put("mcq", {"quiz_type": "quiz1"}, "old-hash", "1", {"success": True, "questions": ["Q1"]})
+
+    def circuit_open():
+        raise CircuitOpenError("Gemini circuit is open")
+
+    async def acircuit_open():
+        circuit_open()
+
+    def invalid():
+        raise ValueError("400 invalid argument")
+
+    expected = {"success": True, "questions": ["Q1"], "stale": True}
+    assert artifact_store.get_or_create("mcq", {"quiz_type": "quiz1"}, "new-hash", "1", circuit_open) == expected
+    assert asyncio.run(artifact_store.aget_or_create("mcq", {"quiz_type": "quiz1"}, "new-hash", "1",
+                                                     acircuit_open)) == expected
+    # Other errors, or nothing stored, still propagate
+    with pytest.raises(ValueError):
+        artifact_store.get_or_create("mcq", {"quiz_type": "quiz1"}, "new-hash", "1", invalid)
+    with pytest.raises(CircuitOpenError):
+        artifact_store.get_or_create("mcq", {"quiz_type": "quiz2"}, "new-hash", "1", circuit_open)
+
+
+def test_stream_that_hits_its_deadline_serves_the_last_stored_version(store_app):
+    artifact_store.put("notes", {"topic": "pandas"}, "old-hash", "1", {"success": True, "notes": "# Pandas"})
+
+    def timed_out():
+        raise LLMDeadlineExceeded("deadline of 60s exceeded")
+        yield
+
+    async def atimed_out():
+        raise LLMDeadlineExceeded("deadline of 60s exceeded")
+        yield
+
+    async def collect(events):
+        return [event async for event in events]
+
+    make_result = lambda notes: {"success": True, "notes": notes}
+    for events in (
+        list(artifact_store.stream_or_create("notes", {"topic": "pandas"}, "new-hash", "1", timed_out,
+                                             make_result, "notes")),
+        asyncio.run(collect(artifact_store.astream_or_create("notes", {"topic": "pandas"}, "new-hash", "1",
+                                                             atimed_out, make_result, "notes"))),
+    ):
+        assert [event["event"] for event in events] == ["token", "done"]
+        assert events[0]["data"]["text"] == "# Pandas"
+        assert events[1]["data"]["stale"] is True
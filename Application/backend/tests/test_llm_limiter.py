@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from llm_limiter import LimiterCallback, LLMLimiter, RateLimitExceeded
+
+
+def drain(limiter, calls):
+    for _ in range(calls):
+        limiter.acquire(1)
+
+
+def start_waiting(limiter, priority, admitted):
+    def run():
+        limiter.acquire(1, priority)
+        admitted.append(priority)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_calls_beyond_the_requests_limit_are_rejected_fast():
+    limiter = LLMLimiter(requests_per_minute=2, tokens_per_minute=0, max_wait={"batch": 1})
+    drain(limiter, 2)
+
+    started = time.monotonic()
+    with pytest.raises(RateLimitExceeded):
+        # The next request is 30 s away, longer than the call may wait
+        limiter.acquire(1)
+
+    assert time.monotonic() - started < 0.5
+    assert limiter.stats()["classes"]["batch"]["rejected"] == 1
+
+
+def test_interactive_calls_are_admitted_before_queued_batch_calls():
+    # 600 per minute: one request every 0.1 s once the bucket is empty
+    limiter = LLMLimiter(requests_per_minute=600, tokens_per_minute=0)
+    drain(limiter, 600)
+    admitted = []
+
+    batch = start_waiting(limiter, "batch", admitted)
+    time.sleep(0.02)
+    interactive = start_waiting(limiter, "interactive", admitted)
+    batch.join(5)
+    interactive.join(5)
+
+    assert admitted == ["interactive", "batch"]
+    assert limiter.stats()["classes"]["batch"]["max_wait_ms"] >= 150
+
+
+def test_full_queue_rejects_immediately():
+    limiter = LLMLimiter(requests_per_minute=60, tokens_per_minute=0, max_queue=1, max_wait={"batch": 5})
+    drain(limiter, 60)
+    waiting = start_waiting(limiter, "batch", [])
+    time.sleep(0.05)
+
+    with pytest.raises(RateLimitExceeded, match="already waiting"):
+        limiter.acquire(1)
+
+    waiting.join(5)
+
+
+def test_token_estimates_are_corrected_by_actual_usage():
+    limiter = LLMLimiter(requests_per_minute=0, tokens_per_minute=1000, max_wait={"batch": 0.1})
+    limiter.acquire(800)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(800)
+
+    # The first call only used 100 tokens
+    limiter.settle(800, 100)
+
+    limiter.acquire(800)
+    assert limiter.stats()["tokens_used"] == 900
+
+
+def test_shared_state_limits_every_worker(tmp_path):
+    path = str(tmp_path / "llm_limiter.db")
+    first = LLMLimiter(requests_per_minute=2, tokens_per_minute=0, max_wait={"batch": 0.1}, state_path=path)
+    second = LLMLimiter(requests_per_minute=2, tokens_per_minute=0, max_wait={"batch": 0.1}, state_path=path)
+
+    first.acquire(1)
+    second.acquire(1)
+
+    with pytest.raises(RateLimitExceeded):
+        first.acquire(1)
+
+
+def test_callback_limits_chat_model_calls_by_their_priority():
+    limiter = LLMLimiter(requests_per_minute=1, tokens_per_minute=0, max_wait={"interactive": 0.1})
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content="Lecture 4.2")] * 2),
+                               callbacks=[LimiterCallback(limiter)])
+    chat = llm.with_config(metadata={"llm_priority": "interactive"})
+
+    assert chat.invoke("What is RMSE?").content == "Lecture 4.2"
+    with pytest.raises(RateLimitExceeded):
+        chat.invoke("And MAE?")
+
+    assert limiter.stats()["classes"]["interactive"] == {
+        "queued": 0, "admitted": 1, "rejected": 1, "avg_wait_ms": 0.0, "max_wait_ms": 0.0
+    }
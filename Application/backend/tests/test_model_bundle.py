@@ -0,0 +1,65 @@
+import os
+import sys
+
+import pytest
+
+import model_bundle
+
+
+@pytest.fixture
+def bundle(tmp_path):
+    (tmp_path / "config.json").write_text('{"hidden_size": 384}')
+    (tmp_path / "1_Pooling").mkdir()
+    (tmp_path / "1_Pooling" / "config.json").write_text('{"pooling_mode_mean_tokens": true}')
+    (tmp_path / "model.safetensors").write_bytes(b"\x00" * 64)
+    # Hub download metadata is not part of the bundle
+    (tmp_path / ".cache").mkdir()
+    (tmp_path / ".cache" / "model.safetensors.metadata").write_text("etag")
+    model_bundle.write_manifest(str(tmp_path), "sentence-transformers/all-MiniLM-L6-v2", "abc123")
+    return tmp_path
+
+
+def test_manifest_lists_every_model_file(bundle):
+    manifest = model_bundle.read_manifest(str(bundle))
+
+    assert sorted(manifest["files"]) == ["1_Pooling/config.json", "config.json", "model.safetensors"]
+    assert manifest["files"]["model.safetensors"]["size"] == 64
+    assert model_bundle.is_bundle(str(bundle))
+    assert model_bundle.verify(str(bundle)) == []
+
+
+def test_verify_reports_missing_and_modified_files(bundle):
+    (bundle / "config.json").unlink()
+    (bundle / "model.safetensors").write_bytes(b"\x01" * 64)
+
+    problems = model_bundle.verify(str(bundle))
+
+    assert "missing: config.json" in problems
+    assert "checksum mismatch: model.safetensors" in problems
+    # The quick startup check only compares sizes
+    assert model_bundle.verify(str(bundle), full=False) == ["missing: config.json"]
+
+
+def test_damaged_bundle_is_not_loaded(bundle):
+    (bundle / "model.safetensors").write_bytes(b"\x00" * 10)
+
+    with pytest.raises(RuntimeError, match="size mismatch: model.safetensors"):
+        model_bundle.load_embeddings(str(bundle))
+
+
+def test_directory_without_manifest_is_not_a_bundle(tmp_path):
+    assert not model_bundle.is_bundle(str(tmp_path))
+    assert model_bundle.verify(str(tmp_path))[0].startswith("unreadable manifest")
+
+
+def test_offline_mode_sets_the_hub_variables(monkeypatch):
+    # setenv/setattr first so monkeypatch restores the original state afterwards
+    for name in model_bundle.OFFLINE_VARIABLES:
+        monkeypatch.setenv(name, "0")
+    if "huggingface_hub.constants" in sys.modules:
+        monkeypatch.setattr(sys.modules["huggingface_hub.constants"], "HF_HUB_OFFLINE", False)
+
+    model_bundle.enable_offline_mode()
+
+    assert os.environ["HF_HUB_OFFLINE"] == "1"
+    assert os.environ["TRANSFORMERS_OFFLINE"] == "1"
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import uuid
+
+import chromadb
+import numpy as np
+import pytest
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+import numpy_store as numpy_store_module
+from numpy_store import NumpyVectorStore, matches_where
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic pseudo-random unit vectors"""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        seed = int(hashlib.sha256(text.encode()).hexdigest()[:8], 16)
+        vector = np.random.default_rng(seed).normal(size=16)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+
+@pytest.fixture
+def stores(tmp_path):
+    chroma = Chroma(
+        collection_name=f"test_{uuid.uuid4().hex}",
+        embedding_function=HashEmbeddings(),
+        client=chromadb.EphemeralClient()
+    )
+    texts = [f"chunk {i} about topic {i % 7}" for i in range(60)]
+    metadatas = [{"source": f"Week_{i % 4 + 1}_Lecture_1.pdf", "week": str(i % 4 + 1)} for i in range(60)]
+    chroma.add_texts(texts, metadatas=metadatas)
+    return chroma, NumpyVectorStore.from_chroma(chroma, str(tmp_path / "numpy_store"))
+
+
+def test_results_match_chroma(stores):
+    chroma, numpy_store = stores
+
+    for query in ["linear regression", "decision trees", "pipelines"]:
+        expected = [doc.page_content for doc in chroma.similarity_search(query, k=5)]
+        assert [doc.page_content for doc in numpy_store.similarity_search(query, k=5)] == expected
+
+
+def test_filter_matches_chroma(stores):
+    chroma, numpy_store = stores
+    where = {"$and": [{"week": {"$in": ["1", "2"]}}, {"source": {"$ne": "Week_2_Lecture_1.pdf"}}]}
+
+    expected = [doc.page_content for doc in chroma.similarity_search("regression", k=4, filter=where)]
+    results = numpy_store.similarity_search("regression", k=4, filter=where)
+
+    assert [doc.page_content for doc in results] == expected
+    assert all(doc.metadata["week"] == "1" for doc in results)
+
+
+def test_store_reloads_from_disk(stores):
+    _, numpy_store = stores
+
+    reloaded = NumpyVectorStore(HashEmbeddings(), numpy_store.directory)
+
+    assert isinstance(reloaded.matrix, np.memmap)
+    assert reloaded.count() == 60
+    assert reloaded.similarity_search("topic 3", k=3) == numpy_store.similarity_search("topic 3", k=3)
+
+
+def test_writes_stay_in_memory_until_flush(stores):
+    _, numpy_store = stores
+    embeddings = HashEmbeddings()
+    files = sorted(os.listdir(numpy_store.directory))
+    saved = os.path.getmtime(os.path.join(numpy_store.directory, "records.json"))
+
+    numpy_store.add_texts(["a new chunk"], [{"week": "9"}], ids=["new"])
+    numpy_store.delete(ids=["new"])
+    numpy_store.add_embeddings(["other"], ["another chunk"], embeddings.embed_documents(["another chunk"]))
+
+    assert numpy_store.count() == 61
+    assert NumpyVectorStore(embeddings, numpy_store.directory).count() == 60
+    assert os.path.getmtime(os.path.join(numpy_store.directory, "records.json")) == saved
+
+    numpy_store.flush()
+
+    assert NumpyVectorStore(embeddings, numpy_store.directory).get(ids=["other"])["documents"] == ["another chunk"]
+    # Temporary files were renamed into place, none are left behind
+    assert sorted(os.listdir(numpy_store.directory)) == files
+
+
+def test_refresh_builds_only_a_stale_export(tmp_path, monkeypatch):
+    exports = []
+    monkeypatch.setattr(numpy_store_module, "_export", exports.append)
+    (tmp_path / "chroma.sqlite3").write_bytes(b"")
+
+    assert numpy_store_module.refresh(str(tmp_path))
+    assert (tmp_path / "numpy_store.lock").exists()
+
+    store_directory = tmp_path / "numpy_store"
+    store_directory.mkdir()
+    (store_directory / "records.json").write_text("{}")
+    os.utime(tmp_path / "chroma.sqlite3", (0, 0))
+
+    assert not numpy_store_module.refresh(str(tmp_path))
+    assert exports == [str(tmp_path)]
+
+
+def test_collection_api_shapes(stores):
+    _, numpy_store = stores
+
+    results = numpy_store.query(query_embeddings=HashEmbeddings().embed_documents(["a", "b"]), n_results=3,
+                                where={"week": "3"})
+
+    assert len(results["ids"]) == 2
+    assert all(len(ids) == 3 for ids in results["ids"])
+    assert results["distances"][0] == sorted(results["distances"][0])
+    assert len(numpy_store.get(where={"week": "3"})["ids"]) == 15
+
+
+def test_matches_where_operators():
+    metadata = {"week": 3, "source": "Week_3_Lecture_2.pdf"}
+
+    assert matches_where(metadata, {"week": {"$gte": 3}})
+    assert not matches_where(metadata, {"$or": [{"week": 1}, {"source": "x.pdf"}]})
@@ -0,0 +1,111 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+import ai_runtime
+from onnx_embeddings import (MANIFEST_FILENAME, MODEL_FILENAME, PARITY_MIN_COSINE, PARITY_SENTENCES,
+                             TOKENIZER_FILENAME, OnnxEmbeddings, parity_check, read_manifest)
+
+VOCABULARY = {"[PAD]": 0, "[UNK]": 1, "pipeline": 2, "scaler": 3, "tree": 4}
+# Token embeddings of the tiny model; padding gets a huge vector so pooling it in would show
+TOKEN_EMBEDDINGS = np.asarray([[100.0, 100.0, 100.0], [0.0, 0.0, 1.0], [3.0, 0.0, 0.0],
+                               [0.0, 4.0, 0.0], [1.0, 1.0, 0.0]], dtype=np.float32)
+
+
+class SeededEmbeddings(Embeddings):
+    """Fixed random vector per text, optionally perturbed by noise"""
+
+    def __init__(self, noise: float = 0.0):
+        self.noise = noise
+
+    def embed_documents(self, texts):
+        vectors = []
+        for i, text in enumerate(texts):
+            vector = np.random.default_rng(len(text) * 7919 + i).normal(size=32)
+            vector += np.random.default_rng(1000 + i).normal(scale=self.noise, size=32)
+            vectors.append(vector.tolist())
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture
+def tiny_model_dir(tmp_path):
+    """A model directory holding a word-level tokenizer and a one-node graph (token id -> embedding row)"""
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper, numpy_helper
+    from tokenizers import Tokenizer, models, pre_tokenizers
+
+    tokenizer = Tokenizer(models.WordLevel(VOCABULARY, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.save(str(tmp_path / TOKENIZER_FILENAME))
+
+    graph = helper.make_graph(
+        [helper.make_node("Gather", ["table", "input_ids"], ["token_embeddings"])],
+        "tiny",
+        [helper.make_tensor_value_info(name, TensorProto.INT64, [None, None])
+         for name in ("input_ids", "attention_mask", "token_type_ids")],
+        [helper.make_tensor_value_info("token_embeddings", TensorProto.FLOAT, [None, None, 3])],
+        [numpy_helper.from_array(TOKEN_EMBEDDINGS, "table")]
+    )
+    onnx.save(helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)]), str(tmp_path / MODEL_FILENAME))
+
+    with open(tmp_path / MANIFEST_FILENAME, "w") as f:
+        json.dump({"max_sequence_length": 4, "quantization": "none"}, f)
+    return str(tmp_path)
+
+
+def test_embeddings_mean_pool_real_tokens_and_normalize(tiny_model_dir):
+    embeddings = OnnxEmbeddings(tiny_model_dir, batch_size=2)
+
+    # The second text is truncated to its first four tokens and pads the first one in the batch
+    vectors = np.asarray(embeddings.embed_documents(["pipeline", "scaler\ntree pipeline unknown pipeline", "tree"]))
+
+    expected = np.asarray([[3.0, 0.0, 0.0], [4.0, 5.0, 1.0], [1.0, 1.0, 0.0]])
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    np.testing.assert_allclose(vectors, expected, atol=1e-6)
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-6)
+    np.testing.assert_allclose(embeddings.embed_query("tree"), expected[2], atol=1e-6)
+
+
+def test_identical_backends_pass():
+    result = parity_check(SeededEmbeddings(), SeededEmbeddings())
+
+    assert result["passed"]
+    assert result["top_k_overlap"] == 1.0
+    assert result["min_cosine"] >= 0.9999
+
+
+def test_diverging_backend_fails():
+    result = parity_check(SeededEmbeddings(), SeededEmbeddings(noise=2.0), PARITY_SENTENCES)
+
+    assert not result["passed"]
+    assert result["top_k_overlap"] < 0.9
+
+
+def test_exported_model_matches_sentence_transformers():
+    model_dir = ai_runtime.ONNX_MODEL_DIR
+    if not os.path.exists(os.path.join(model_dir, MODEL_FILENAME)):
+        pytest.skip(f"no exported model in {model_dir} (python -m onnx_embeddings export)")
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    manifest = read_manifest(model_dir)
+    try:
+        reference = sentence_transformers.SentenceTransformer(manifest["model_name"])
+    except OSError as e:
+        pytest.skip(f"reference model unavailable: {e}")
+    onnx = OnnxEmbeddings(model_dir)
+
+    expected = reference.encode(PARITY_SENTENCES, normalize_embeddings=True)
+    documents = np.asarray(onnx.embed_documents(PARITY_SENTENCES))
+    query = np.asarray(onnx.embed_query(PARITY_SENTENCES[0]))
+
+    np.testing.assert_allclose(query, documents[0], atol=1e-5)
+    if manifest.get("quantization") == "none":
+        np.testing.assert_allclose(documents, expected, atol=1e-4)
+    else:
+        # int8 weights move each value a little, but not the direction of the vector
+        assert np.einsum("ij,ij->i", documents, expected).min() >= PARITY_MIN_COSINE
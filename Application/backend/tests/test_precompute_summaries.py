@@ -0,0 +1,98 @@
+import pytest
+
+import corpus_index
+import lecture_summarizer
+import precompute_summaries
+import week_summarizer
+from models import AIArtifact
+
+CATALOG = {
+    "lecture": [
+        {"source": "Week_1_Lecture_1.pdf", "week": 1, "lecture": 1},
+        {"source": "Week_1_Lecture_2.pdf", "week": 1, "lecture": 2},
+    ],
+    "slides": [{"source": "MLP Week 1 Slides.pdf", "week": 1, "lecture": None}],
+}
+
+
+@pytest.fixture
+def database_uri(tmp_path):
+    # precompute's workers open their own connections, so they need a database file
+    return f"sqlite:///{tmp_path / 'test.db'}"
+
+
+@pytest.fixture
+def course(store_app, monkeypatch):
+    texts = {
+        "Week_1_Lecture_1.pdf": "pandas dataframes",
+        "Week_1_Lecture_2.pdf": "numpy arrays",
+        "MLP Week 1 Slides.pdf": "week 1 slides",
+    }
+    calls = []
+
+    def summary(text, *args):
+        calls.append(text)
+        return f"Summary of {text}"
+
+    monkeypatch.setattr(lecture_summarizer, "get_vector_store", lambda persist_directory="vector_store": None)
+    monkeypatch.setattr(corpus_index, "get_catalog", lambda vs, pd="vector_store", kind=None: CATALOG[kind])
+    monkeypatch.setattr(lecture_summarizer, "retrieve_transcript", lambda filename, pd="vector_store": texts[filename])
+    monkeypatch.setattr(week_summarizer, "retrieve_slides_content",
+                        lambda week, pd="vector_store": texts[week_summarizer.get_slides_filename(week)])
+    monkeypatch.setattr(lecture_summarizer, "generate_lecture_summary", summary)
+    monkeypatch.setattr(week_summarizer, "generate_slides_summary", summary)
+    return store_app, texts, calls
+
+
+def test_only_changed_sources_are_regenerated(course):
+    app, texts, calls = course
+
+    first = precompute_summaries.precompute(app, workers=2)
+    second = precompute_summaries.precompute(app, workers=2)
+    texts["Week_1_Lecture_2.pdf"] = "numpy broadcasting"
+    third = precompute_summaries.precompute(app, workers=2)
+
+    assert first["counts"]["generated"] == 3
+    assert second["counts"] == {"generated": 0, "current": 3, "missing": 0, "failed": 0}
+    assert third["counts"]["generated"] == 1
+    assert calls.count("numpy broadcasting") == 1
+    with app.app_context():
+        # The outdated summary was replaced, not kept next to the new one
+        assert AIArtifact.query.count() == 3
+        assert lecture_summarizer.summarize_lecture(1, 2)["summary"] == "Summary of numpy broadcasting"
+
+
+def test_force_regenerates_everything(course):
+    app, _, calls = course
+
+    precompute_summaries.precompute(app)
+    result = precompute_summaries.precompute(app, force=True, only="weeks")
+
+    assert result["counts"]["generated"] == 1
+    assert len(calls) == 4
+
+
+def test_gemini_errors_are_reported_and_not_stored(course, monkeypatch):
+    app, _, _ = course
+    monkeypatch.setattr(lecture_summarizer, "generate_lecture_summary",
+                        lambda text: f"{lecture_summarizer.SUMMARY_ERROR_PREFIX}: quota exceeded")
+
+    result = precompute_summaries.precompute(app, only="lectures")
+
+    assert not result["success"]
+    assert result["counts"]["failed"] == 2
+    with app.app_context():
+        assert AIArtifact.query.count() == 0
+
+
+def test_stale_fallback_counts_as_a_failure(course, monkeypatch):
+    app, texts, _ = course
+    precompute_summaries.precompute(app, only="lectures")
+    texts["Week_1_Lecture_2.pdf"] = "numpy broadcasting"
+    monkeypatch.setattr(lecture_summarizer, "generate_lecture_summary",
+                        lambda text: f"{lecture_summarizer.SUMMARY_ERROR_PREFIX}: circuit open")
+
+    result = precompute_summaries.precompute(app, only="lectures")
+
+    assert not result["success"]
+    assert result["counts"] == {"generated": 0, "current": 1, "missing": 0, "failed": 1}
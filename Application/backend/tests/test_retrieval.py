@@ -0,0 +1,179 @@
+import uuid
+
+import chromadb
+import pytest
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+import retrieval
+from lexical_index import LexicalIndex
+
+VOCABULARY = ["regression", "classifier", "pipeline", "scaler", "tree"]
+
+
+class KeywordEmbeddings(Embeddings):
+    """Bag-of-keywords vectors; counts how often the model is invoked"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def _vector(self, text):
+        return [float(word in text.lower()) + 0.01 for word in VOCABULARY]
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        return self._vector(text)
+
+
+@pytest.fixture
+def store():
+    embeddings = KeywordEmbeddings()
+    vector_store = Chroma(
+        collection_name=f"test_{uuid.uuid4().hex}",
+        embedding_function=embeddings,
+        client=chromadb.EphemeralClient()
+    )
+    vector_store.add_texts([
+        "Linear regression fits a line",
+        "Ridge regression adds a penalty",
+        "A decision tree classifier splits features",
+        "StandardScaler is a scaler for features",
+        "A pipeline chains a scaler and a regression model",
+    ])
+    embeddings.calls = 0
+    return vector_store, embeddings
+
+
+def test_all_queries_share_one_embedding_pass(store):
+    vector_store, embeddings = store
+
+    results = retrieval.batch_similarity_search(
+        vector_store, ["what is regression", "tree classifier", "what does a scaler do"], k=2
+    )
+
+    assert embeddings.calls == 1
+    assert len(results) == 3
+
+
+def test_results_are_deduplicated_across_queries(store):
+    vector_store, _ = store
+
+    results = retrieval.batch_similarity_search(vector_store, ["regression", "regression pipeline"], k=3)
+    ids = [doc.id for docs in results for doc in docs]
+
+    assert len(ids) == len(set(ids))
+    assert len(retrieval.merge_results(results)) == len(ids)
+
+
+def test_empty_query_list(store):
+    vector_store, embeddings = store
+
+    assert retrieval.batch_similarity_search(vector_store, []) == []
+    assert embeddings.calls == 0
+
+
+def test_identifier_query_skips_the_vector_search(store):
+    vector_store, embeddings = store
+    lexical_index = LexicalIndex.from_vector_store(vector_store)
+
+    results = retrieval.hybrid_search(vector_store, lexical_index, "StandardScaler", k=1)
+
+    assert embeddings.calls == 0
+    assert "StandardScaler" in results[0].page_content
+
+
+def test_hybrid_search_fuses_both_rankings(store):
+    vector_store, embeddings = store
+    lexical_index = LexicalIndex.from_vector_store(vector_store)
+
+    results = retrieval.hybrid_search(vector_store, lexical_index, "what is a regression pipeline", k=3)
+
+    assert embeddings.calls == 1
+    assert len(results) == 3
+    assert len({doc.id for doc in results}) == 3
+    assert any("pipeline" in doc.page_content for doc in results)
+
+
+def test_hybrid_search_reuses_a_precomputed_embedding(store):
+    vector_store, embeddings = store
+    lexical_index = LexicalIndex.from_vector_store(vector_store)
+    embedding = embeddings.embed_query("what is a regression pipeline")
+    embeddings.calls = 0
+
+    results = retrieval.hybrid_search(vector_store, lexical_index, "what is a regression pipeline", k=3,
+                                      embedding=embedding)
+
+    assert embeddings.calls == 0
+    assert len(results) == 3
+
+
+def test_reciprocal_rank_fusion_prefers_documents_ranked_by_both():
+    a, b, c = (Document(id=name, page_content=name) for name in "abc")
+
+    fused = retrieval.reciprocal_rank_fusion([[a, b], [b, c]])
+
+    assert [doc.id for doc in fused] == ["b", "a", "c"]
+
+
+def test_sample_weeks_only_touches_requested_weeks_and_balances_them(store, tmp_path):
+    vector_store, embeddings = store
+    for week in range(1, 7):
+        chunks = 30 if week == 1 else 6
+        vector_store.add_texts(
+            texts=[f"week {week} chunk {i}" for i in range(chunks)],
+            metadatas=[{"source": f"Week_{week}_Lecture_1.pdf", "chunk_index": i} for i in range(chunks)]
+        )
+    embeddings.calls = 0
+
+    results = retrieval.sample_weeks(vector_store, [1, 2, 3, 4], k=12, persist_directory=str(tmp_path))
+
+    weeks = [doc.metadata["source"].split("_")[1] for doc in results]
+    assert embeddings.calls == 0
+    assert len(results) == 12
+    assert sorted(set(weeks)) == ["1", "2", "3", "4"]
+    assert all(weeks.count(week) == 3 for week in "1234")
+    assert weeks[:4] == ["1", "2", "3", "4"]
+
+
+def test_sample_weeks_gives_the_slots_of_a_short_week_to_the_others(store, tmp_path):
+    vector_store, _ = store
+    for week, chunks in ((1, 1), (2, 10), (3, 10)):
+        vector_store.add_texts(
+            texts=[f"week {week} chunk {i}" for i in range(chunks)],
+            metadatas=[{"source": f"Week_{week}_Lecture_1.pdf", "chunk_index": i} for i in range(chunks)]
+        )
+
+    results = retrieval.sample_weeks(vector_store, [1, 2, 3, 4], k=12, persist_directory=str(tmp_path))
+
+    weeks = [doc.metadata["source"].split("_")[1] for doc in results]
+    assert len(results) == 12
+    assert [weeks.count(week) for week in "123"] == [1, 6, 5]
+
+
+def test_lexical_index_is_rebuilt_when_the_collection_version_changes(store, monkeypatch):
+    import ai_runtime
+    import corpus_index
+
+    vector_store, _ = store
+    version = [1]
+    monkeypatch.setattr(ai_runtime, "get_vector_store", lambda persist_directory, owner=None: vector_store)
+    monkeypatch.setattr(corpus_index, "get_collection_version", lambda persist_directory: version[0])
+    monkeypatch.setattr(ai_runtime, "_lexical_indexes", {})
+    monkeypatch.setattr(ai_runtime, "_lexical_index_versions", {})
+    retriever = retrieval.HybridRetriever(vector_store=vector_store, get_lexical_index=ai_runtime.get_lexical_index,
+                                          k=1)
+    assert retriever.invoke("StandardScaler")[0].page_content == "StandardScaler is a scaler for features"
+
+    # Re-ingested with the same number of chunks
+    ids = vector_store.get()["ids"]
+    texts = vector_store.get(ids=ids)["documents"]
+    vector_store.delete(ids=ids)
+    vector_store.add_texts([text.replace("StandardScaler", "MinMaxScaler") for text in texts])
+    version[0] = 2
+
+    assert retriever.invoke("MinMaxScaler")[0].page_content == "MinMaxScaler is a scaler for features"
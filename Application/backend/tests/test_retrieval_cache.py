@@ -0,0 +1,61 @@
+import pytest
+from langchain_core.documents import Document
+
+import corpus_index
+import retrieval_cache
+from retrieval_cache import RetrievalCache
+
+
+class CountingSearch:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return [Document(page_content=f"result {self.calls}")]
+
+
+@pytest.fixture
+def persist_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(retrieval_cache, "VERSION_CHECK_INTERVAL", 0)
+    return str(tmp_path)
+
+
+def test_repeated_retrieval_is_served_from_cache(persist_directory):
+    cache = RetrievalCache()
+    search = CountingSearch()
+
+    first = cache.get_or_compute("similarity", "Linear Regression", 20, None, persist_directory, search)
+    second = cache.get_or_compute("similarity", "Linear Regression", 20, None, persist_directory, search)
+    cache.get_or_compute("similarity", "Linear Regression", 10, None, persist_directory, search)
+    cache.get_or_compute("similarity", "Linear Regression", 20, {"week": "1"}, persist_directory, search)
+
+    assert first == second
+    assert search.calls == 3
+    assert cache.stats()["hits"] == 1
+
+
+def test_ingest_invalidates_cached_results(persist_directory):
+    cache = RetrievalCache()
+    search = CountingSearch()
+
+    cache.get_or_compute("hybrid", "pipelines", 3, None, persist_directory, search)
+    corpus_index.record_source_chunks("Week_7_Lecture_1.pdf", ["x", "y"], persist_directory)
+    result = cache.get_or_compute("hybrid", "pipelines", 3, None, persist_directory, search)
+
+    assert search.calls == 2
+    assert result[0].page_content == "result 2"
+
+
+def test_entries_expire_and_are_bounded(persist_directory):
+    cache = RetrievalCache(max_entries=2, ttl_seconds=0)
+    search = CountingSearch()
+
+    cache.get_or_compute("similarity", "a", 3, None, persist_directory, search)
+    cache.get_or_compute("similarity", "a", 3, None, persist_directory, search)
+    assert search.calls == 2
+
+    cache.ttl_seconds = 60
+    for query in ["b", "c", "d"]:
+        cache.get_or_compute("similarity", query, 3, None, persist_directory, search)
+    assert cache.stats()["entries"] == 2
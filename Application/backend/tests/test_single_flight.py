@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def _slow(counter, result, delay=0.2):
+    def compute():
+        counter.append(1)
+        time.sleep(delay)
+        return dict(result)
+    return compute
+
+
+def _run_concurrently(functions):
+    results = [None] * len(functions)
+    start = threading.Barrier(len(functions))
+
+    def run(i):
+        start.wait()
+        results[i] = functions[i]()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(functions))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_threads_share_one_generation():
+    flight, calls = SingleFlight(), []
+    compute = _slow(calls, {"summary": "Week 3"})
+
+    results = _run_concurrently([lambda: flight.do("week:3", compute)] * 8)
+
+    assert len(calls) == 1
+    assert results == [{"summary": "Week 3"}] * 8
+    # Waiters get copies, not the leader's object
+    assert len({id(result) for result in results}) == 8
+    assert flight.stats() == {"leaders": 1, "coalesced": 7, "in_flight": 0}
+
+
+def test_different_keys_run_independently():
+    flight, calls = SingleFlight(), []
+
+    _run_concurrently([
+        lambda: flight.do("week:1", _slow(calls, {})),
+        lambda: flight.do("week:2", _slow(calls, {})),
+    ])
+
+    assert len(calls) == 2
+
+
+def test_waiters_see_the_leaders_error():
+    flight = SingleFlight()
+
+    def failing():
+        time.sleep(0.2)
+        raise RuntimeError("quota exceeded")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("week:1", failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    _run_concurrently([call] * 4)
+
+    assert errors == ["quota exceeded"] * 4
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_workers_coordinate_through_lock_files(tmp_path):
+    pytest.importorskip("fcntl")
+    # Two instances stand in for two workers: only the lock directory is shared
+    store, calls = {}, []
+
+    def generate():
+        calls.append(1)
+        time.sleep(0.3)
+        store["week:1"] = {"summary": "Week 1"}
+        return store["week:1"]
+
+    workers = [SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))]
+    results = _run_concurrently([
+        lambda flight=flight: flight.do("week:1", generate, lookup=lambda: store.get("week:1"))
+        for flight in workers
+    ])
+
+    assert len(calls) == 1
+    assert results == [{"summary": "Week 1"}] * 2
+
+
+def test_lock_wait_is_bounded(tmp_path):
+    pytest.importorskip("fcntl")
+    slow_worker, impatient_worker = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path), timeout=0.1)
+    calls = []
+
+    results = _run_concurrently([
+        lambda: slow_worker.do("week:1", _slow(calls, {"by": "slow"}, delay=0.5)),
+        lambda: (time.sleep(0.05), impatient_worker.do("week:1", _slow(calls, {"by": "impatient"}, delay=0)))[1],
+    ])
+
+    # The impatient worker gave up waiting and generated on its own
+    assert results == [{"by": "slow"}, {"by": "impatient"}]
+    assert len(calls) == 2
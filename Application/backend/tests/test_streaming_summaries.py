@@ -0,0 +1,69 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import artifact_store
+import notes_generator
+import week_summarizer
+
+
+class StreamingLLM:
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+
+    def stream(self, prompt):
+        for i, chunk in enumerate(self.chunks):
+            if i == self.fail_after:
+                raise RuntimeError("quota exceeded")
+            yield SimpleNamespace(content=chunk)
+
+
+def test_week_summary_streams_and_is_then_served_by_the_blocking_call(store_app, monkeypatch):
+    monkeypatch.setattr(week_summarizer, "retrieve_slides_content", lambda week, pd="vector_store": "slides text")
+    monkeypatch.setattr(week_summarizer, "get_llm", lambda: StreamingLLM(["# Week 2: ", "Pipelines"]))
+
+    events = list(week_summarizer.stream_week_summary(2))
+
+    assert [event["event"] for event in events] == ["token", "token", "done"]
+    assert events[-1]["data"]["ttft_ms"] is not None
+    # Same artifact as summarize_week_slides, so the blocking endpoint needs no Gemini call
+    monkeypatch.setattr(week_summarizer, "generate_slides_summary", pytest.fail)
+    assert week_summarizer.summarize_week_slides(2)["summary"] == "# Week 2: Pipelines"
+
+
+def test_missing_slides_yield_one_error_event(store_app, monkeypatch):
+    monkeypatch.setattr(week_summarizer, "retrieve_slides_content", lambda week, pd="vector_store": "")
+
+    events = list(week_summarizer.stream_week_summary(13))
+
+    assert events == [{"event": "error", "data": {
+        "success": False, "message": "No slides content found for Week 13", "summary": "", "week": 13
+    }}]
+
+
+def test_failed_slide_retrieval_yields_one_error_event(store_app, monkeypatch):
+    def unavailable(week, pd="vector_store"):
+        raise RuntimeError("embedding model failed to load")
+
+    monkeypatch.setattr(week_summarizer, "retrieve_slides_content", unavailable)
+
+    async def collect():
+        return [event async for event in week_summarizer.astream_week_summary(3)]
+
+    for events in (list(week_summarizer.stream_week_summary(3)), asyncio.run(collect())):
+        assert [event["event"] for event in events] == ["error"]
+        assert events[0]["data"]["success"] is False
+        assert "embedding model failed to load" in events[0]["data"]["message"]
+
+
+def test_failed_notes_stream_ends_with_an_error_and_is_not_stored(store_app, monkeypatch):
+    monkeypatch.setattr(notes_generator, "retrieve_topic_context", lambda topic, pd="vector_store": "context")
+    monkeypatch.setattr(notes_generator, "get_llm", lambda: StreamingLLM(["## Pandas", " more"], fail_after=1))
+
+    events = list(notes_generator.stream_topic_notes("pandas"))
+
+    assert [event["event"] for event in events] == ["token", "error"]
+    assert "quota exceeded" in events[-1]["data"]["message"]
+    assert not artifact_store.exists(*notes_generator.get_notes_key("pandas", "context"))
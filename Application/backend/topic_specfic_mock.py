@@ -1,16 +1,19 @@
-import os
 from typing import List, Dict, Optional
 from functools import lru_cache
 
 from pydantic import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+import ai_runtime
+import context_builder
+import ingest
+import retrieval_cache
+
+# Chunks retrieved per topic before packing the context
+CANDIDATE_CHUNKS = 20
+
 # Define the schema for MCQ output
 class MCQQuestion(BaseModel):
     question: str = Field(description="The question text")
@@ -20,47 +23,21 @@ class MCQQuestion(BaseModel):
 class MCQSet(BaseModel):
     questions: List[MCQQuestion] = Field(description="List of MCQ questions")
 
-# Global variables for singleton pattern
-_llm = None
-_vectorstore = None
-_embeddings = None
-
-def get_api_key() -> str:
-    """Get API key from environment variable"""
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("GOOGLE_API_KEY environment variable not set")
-    return api_key
-
 def get_embeddings():
-    """Singleton for embeddings"""
-    global _embeddings
-    if _embeddings is None:
-        _embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
-    return _embeddings
+    """Shared embeddings from the AI runtime"""
+    return ai_runtime.get_embeddings(owner=__name__)
 
 def get_llm():
-    """Singleton for LLM"""
-    global _llm
-    if _llm is None:
-        _llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            google_api_key=get_api_key(),
-            temperature=0.7
-        )
-    return _llm
+    """Shared language model from the AI runtime"""
+    return ai_runtime.get_llm(owner=__name__, temperature=0.7)
 
 def get_vectorstore(persist_directory: str = "vector_store"):
-    """Singleton for vector store"""
-    global _vectorstore
-    if _vectorstore is None:
-        _vectorstore = Chroma(
-            persist_directory=persist_directory,
-            embedding_function=get_embeddings()
-        )
-    return _vectorstore
+    """Shared vector store from the AI runtime"""
+    return ai_runtime.get_vector_store(persist_directory, owner=__name__)
+
+def get_ingest_vectorstore(persist_directory: str = "vector_store"):
+    """Vector store that new documents are written to (see ai_runtime.get_ingest_vector_store)"""
+    return ai_runtime.get_ingest_vector_store(persist_directory, owner=__name__)
 
 def initialize_components(persist_directory: str = "vector_store"):
     """Initialize all components at once"""
@@ -69,46 +46,48 @@ def initialize_components(persist_directory: str = "vector_store"):
 def get_text_splitter():
     """Get text splitter with default configuration"""
     return RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
+        chunk_size=ingest.CHUNK_SIZE,
+        chunk_overlap=ingest.CHUNK_OVERLAP,
         separators=["\n\n", "\n", " ", ""]
     )
 
-def add_documents(documents: List[str], metadata: Optional[List[Dict]] = None, batch_size: int = 10):
+def add_documents(documents: List[str], metadata: Optional[List[Dict]] = None,
+                  batch_size: int = ingest.DEFAULT_EMBED_BATCH_SIZE):
     """
-Add documents to the vector store in batches.
+Add documents to the vector store.
+
+Every chunk keeps the metadata of the document it came from, plus its
+chunk_index (and week / kind when the source name encodes them). Documents
+sharing a source (e.g. the pages of one file) are stored together as that
+source, replacing what was stored for it before; documents without a source
+are named after their content hash.
 
 Args:
 documents: List of text documents
 metadata: Optional metadata for each document
-batch_size: Number of documents to process at once
+batch_size: Number of chunks to embed at once
     """
-    vectorstore = get_vectorstore()
-    text_splitter = get_text_splitter()
-
-    if metadata is None:
-        metadata = [{"source": f"doc_{i}"} for i in range(len(documents))]
-
-    # Process in batches
-    for i in range(0, len(documents), batch_size):
-        batch_docs = documents[i:i+batch_size]
-        batch_meta = metadata[i:i+batch_size] if metadata else None
-
-        # Split documents
-        split_docs = []
-        for doc in batch_docs:
-            split_docs.extend(text_splitter.split_text(doc))
-
-        # Adjust metadata to match split chunks
-        batch_meta_adjusted = batch_meta[:len(split_docs)] if batch_meta else None
-
-        # Add to vector store
-        vectorstore.add_texts(
-            texts=split_docs,
-            metadatas=batch_meta_adjusted
-        )
+    metadata = metadata or []
+
+    by_source: Dict[str, List[tuple]] = {}
+    for i, doc in enumerate(documents):
+        doc_meta = metadata[i] if i < len(metadata) else {}
+        source = doc_meta.get("source") or f"doc_{ingest.content_hash(doc.encode('utf-8'))[:12]}"
+        by_source.setdefault(source, []).append((doc, doc_meta))
+
+    parsed = []
+    for source, docs in by_source.items():
+        texts = [(text, doc_meta) for doc, doc_meta in docs for text, _ in ingest.split_text(doc)]
+        parsed.append({
+            "source": source,
+            "content_hash": ingest.content_hash("\n".join(doc for doc, _ in docs).encode("utf-8")),
+            "chunks": [(text, ingest.chunk_metadata(source, index, doc_meta))
+                       for index, (text, doc_meta) in enumerate(texts)]
+        })
 
-    return {"added": len(documents), "chunks": len(split_docs)}
+    chunks = ingest.embed_and_write(get_ingest_vectorstore(), get_embeddings(), parsed, "vector_store", batch_size)
+    ai_runtime.refresh_vector_store("vector_store")
+    return {"added": len(documents), "chunks": chunks}
 
 @lru_cache(maxsize=50)
 def cached_generate_mcqs(topic: str, num_questions: int):
@@ -154,9 +133,11 @@ Returns:
 MCQSet containing the generated questions
     """
     # Search for relevant documents
-    search_results = vectorstore.similarity_search(
+    search_results = retrieval_cache.cached_similarity_search(
+        ai_runtime.get_retrieval_cache(),
+        vectorstore,
         topic,
-        k=min(num_questions * 2, 20)  # Get more context for better questions
+        k=CANDIDATE_CHUNKS
     )
 
     mcq_prompt = ChatPromptTemplate.from_messages([
@@ -214,8 +195,10 @@ What would be the effect of increasing max_depth to 15?"
         )
     ])
 
-    # Combine context from relevant documents
-    context = "\n".join([doc.page_content for doc in search_results])
+    # Combine context from relevant documents within a budget that grows with the number of questions
+    context = context_builder.build_context(
+        search_results, max_tokens=context_builder.question_budget(num_questions, maximum=5000)
+    )
 
     # If context is too short, generate using just the topic
     if len(context) < 200:
@@ -1,13 +1,15 @@
-import os
 from typing import Dict, List, Any
 # Import LangChain components
 from langchain_core.prompts import PromptTemplate
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field
 
+import ai_runtime
+import context_builder
+import retrieval
+
+# Token budget for the retrieved course context
+CONTEXT_TOKENS = 1500
 
 # Model definitions
 class TopicSuggestion(BaseModel):
@@ -19,49 +21,19 @@ class SuggestionSet(BaseModel):
     topic_suggestions: List[TopicSuggestion] = Field(description="List of topic-specific suggestions")
     general_tips: List[str] = Field(description="General learning tips applicable to all topics")
 
-# Global component initialization
-_embeddings = None
-_vector_store = None
-_llm = None
-
-def get_api_key() -> str:
-    """Get API key for Google Generative AI"""
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("Google API key is not set")
-    return api_key
-
+# Shared components from the AI runtime
 def get_embeddings():
-    """Get embeddings singleton"""
-    global _embeddings
-    if _embeddings is None:
-        _embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
-    return _embeddings
+    """Shared embeddings from the AI runtime"""
+    return ai_runtime.get_embeddings(owner=__name__)
 
 def get_vector_store(persist_directory: str = "vector_store"):
-    """Get vector store singleton"""
-    global _vector_store
-    if _vector_store is None:
-        _vector_store = Chroma(
-            collection_name="pdf_embeddings",
-            embedding_function=get_embeddings(),
-            persist_directory=persist_directory
-        )
-    return _vector_store
+    """Shared vector store from the AI runtime"""
+    return ai_runtime.get_vector_store(persist_directory, owner=__name__)
 
 def get_llm():
-    """Get LLM singleton"""
-    global _llm
-    if _llm is None:
-        _llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            google_api_key=get_api_key(),
-            temperature=0.2,
-            max_output_tokens=2048
-        )
-    return _llm
+    """Shared language model from the AI runtime"""
+    return ai_runtime.get_llm(owner=__name__, temperature=0.2, max_output_tokens=2048)
+
 
 def create_prompt():
     """Create the prompt template for suggestions"""
@@ -115,16 +87,16 @@ def generate_topic_suggestions(wrong_questions: List[str]) -> Dict[str, Any]:
             formatted_questions += f"QUESTION {i+1}:\n{question}\n\n"
 
 
-        # Get relevant context from vector store
+        # Get relevant context for every question in one batched retrieval
         vector_store = get_vector_store()
-        all_contexts = []
+        per_question = retrieval.batch_similarity_search(vector_store, wrong_questions, k=3)
 
-        for question in wrong_questions:
-            results = vector_store.similarity_search(question, k=3)
-            context = "\n".join([doc.page_content for doc in results])
-            all_contexts.append(context)
-
-        combined_context = "\n\n---\n\n".join(all_contexts)
+        # Interleave by rank so every question is represented, then pack into the token budget
+        combined_context = context_builder.build_context(
+            retrieval.merge_results(per_question),
+            max_tokens=CONTEXT_TOKENS,
+            separator="\n\n---\n\n"
+        )
 
         # Create prompt and parser
         prompt_template, output_parser = create_prompt()
@@ -135,7 +107,7 @@ def generate_topic_suggestions(wrong_questions: List[str]) -> Dict[str, Any]:
         # Generate suggestions
         formatted_prompt = prompt_template.format(
             formatted_questions=formatted_questions,
-            context=combined_context[:5000]  # Limit context size
+            context=combined_context
         )
 
         response = llm.invoke(formatted_prompt)
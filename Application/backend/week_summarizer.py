@@ -1,68 +1,41 @@
-import os
+import asyncio
 import warnings
-from typing import Dict, Any
-from functools import lru_cache
+from typing import Dict, Any, AsyncIterator, Iterator
 
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from langchain_google_genai import ChatGoogleGenerativeAI
+import ai_runtime
+import artifact_store
+import context_builder
+import corpus_index
 
 # Suppress deprecation warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-# Global singletons for components
-_embeddings = None
-_vector_store = None
-_llm = None
-_summary_cache = {}
+# Bump when the summary prompt changes so stored summaries are regenerated
+PROMPT_VERSION = "1"
 
-def get_api_key() -> str:
-    """Get API key from environment variable"""
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("GOOGLE_API_KEY environment variable is not set")
-    return api_key
+# generate_slides_summary reports Gemini failures in the summary text
+SUMMARY_ERROR_PREFIX = "Error generating summary"
 
 def get_embeddings():
-    """Singleton for embeddings"""
-    global _embeddings
-    if _embeddings is None:
-        _embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
-    return _embeddings
+    """Shared embeddings from the AI runtime"""
+    return ai_runtime.get_embeddings(owner=__name__)
 
 def get_vector_store(persist_directory: str = "vector_store"):
-    """Singleton for vector store"""
-    global _vector_store
-    if _vector_store is None:
-        _vector_store = Chroma(
-            collection_name="pdf_embeddings",
-            embedding_function=get_embeddings(),
-            persist_directory=persist_directory
-        )
-    return _vector_store
+    """Shared vector store from the AI runtime"""
+    return ai_runtime.get_vector_store(persist_directory, owner=__name__)
 
 def get_llm():
-    """Singleton for language model"""
-    global _llm
-    if _llm is None:
-        _llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            google_api_key=get_api_key()
-        )
-    return _llm
+    """Shared language model from the AI runtime"""
+    return ai_runtime.get_llm(owner=__name__)
+
 
 def get_slides_filename(week: int) -> str:
     """Generate the standardized filename for a week's slides"""
     return f"MLP Week {week} Slides.pdf"
 
-@lru_cache(maxsize=20)
-def generate_slides_summary(text: str, week: int) -> str:
-    """Generate a summary of the slides content using Google Gemini"""
-    llm = get_llm()
-
-    prompt = (
+def get_slides_prompt(text: str, week: int) -> str:
+    """Prompt asking Gemini for a Markdown summary of a week's slides"""
+    return (
         f"You are an expert Machine Learning educator creating comprehensive week summaries. "
         f"Create a detailed summary of Week {week} slides (700-900 words) that captures all key concepts. "
         f"Your response MUST be in Markdown format with:"
@@ -91,11 +64,50 @@ def generate_slides_summary(text: str, week: int) -> str:
         f"\n\nSlides content:\n{text}"
     )
 
+def response_text(response) -> str:
+    """Text of a Gemini response or stream chunk"""
+    return response.content if hasattr(response, "content") else str(response)
+
+def make_result(week: int, summary: str) -> Dict[str, Any]:
+    """summarize_week_slides result for a generated summary"""
+    return {
+        "success": True,
+        "message": f"Summary generated successfully for Week {week}",
+        "summary": summary,
+        "week": week
+    }
+
+def make_error(week: int, message: str) -> Dict[str, Any]:
+    """summarize_week_slides result for a week that couldn't be summarized"""
+    return {
+        "success": False,
+        "message": message,
+        "summary": "",
+        "week": week
+    }
+
+def is_storable(result: Dict[str, Any]) -> bool:
+    """Whether a result holds a real summary rather than a reported Gemini failure"""
+    return not result["summary"].startswith(SUMMARY_ERROR_PREFIX)
+
+def generate_slides_summary(text: str, week: int) -> str:
+    """Generate a summary of the slides content using Google Gemini"""
+    llm = get_llm()
+    prompt = get_slides_prompt(text, week)
+
     try:
         response = llm.invoke(prompt)
-        return response.content if hasattr(response, "content") else str(response)
+        return response_text(response)
     except Exception as e:
-        return f"Error generating summary: {str(e)}"
+        return f"{SUMMARY_ERROR_PREFIX}: {str(e)}"
+
+async def agenerate_slides_summary(text: str, week: int) -> str:
+    """Async generate_slides_summary: awaits Gemini without holding a thread"""
+    try:
+        response = await get_llm().ainvoke(get_slides_prompt(text, week))
+        return response_text(response)
+    except Exception as e:
+        return f"{SUMMARY_ERROR_PREFIX}: {str(e)}"
 
 def retrieve_slides_content(week: int, persist_directory: str = "vector_store") -> str:
     """Retrieve the slides content for a specific week"""
@@ -104,27 +116,26 @@ def retrieve_slides_content(week: int, persist_directory: str = "vector_store")
     # Get the expected filename for this week
     filename = get_slides_filename(week)
 
-    # Use retriever with exact filename match
-    retriever = vector_store.as_retriever(
-        search_kwargs={"filter": {"source": filename}, "k": 10}
-    )
-
-    docs = retriever.get_relevant_documents("")
+    # Fetch every chunk of the slide deck by id, in document order
+    docs = corpus_index.get_source_documents(vector_store, filename, persist_directory)
 
     if not docs:
-        # Try an alternative search by week number if filename doesn't match
-        retriever = vector_store.as_retriever(
-            search_kwargs={"filter": {"week": str(week)}, "k": 10}
+        # Try an alternative lookup by week number if filename doesn't match
+        docs = corpus_index.get_source_documents(
+            vector_store, filename, persist_directory, where={"week": str(week)}
         )
-        docs = retriever.get_relevant_documents("")
 
     if not docs:
         return ""
 
-    # Combine document contents
-    combined_text = "\n".join([doc.page_content for doc in docs])
+    # Combine document contents, without the text repeated by the chunk overlap
+    combined_text = context_builder.build_context(docs, max_tokens=None)
     return combined_text
 
+def get_summary_key(week: int, slides_content: str) -> tuple:
+    """Artifact store key (kind, params, source hash, prompt version) of a week summary"""
+    return "week_summary", {"week": week}, artifact_store.content_hash(slides_content), PROMPT_VERSION
+
 def summarize_week_slides(week: int, persist_directory: str = "vector_store") -> Dict[str, Any]:
     """
 Generate a summary for slides from a specific week.
@@ -136,40 +147,110 @@ persist_directory: Directory of the vector store
 Returns:
 Dictionary with summary and metadata
     """
-    global _summary_cache
-
-    # Check if we already have this summary cached
-    cache_key = f"week_{week}"
-    if cache_key in _summary_cache:
-        return _summary_cache[cache_key]
-
     # Retrieve the slides content
     slides_content = retrieve_slides_content(week, persist_directory)
 
     if not slides_content.strip():
-        result = {
-            "success": False,
-            "message": f"No slides content found for Week {week}",
-            "summary": "",
-            "week": week
-        }
-    else:
+        return make_error(week, f"No slides content found for Week {week}")
+
+    def summarize():
         # Generate summary from the slides content
-        summary = generate_slides_summary(slides_content, week)
+        return make_result(week, generate_slides_summary(slides_content, week))
+
+    # Shared by all workers; changed slides hash to a new entry
+    return artifact_store.get_or_create(
+        *get_summary_key(week, slides_content),
+        summarize,
+        should_store=is_storable
+    )
+
+def stream_week_summary(week: int, persist_directory: str = "vector_store") -> Iterator[Dict[str, Any]]:
+    """
+Stream the summary of a week's slides as Markdown chunks while Gemini writes it.
+
+A stored summary is sent at once; a newly generated one is stored when
+complete (see artifact_store.stream_or_create).
+
+Args:
+week: Week number (integer)
+persist_directory: Directory of the vector store
+
+Yields:
+"token" events with text chunks, then "done" with the summarize_week_slides
+fields (plus cached, ttft_ms and total_ms), or a single "error" event
+    """
+    try:
+        slides_content = retrieve_slides_content(week, persist_directory)
+
+        if not slides_content.strip():
+            yield {"event": "error", "data": make_error(week, f"No slides content found for Week {week}")}
+            return
+
+        def stream():
+            llm = get_llm()
+            for chunk in llm.stream(get_slides_prompt(slides_content, week)):
+                yield response_text(chunk)
 
-        result = {
-            "success": True,
-            "message": f"Summary generated successfully for Week {week}",
-            "summary": summary,
-            "week": week
-        }
+        yield from artifact_store.stream_or_create(
+            *get_summary_key(week, slides_content),
+            stream=stream,
+            make_result=lambda summary: make_result(week, summary),
+            text_field="summary"
+        )
+    except Exception as e:
+        yield {"event": "error", "data": make_error(week, f"{SUMMARY_ERROR_PREFIX}: {str(e)}")}
+
+async def asummarize_week_slides(week: int, persist_directory: str = "vector_store") -> Dict[str, Any]:
+    """
+Async summarize_week_slides for the async serving mode (asgi.py).
 
-    # Cache the result
-    _summary_cache[cache_key] = result
-    return result
+The slides are read in a worker thread and Gemini is awaited. Needs an app
+context.
+
+Args:
+week: Week number (integer)
+persist_directory: Directory of the vector store
+
+Returns:
+Dictionary with summary and metadata
+    """
+    slides_content = await asyncio.to_thread(retrieve_slides_content, week, persist_directory)
+
+    if not slides_content.strip():
+        return make_error(week, f"No slides content found for Week {week}")
+
+    async def summarize():
+        return make_result(week, await agenerate_slides_summary(slides_content, week))
+
+    return await artifact_store.aget_or_create(
+        *get_summary_key(week, slides_content),
+        summarize,
+        should_store=is_storable
+    )
+
+async def astream_week_summary(week: int, persist_directory: str = "vector_store") -> AsyncIterator[Dict[str, Any]]:
+    """Async stream_week_summary for the async serving mode (same events)"""
+    try:
+        slides_content = await asyncio.to_thread(retrieve_slides_content, week, persist_directory)
+
+        if not slides_content.strip():
+            yield {"event": "error", "data": make_error(week, f"No slides content found for Week {week}")}
+            return
+
+        async def stream():
+            async for chunk in get_llm().astream(get_slides_prompt(slides_content, week)):
+                yield response_text(chunk)
+
+        async for event in artifact_store.astream_or_create(
+            *get_summary_key(week, slides_content),
+            stream=stream,
+            make_result=lambda summary: make_result(week, summary),
+            text_field="summary"
+        ):
+            yield event
+    except Exception as e:
+        yield {"event": "error", "data": make_error(week, f"{SUMMARY_ERROR_PREFIX}: {str(e)}")}
 
 def clear_cache():
     """Clear all summary caches"""
-    global _summary_cache
-    _summary_cache = {}
-    generate_slides_summary.cache_clear()
+    artifact_store.clear("week_summary")